@@ -0,0 +1,84 @@
+import argparse
+import time
+
+from pymonkey.compiler.compiler import BACKENDS, Compiler
+from pymonkey.lexer.mlexer import MLexer
+from pymonkey.parser.mparser import MParser
+from pymonkey.vm.register_vm import RegisterVM
+from pymonkey.vm.vm import VM
+
+PROGRAMS = {
+    "fib": """
+        let fib = fn(n) { if (n < 2) { return n; } fib(n - 1) + fib(n - 2) };
+        fib(18);
+    """,
+    "loop": """
+        let sum = fn(n) {
+            let i = 0;
+            let total = 0;
+            while (i < n) { total = total + i * 2; i = i + 1; }
+            total
+        };
+        sum(20000);
+    """,
+    "array": """
+        let build = fn(n) {
+            let i = 0;
+            let total = 0;
+            while (i < n) { let a = [i, i + 1, i + 2]; total = total + a[1]; i = i + 1; }
+            total
+        };
+        build(5000);
+    """,
+}
+
+
+def measure(source: str, backend: str, optimize: int) -> tuple[str, int, float]:
+    program = MParser(MLexer(source)).parse_program()
+    compiler = Compiler(optimize=optimize, backend=backend)
+    compiler.compile(program)
+    bytecode = compiler.bytecode()
+
+    vm: VM | RegisterVM
+    if backend == "register":
+        vm = RegisterVM(bytecode)
+    else:
+        vm = VM(bytecode)
+    start = time.perf_counter()
+    vm.run()
+    seconds = time.perf_counter() - start
+    return str(vm.last_pop), vm.executed, seconds
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="compare instructions executed and time of the VM backends"
+    )
+    parser.add_argument("files", nargs="*", help="monkey files, default built-ins")
+    parser.add_argument("-O", dest="optimize", type=int, default=1)
+    args = parser.parse_args()
+
+    programs = dict(PROGRAMS)
+    if args.files:
+        programs = {}
+        for file_name in args.files:
+            with open(file_name) as file:
+                programs[file_name] = file.read()
+
+    print(f"{'program':<12} {'backend':<9} {'instructions':>12} {'seconds':>9}")
+    for name, source in programs.items():
+        results = {b: measure(source, b, args.optimize) for b in BACKENDS}
+        for backend, (value, executed, seconds) in results.items():
+            print(f"{name:<12} {backend:<9} {executed:>12} {seconds:>9.3f}")
+
+        stack, register = results["stack"], results["register"]
+        if stack[0] != register[0]:
+            print(f"{name}: results differ, {stack[0]} != {register[0]}")
+        print(
+            f"{name:<12} {'ratio':<9} {register[1] / stack[1]:>12.2f} "
+            f"{register[2] / stack[2]:>9.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
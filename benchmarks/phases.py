@@ -0,0 +1,213 @@
+import argparse
+import math
+import time
+from dataclasses import dataclass
+from typing import Callable, TypeVar
+
+from pymonkey.compiler.compiler import Bytecode, Compiler
+from pymonkey.evaluator.mevaluator import MEvaluator
+from pymonkey.lexer.mlexer import MLexer
+from pymonkey.object.object import CompliedFunction
+from pymonkey.parser.mast import MProgram
+from pymonkey.parser.mparser import MParser
+from pymonkey.parser.mvisitor import walk
+from pymonkey.vm.vm import VM
+
+SIZES = [1_000, 100_000, 1_000_000]
+PHASES = ["lexer", "parser", "compiler", "vm", "evaluator"]
+# globals and functions the statements cycle through, the VM has 65536 globals
+VARIABLES = 100
+FUNCTIONS = 10
+# statements per function
+CHUNK = 200
+# time growing faster than size by more than this exponent is superlinear
+SUPERLINEAR = 1.15
+
+T = TypeVar("T")
+
+
+def name(prefix: str, index: int) -> str:
+    """
+    Identifiers can not contain digits, so index is written in letters
+    """
+    letters = ""
+    while True:
+        index, digit = divmod(index, 26)
+        letters = chr(ord("a") + digit) + letters
+        if index == 0:
+            return prefix + letters
+
+
+def generate(lines: int) -> str:
+    """
+    A program of about lines lines, mixing arithmetic, calls, conditionals,
+    literals and builtins over a fixed set of globals. Statements are grouped
+    into functions and use no literals, since jumps and constant indices of
+    the bytecode are 16 bit
+    """
+    out = [
+        "let zero = 0;",
+        "let one = 1;",
+        "let two = 2;",
+        'let word = "monkey";',
+    ]
+    out += [f"let {name('v', i)} = {i};" for i in range(VARIABLES)]
+    out += [
+        f"let {name('f', i)} = fn(x, y) {{ if (x < y) {{ x + y + {i} }}"
+        " else { x - y } };"
+        for i in range(FUNCTIONS)
+    ]
+    statements = lines - len(out) - 1
+    for i in range(statements):
+        if i % CHUNK == 0:
+            out.append(f"let {name('c', i // CHUNK)} = fn() {{")
+        a = name("v", i % VARIABLES)
+        b = name("v", (i * 7 + 1) % VARIABLES)
+        c = name("v", (i * 13 + 5) % VARIABLES)
+        kind = i % 4
+        if kind == 0:
+            out.append(f"  {a} = ({a} + {b} + {c}) / two;")
+        elif kind == 1:
+            out.append(f"  {a} = {name('f', i % FUNCTIONS)}({b}, {c});")
+        elif kind == 2:
+            out.append(f"  if ({a} > {b}) {{ {a} = {a} - one; }} else {{ {a} = {b}; }}")
+        else:
+            out.append(f"  {a} = len(word) + [{b}, {c}, one][zero] / two;")
+        if i % CHUNK == CHUNK - 1 or i == statements - 1:
+            out += ["};", f"{name('c', i // CHUNK)}();"]
+    out.append(" + ".join(name("v", i) for i in range(VARIABLES)) + ";")
+    return "\n".join(out)
+
+
+def count_instructions(bytecode: Bytecode) -> int:
+    functions = [c for c in bytecode.constants if isinstance(c, CompliedFunction)]
+    return len(bytecode.instructions) + sum(len(fn.instructions) for fn in functions)
+
+
+def count_visits(program: MProgram) -> int:
+    """
+    Nodes evaluated by the tree walker, counted in a run of its own so the
+    timed run is not slowed by the counting
+    """
+    eval_node = MEvaluator.__dict__["eval_node"]
+    visits = 0
+
+    def counting(cls: type, node, env):  # type: ignore[no-untyped-def]
+        nonlocal visits
+        visits += 1
+        return eval_node.__func__(cls, node, env)
+
+    MEvaluator.eval_node = classmethod(counting)  # type: ignore[assignment]
+    try:
+        MEvaluator(program).evaluate()
+    finally:
+        MEvaluator.eval_node = eval_node  # type: ignore[method-assign]
+    return visits
+
+
+@dataclass
+class Measurement:
+    phase: str
+    lines: int
+    unit: str
+    count: int
+    seconds: float
+
+    @property
+    def rate(self) -> float:
+        return self.count / self.seconds
+
+
+def timed(fn: Callable[[], T]) -> tuple[T, float]:
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def measure(lines: int, phases: list[str]) -> list[Measurement]:
+    source = generate(lines)
+    results = []
+
+    if "lexer" in phases:
+        tokens, seconds = timed(lambda: sum(1 for _ in MLexer(source)))
+        results.append(Measurement("lexer", lines, "tokens", tokens, seconds))
+
+    program, seconds = timed(lambda: MParser(MLexer(source)).parse_program())
+    if "parser" in phases:
+        # includes lexing, the parser pulls its tokens from the lexer
+        nodes = sum(1 for _ in walk(program))
+        results.append(Measurement("parser", lines, "nodes", nodes, seconds))
+
+    compiler = Compiler(optimize=1)
+    _, seconds = timed(lambda: compiler.compile(program))
+    bytecode = compiler.bytecode()
+    if "compiler" in phases:
+        instructions = count_instructions(bytecode)
+        results.append(
+            Measurement("compiler", lines, "instructions", instructions, seconds)
+        )
+
+    if "vm" in phases:
+        vm = VM(bytecode)
+        _, seconds = timed(vm.run)
+        results.append(Measurement("vm", lines, "instructions", vm.executed, seconds))
+
+    if "evaluator" in phases:
+        value, seconds = timed(MEvaluator(program).evaluate)
+        if "vm" in phases and str(value) != str(vm.last_pop):
+            raise AssertionError(f"evaluator {value} != vm {vm.last_pop}")
+        visits = count_visits(program)
+        results.append(Measurement("evaluator", lines, "visits", visits, seconds))
+    return results
+
+
+def scaling(measurements: list[Measurement]) -> list[tuple[int, int, float]]:
+    """
+    Exponent of time over size between consecutive sizes of a phase, 1 is
+    linear, 2 quadratic
+    """
+    points = []
+    for smaller, larger in zip(measurements, measurements[1:]):
+        exponent = math.log(larger.seconds / smaller.seconds) / math.log(
+            larger.lines / smaller.lines
+        )
+        points.append((smaller.lines, larger.lines, exponent))
+    return points
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="throughput of each phase of the pipeline on growing programs"
+    )
+    parser.add_argument(
+        "--lines", type=int, nargs="+", default=SIZES, help="program sizes"
+    )
+    parser.add_argument(
+        "--phase",
+        dest="phases",
+        action="append",
+        choices=PHASES,
+        help="phase to measure, may be repeated, default all",
+    )
+    args = parser.parse_args()
+    phases = args.phases or PHASES
+
+    by_phase: dict[str, list[Measurement]] = {phase: [] for phase in phases}
+    print(f"{'phase':<10} {'lines':>9} {'count':>10} {'seconds':>9} {'rate':>12}")
+    for lines in sorted(args.lines):
+        for m in measure(lines, phases):
+            by_phase[m.phase].append(m)
+            print(
+                f"{m.phase:<10} {m.lines:>9} {m.count:>10} {m.seconds:>9.3f}"
+                f" {m.rate:>12.0f} {m.unit}/s"
+            )
+
+    print(f"\n{'phase':<10} {'lines':>19} {'exponent':>9}")
+    for phase, measurements in by_phase.items():
+        for smaller, larger, exponent in scaling(measurements):
+            flag = "  superlinear" if exponent > SUPERLINEAR else ""
+            print(f"{phase:<10} {smaller:>9}->{larger:<9} {exponent:>9.2f}{flag}")
+
+
+if __name__ == "__main__":
+    main()
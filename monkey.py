@@ -1,10 +1,46 @@
+import argparse
+import contextlib
 import sys
+from pathlib import Path
 
-from pymonkey.compiler.compiler import Compiler
+from pymonkey.allocations import AllocationCounter
+from pymonkey.bench import (
+    BENCH_REPEAT,
+    BENCH_WARMUP,
+    ENGINES,
+    REGRESSION_THRESHOLD,
+    BenchReport,
+    bench_corpus,
+    corpus_files,
+)
+from pymonkey.compiler.compiler import BACKENDS, Bytecode, Compiler
+from pymonkey.compiler.disassembler import Disassembler
+from pymonkey.conformance import CONFORMANCE_ENGINES, FUZZ_PROGRAMS, check_all
+from pymonkey.evaluator.closure_evaluator import ClosureEvaluator
 from pymonkey.evaluator.mevaluator import MEvaluator
+from pymonkey.evaluator.mobject import MObject
+from pymonkey.evaluator.trampoline_evaluator import STACK_LIMIT, TrampolineEvaluator
 from pymonkey.lexer.mlexer import MLexer
+from pymonkey.memo import MemoCache
 from pymonkey.mrepl import repl
+from pymonkey.parser.mast import MProgram
 from pymonkey.parser.mparser import MParser, UnknownTokenException
+from pymonkey.server import (
+    CACHE_SIZE,
+    INSTRUCTION_LIMIT,
+    SOCKET_PATH,
+    TIME_LIMIT,
+    Server,
+    request,
+)
+from pymonkey.transpiler.cache import cache_path, load_module, write_module
+from pymonkey.transpiler.runtime import to_object
+from pymonkey.transpiler.transpiler import Transpiler
+from pymonkey.vm.coverage import CoverageVM
+from pymonkey.vm.jit import JIT_THRESHOLD
+from pymonkey.vm.profiler import PROFILE_INTERVAL, SamplingProfiler
+from pymonkey.vm.register_vm import RegisterVM
+from pymonkey.vm.stats import StatsVM
 from pymonkey.vm.vm import VM
 
 
@@ -40,66 +76,675 @@ def print_lexer_errors(inp: str, lexer: MLexer) -> None:
             print(f"   | {'-' * (err.token.position.pos - 1)}^\n")
 
 
-def build(in_file_path: str, out_file_path: str = "a.mb") -> None:
-    with open(in_file_path, "r") as file:
+def print_runtime_error(err: Exception) -> None:
+    print(f"Error: {err}", file=sys.stderr)
+    sources: dict[str, list[str]] = {}
+    for name, position in getattr(err, "monkey_trace", []):
+        if position is None:
+            print(f"-> in {name}\n", file=sys.stderr)
+            continue
+
+        file, line, column = position
+        print(f"-> File: {file}:{line}:{column} in {name}", file=sys.stderr)
+        if file not in sources:
+            try:
+                with open(file, "r") as source:
+                    sources[file] = source.read().split("\n")
+            except OSError:
+                sources[file] = []
+        if line <= len(sources[file]):
+            print("   |", file=sys.stderr)
+            print(f" {line} | {sources[file][line - 1]}", file=sys.stderr)
+            print(f"   | {'-' * (column - 1)}^\n", file=sys.stderr)
+
+
+def parse_file(file_path: str) -> None | MProgram:
+    with open(file_path, "r") as file:
         input_ = file.read()
 
-    lexer = MLexer(input_)
+    lexer = MLexer(input_, file_path)
     parser = MParser(lexer)
-    try:
-        program = parser.parse_program()
-    except UnknownTokenException:
-        parser = MParser(lexer)
     try:
         program = parser.parse_program()
     except UnknownTokenException:
         print_parser_errors(input_, parser)
+        return None
+    if lexer.errors:
+        print_lexer_errors(input_, lexer)
+        return None
+
+    return program
+
+
+def build(
+    in_file_path: str,
+    out_file_path: str = "a.mb",
+    fold_budget: int = 0,
+    optimize: int = 1,
+    dump_ir: bool = False,
+    dump_cfg: None | str = None,
+    backend: str = "stack",
+) -> None:
+    program = parse_file(in_file_path)
+    if program is None:
         return
 
-    compiler = Compiler()
+    # -O0 turns off every compile time optimization
+    compiler = Compiler(fold_budget if optimize > 0 else 0, optimize, backend)
     compiler.compile(program)
     bytecode = compiler.bytecode()
     bytecode.to_pickle(out_file_path)
 
+    if dump_ir:
+        print(compiler.dump_ir())
+    if dump_cfg is not None:
+        with open(dump_cfg, "w") as file:
+            file.write(compiler.dump_cfg())
+
+    for folded_call in compiler.folded_calls:
+        print(folded_call)
     print("finished building", out_file_path)
 
 
+def transpile(in_file_path: str, out_file_path: None | str = None) -> None | Path:
+    """
+    Transpile a source file to a python module, by default into the cache
+    next to it. A cached module that is up to date is not written again.
+    """
+    with open(in_file_path, "r") as file:
+        source = file.read()
+
+    if out_file_path is not None:
+        path = Path(out_file_path)
+    else:
+        path = cache_path(Path(in_file_path), source)
+        if path.exists():
+            return path
+
+    program = parse_file(in_file_path)
+    if program is None:
+        return None
+    write_module(path, Transpiler.transpile(program, in_file_path))
+    return path
+
+
+def run_transpiled(file_path: str) -> None:
+    path = transpile(file_path)
+    if path is None:
+        return
+    module = load_module(path)
+    print(to_object(module.main()))
+
+
+def disassemble(
+    file_path: str, optimize: int = 1, size_only: bool = False, as_json: bool = False
+) -> None:
+    """
+    Print the functions of a bytecode file, or of a compiled source file,
+    and a size report
+    """
+    if file_path.endswith(".mo") or file_path.endswith(".monkey"):
+        program = parse_file(file_path)
+        if program is None:
+            return
+        compiler = Compiler(optimize=optimize)
+        compiler.compile(program)
+        bytecode = compiler.bytecode()
+    else:
+        bytecode = Bytecode.from_pickle(file_path)
+
+    disassembler = Disassembler(bytecode)
+    report = disassembler.size_report()
+    if as_json:
+        print(report.to_json())
+        return
+    if not size_only:
+        print(disassembler.disassemble(), end="\n\n")
+    print(report)
+
+
+def run_bench(
+    paths: list[str],
+    engines: list[str],
+    warmup: int,
+    repeat: int,
+    save: None | str = None,
+    baseline: None | str = None,
+    threshold: float = REGRESSION_THRESHOLD,
+) -> None:
+    report = bench_corpus(corpus_files(paths), engines, warmup, repeat)
+    print(report)
+    if save is not None:
+        with open(save, "w") as file:
+            file.write(report.to_json())
+    if baseline is None:
+        return
+
+    with open(baseline) as file:
+        regressions = report.compare(BenchReport.from_json(file.read()), threshold)
+    for regression in regressions:
+        print(f"regression: {regression}", file=sys.stderr)
+    if regressions:
+        sys.exit(1)
+
+
+def run_conformance(
+    paths: list[str],
+    engines: list[str],
+    fuzz: int,
+    workloads: int,
+    seed: int,
+    out: None | str = None,
+) -> None:
+    report = check_all(corpus_files(paths), engines, fuzz, workloads, seed)
+    print(report)
+    if out is not None:
+        with open(out, "w") as file:
+            file.write(report.to_json())
+    if report.differences():
+        sys.exit(1)
+
+
+def run_on_server(file_path: str, socket_path: str) -> None:
+    """
+    Run a source or bytecode file on a monkey serve process, stdin is the
+    input of the program unless it is a terminal
+    """
+    input_ = "" if sys.stdin.isatty() else sys.stdin.read()
+    if file_path.endswith(".mo") or file_path.endswith(".monkey"):
+        with open(file_path, "r") as file:
+            response = request(socket_path, source=file.read(), input=input_)
+    else:
+        with open(file_path, "rb") as file:
+            response = request(socket_path, bytecode=file.read(), input=input_)
+
+    print(response.get("output", ""), end="")
+    if "error" in response:
+        print(f"Error: {response['error']}", file=sys.stderr)
+        sys.exit(1)
+    print(response["result"])
+
+
+def run_bytecode(
+    bytecode: Bytecode,
+    memo: None | MemoCache = None,
+    jit_threshold: None | int = None,
+    jit_dump: None | str = None,
+    profile: None | str = None,
+    profile_interval: float = PROFILE_INTERVAL,
+    stats: None | str = None,
+    coverage: None | str = None,
+    allocations: None | AllocationCounter = None,
+) -> None:
+    vm: VM | RegisterVM
+    if coverage is not None:
+        if bytecode.registers is not None:
+            print("Error: --coverage needs bytecode for the stack VM", file=sys.stderr)
+            sys.exit(1)
+        vm = CoverageVM(bytecode, memo)
+    elif stats is not None:
+        if bytecode.registers is not None:
+            print("Error: --stats needs bytecode for the stack VM", file=sys.stderr)
+            sys.exit(1)
+        vm = StatsVM(bytecode, memo, jit_threshold)
+    elif bytecode.registers is not None:
+        vm = RegisterVM(bytecode, memo)
+    else:
+        vm = VM(bytecode, memo, jit_threshold)
+
+    try:
+        if profile is None:
+            with allocations or contextlib.nullcontext():
+                vm.run()
+        else:
+            with SamplingProfiler(vm, profile_interval) as profiler:
+                with allocations or contextlib.nullcontext():
+                    vm.run()
+            with open(profile, "w") as file:
+                file.write(profiler.collapsed())
+            print(profiler.summary(), file=sys.stderr)
+    except Exception as err:
+        # errors of the stack VM carry the monkey frames they happened in
+        if not hasattr(err, "monkey_trace"):
+            raise
+        print_runtime_error(err)
+        sys.exit(1)
+    print(vm.last_pop)
+
+    if isinstance(vm, StatsVM) and stats is not None:
+        with open(stats, "w") as file:
+            file.write(vm.stats.to_json())
+    if isinstance(vm, CoverageVM) and coverage is not None:
+        with open(coverage, "w") as file:
+            file.write(vm.coverage.lcov())
+
+    if isinstance(vm, RegisterVM):
+        return
+
+    if vm.jit is not None:
+        print(
+            f"jit: {len(vm.jit.natives)} functions compiled, "
+            f"{sum(vm.jit.deopts.values())} deopts",
+            file=sys.stderr,
+        )
+        if jit_dump is not None:
+            with open(jit_dump, "w") as file:
+                file.write(vm.jit.dump())
+
+
+def run(
+    file_path: str,
+    use_vm: bool = False,
+    memo: None | MemoCache = None,
+    optimize: int = 1,
+    backend: str = "stack",
+    jit_threshold: None | int = None,
+    jit_dump: None | str = None,
+    transpiled: bool = False,
+    tree_walk: bool = False,
+    stack_limit: None | int = None,
+    profile: None | str = None,
+    profile_interval: float = PROFILE_INTERVAL,
+    stats: None | str = None,
+    coverage: None | str = None,
+    allocations: None | AllocationCounter = None,
+) -> None:
+    """
+    Run a source or bytecode file, allocations counts only while the program
+    runs, not while it is parsed and compiled
+    """
+    if transpiled:
+        run_transpiled(file_path)
+        return
+
+    # run byte file
+    if not (file_path.endswith(".mo") or file_path.endswith(".monkey")):
+        bytecode = Bytecode.from_pickle(file_path)
+        run_bytecode(
+            bytecode,
+            memo,
+            jit_threshold,
+            jit_dump,
+            profile,
+            profile_interval,
+            stats,
+            coverage,
+            allocations,
+        )
+        return
+
+    # run monkey file
+    program = parse_file(file_path)
+    if program is None:
+        return
+
+    # profiler, stats and coverage observe the VM
+    if use_vm or profile or stats or coverage:
+        compiler = Compiler(optimize=optimize, backend=backend)
+        compiler.compile(program)
+        run_bytecode(
+            compiler.bytecode(),
+            memo,
+            jit_threshold,
+            jit_dump,
+            profile,
+            profile_interval,
+            stats,
+            coverage,
+            allocations,
+        )
+        return
+
+    evaluator: MEvaluator | TrampolineEvaluator | ClosureEvaluator
+    if tree_walk:
+        evaluator = MEvaluator(program, memo)
+    elif stack_limit is not None:
+        evaluator = TrampolineEvaluator(program, memo, stack_limit)
+    else:
+        evaluator = ClosureEvaluator(program, memo)
+    with allocations or contextlib.nullcontext():
+        result = evaluator.evaluate()
+    print(result)
+
+
+def argument_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="monkey")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="run a .monkey or bytecode file")
+    run_parser.add_argument("file")
+    run_parser.add_argument(
+        "--vm", action="store_true", help="compile source files and run them in the VM"
+    )
+    run_parser.add_argument(
+        "--tree-walk",
+        action="store_true",
+        help="evaluate the AST node by node instead of compiling it to closures",
+    )
+    run_parser.add_argument(
+        "--deep",
+        action="store_true",
+        help="evaluate with an explicit stack instead of python recursion",
+    )
+    run_parser.add_argument(
+        "--stack-limit",
+        type=int,
+        default=STACK_LIMIT,
+        help="max entries of the --deep stack, more is a stack overflow",
+    )
+    run_parser.add_argument(
+        "--memoize", action="store_true", help="cache results of pure functions"
+    )
+    run_parser.add_argument(
+        "--memo-size", type=int, default=4096, help="max cached results per run"
+    )
+    run_parser.add_argument(
+        "-O", dest="optimize", type=int, default=1, help="optimization level for --vm"
+    )
+    run_parser.add_argument(
+        "--backend", choices=BACKENDS, default="stack", help="VM used by --vm"
+    )
+    run_parser.add_argument(
+        "--jit",
+        action="store_true",
+        help="compile hot pure functions to python in the stack VM",
+    )
+    run_parser.add_argument(
+        "--jit-threshold",
+        type=int,
+        default=JIT_THRESHOLD,
+        help="calls before a function is compiled",
+    )
+    run_parser.add_argument(
+        "--jit-dump", metavar="FILE", help="write the generated python code"
+    )
+    run_parser.add_argument(
+        "--transpiled",
+        action="store_true",
+        help="run the source file as a cached python module",
+    )
+    run_parser.add_argument(
+        "--profile",
+        metavar="FILE",
+        help="sample the VM and write collapsed stacks for flamegraph tools",
+    )
+    run_parser.add_argument(
+        "--profile-interval",
+        type=float,
+        default=PROFILE_INTERVAL * 1000,
+        help="milliseconds of CPU time between samples",
+    )
+    run_parser.add_argument(
+        "--stats",
+        metavar="FILE",
+        help="count executed opcodes, opcode pairs and functions in the VM, as json",
+    )
+    run_parser.add_argument(
+        "--coverage",
+        metavar="FILE",
+        help="run in the VM and write the lines that ran as an lcov report",
+    )
+    run_parser.add_argument(
+        "--allocations",
+        action="store_true",
+        help="report objects created by type and source site, evaluates with"
+        " --tree-walk unless --vm is given",
+    )
+    run_parser.add_argument(
+        "--server",
+        metavar="SOCKET",
+        nargs="?",
+        const=SOCKET_PATH,
+        help="run the file on a 'monkey serve' process",
+    )
+
+    build_parser = commands.add_parser("build", help="compile to a bytecode file")
+    build_parser.add_argument("file")
+    build_parser.add_argument("out", nargs="?", default="a.mb")
+    build_parser.add_argument(
+        "--fold-budget",
+        type=int,
+        default=10000,
+        help="max instructions to evaluate a pure call at compile time, 0 disables",
+    )
+    build_parser.add_argument(
+        "-O",
+        dest="optimize",
+        type=int,
+        default=1,
+        help="optimization level, 0 disables inlining and folding",
+    )
+    build_parser.add_argument(
+        "--dump-ir", action="store_true", help="print the optimized IR"
+    )
+    build_parser.add_argument(
+        "--dump-cfg", metavar="FILE", help="write the control flow graph as dot"
+    )
+    build_parser.add_argument(
+        "--backend", choices=BACKENDS, default="stack", help="VM to build for"
+    )
+
+    transpile_parser = commands.add_parser(
+        "transpile", help="transpile a .monkey file to a python module"
+    )
+    transpile_parser.add_argument("file")
+    transpile_parser.add_argument(
+        "out", nargs="?", help="python file, default the __monkeycache__ module"
+    )
+
+    dis_parser = commands.add_parser(
+        "dis", help="print the functions of a bytecode file and their sizes"
+    )
+    dis_parser.add_argument("file", help="bytecode file, or a source file to compile")
+    dis_parser.add_argument(
+        "-O", dest="optimize", type=int, default=1, help="optimization level of sources"
+    )
+    dis_parser.add_argument(
+        "--size", action="store_true", help="only print the size report"
+    )
+    dis_parser.add_argument(
+        "--json", action="store_true", help="print the size report as json"
+    )
+
+    bench_parser = commands.add_parser(
+        "bench", help="time a corpus of programs in each engine"
+    )
+    bench_parser.add_argument(
+        "paths", nargs="*", help="monkey files or directories, default the corpus"
+    )
+    bench_parser.add_argument(
+        "--engine",
+        dest="engines",
+        action="append",
+        choices=list(ENGINES),
+        help="engine to time, may be repeated, default all",
+    )
+    bench_parser.add_argument(
+        "--warmup", type=int, default=BENCH_WARMUP, help="untimed runs first"
+    )
+    bench_parser.add_argument(
+        "--repeat", type=int, default=BENCH_REPEAT, help="timed runs"
+    )
+    bench_parser.add_argument(
+        "--save", metavar="FILE", help="write the results as json"
+    )
+    bench_parser.add_argument(
+        "--baseline",
+        metavar="FILE",
+        help="results of --save to compare with, exit 1 on a regression",
+    )
+    bench_parser.add_argument(
+        "--threshold",
+        type=float,
+        default=REGRESSION_THRESHOLD,
+        help="slowdown of the median over the baseline that is a regression",
+    )
+
+    conform_parser = commands.add_parser(
+        "conform", help="compare results and errors of the engines on many programs"
+    )
+    conform_parser.add_argument(
+        "paths", nargs="*", help="monkey files or directories, default the corpus"
+    )
+    conform_parser.add_argument(
+        "--engine",
+        dest="engines",
+        action="append",
+        choices=list(ENGINES),
+        help="engine to compare, may be repeated, default tree-walk and vm-O1",
+    )
+    conform_parser.add_argument(
+        "--fuzz", type=int, default=FUZZ_PROGRAMS, help="random small programs"
+    )
+    conform_parser.add_argument(
+        "--workloads", type=int, default=0, help="generated larger programs"
+    )
+    conform_parser.add_argument(
+        "--seed", type=int, default=0, help="seed of the first generated program"
+    )
+    conform_parser.add_argument(
+        "--json", metavar="FILE", help="write every program and outcome as json"
+    )
+
+    serve_parser = commands.add_parser(
+        "serve", help="run programs sent to a unix socket by 'run --server'"
+    )
+    serve_parser.add_argument("--socket", default=SOCKET_PATH)
+    serve_parser.add_argument(
+        "--workers", type=int, default=Server.workers, help="worker processes"
+    )
+    serve_parser.add_argument(
+        "--cache-size",
+        type=int,
+        default=CACHE_SIZE,
+        help="compiled programs kept by each worker",
+    )
+    serve_parser.add_argument(
+        "--instruction-limit",
+        type=int,
+        default=INSTRUCTION_LIMIT,
+        help="max instructions executed per request",
+    )
+    serve_parser.add_argument(
+        "--time-limit",
+        type=float,
+        default=TIME_LIMIT,
+        help="max seconds per request",
+    )
+
+    return parser
+
+
 def main() -> None:
     # start repl if no args
     if len(sys.argv) == 1:
         repl()
         return
 
+    # 'monkey <file>' is short for 'monkey run <file>'
+    argv = sys.argv[1:]
+    if argv[0] not in (
+        "run",
+        "build",
+        "transpile",
+        "dis",
+        "bench",
+        "conform",
+        "serve",
+        "-h",
+        "--help",
+    ):
+        argv = ["run", *argv]
+    args = argument_parser().parse_args(argv)
+
     # build system
-    if sys.argv[1] == "build":
-        build(in_file_path=sys.argv[2], out_file_path=sys.argv[3])
-        return
-
-    # run file in vm
-    if sys.argv[1].endswith(".mo") or sys.argv[1].endswith(".monkey"):
-        with open(sys.argv[1], "r") as file:
-            input_ = file.read()
-
-        # run monkey file
-        lexer = MLexer(input_)
-        parser = MParser(lexer)
-        try:
-            program = parser.parse_program()
-        except UnknownTokenException:
-            print_parser_errors(input_, parser)
-            return
-        if lexer.errors:
-            print_lexer_errors(input_, lexer)
-            return
-        evaluation = MEvaluator(program).evaluate()
+    if args.command == "build":
+        build(
+            args.file,
+            args.out,
+            args.fold_budget,
+            args.optimize,
+            args.dump_ir,
+            args.dump_cfg,
+            args.backend,
+        )
+        return
 
-        print(evaluation)
+    if args.command == "transpile":
+        path = transpile(args.file, args.out)
+        if path is not None:
+            print("finished transpiling", path)
+        return
 
-    else:
-        # run byte file
-        vm = VM.from_bytecode_pickle(sys.argv[1])
-        vm.run()
-        print(vm.last_pop)
+    if args.command == "dis":
+        disassemble(args.file, args.optimize, args.size, args.json)
+        return
+
+    if args.command == "bench":
+        run_bench(
+            args.paths,
+            args.engines or list(ENGINES),
+            args.warmup,
+            args.repeat,
+            args.save,
+            args.baseline,
+            args.threshold,
+        )
+        return
+
+    if args.command == "conform":
+        run_conformance(
+            args.paths,
+            args.engines or CONFORMANCE_ENGINES,
+            args.fuzz,
+            args.workloads,
+            args.seed,
+            args.json,
+        )
+        return
+
+    if args.command == "serve":
+        server = Server(
+            args.socket,
+            args.workers,
+            args.cache_size,
+            args.instruction_limit,
+            args.time_limit,
+        )
+        print(f"serving on {args.socket} with {args.workers} workers")
+        server.serve_forever()
+        return
+
+    if args.server is not None:
+        run_on_server(args.file, args.server)
+        return
+
+    memo: None | MemoCache[MObject] = (
+        MemoCache(args.memo_size) if args.memoize else None
+    )
+    # sites are found from the nodes of the tree walker or the frames of the VM
+    allocations = AllocationCounter(sites=True) if args.allocations else None
+    run(
+        args.file,
+        use_vm=args.vm,
+        memo=memo,
+        optimize=args.optimize,
+        backend=args.backend,
+        jit_threshold=args.jit_threshold if args.jit else None,
+        jit_dump=args.jit_dump,
+        transpiled=args.transpiled,
+        tree_walk=args.tree_walk or args.allocations,
+        stack_limit=args.stack_limit if args.deep else None,
+        profile=args.profile,
+        profile_interval=args.profile_interval / 1000,
+        stats=args.stats,
+        coverage=args.coverage,
+        allocations=allocations,
+    )
+    if allocations is not None:
+        print(allocations.report(), file=sys.stderr)
+    if memo is not None:
+        print(memo, file=sys.stderr)
 
 
 if __name__ == "__main__":
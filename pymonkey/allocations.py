@@ -0,0 +1,125 @@
+import sys
+import tracemalloc
+from collections import Counter
+from dataclasses import dataclass, field
+from types import FrameType
+from typing import Any, Callable, Iterator, Self
+
+from pymonkey.evaluator.mobject import MObject
+from pymonkey.parser.mast import MNode
+from pymonkey.vm.vm import VM
+
+ALLOCATIONS_TOP = 20
+
+
+def approximate_size(obj: MObject) -> int:
+    """
+    Bytes of obj and of its own python value, not of the objects it holds
+    """
+    size = sys.getsizeof(obj)
+    if hasattr(obj, "__dict__"):
+        size += sys.getsizeof(obj.__dict__)
+    value = getattr(obj, "value", None)
+    if isinstance(value, str | list | dict):
+        size += sys.getsizeof(value)
+    return size
+
+
+def current_site(frame: None | FrameType) -> str:
+    """
+    Monkey source position of the code creating an object: the instruction of
+    a VM frame, or the node a tree walking evaluator is at
+    """
+    while frame is not None:
+        local = frame.f_locals
+        vm = local.get("self")
+        if isinstance(vm, VM) and getattr(vm, "frames", None):
+            vm_frame = vm.current_frame()
+            name = vm_frame.function.name or "<anonymous>"
+            position = vm_frame.position()
+            if position is None:
+                return f"{name}@{vm_frame.ip}"
+            return f"{position[0]}:{position[1]}:{position[2]} in {name}"
+        node = local.get("node")
+        if isinstance(node, MNode) and node.token.position is not None:
+            token = node.token.position
+            return f"{token.file}:{token.line + 1}:{token.pos}"
+        frame = frame.f_back
+    return "<unknown>"
+
+
+@dataclass
+class AllocationCounter:
+    """
+    Count the MObjects created while active, by type, and with sites=True
+    also by the source site creating them. The constructors are only wrapped
+    for the duration of the with block. With sites, the peak of the python
+    heap is traced as well
+    """
+
+    sites: bool = False
+    counts: Counter[str] = field(default_factory=Counter)
+    sizes: Counter[str] = field(default_factory=Counter)
+    site_counts: Counter[str] = field(default_factory=Counter)
+    site_sizes: Counter[str] = field(default_factory=Counter)
+    peak: int = 0
+    originals: dict[type, Callable] = field(default_factory=dict)
+    tracing: bool = False
+
+    @classmethod
+    def subclasses(cls, base: type) -> Iterator[type]:
+        yield base
+        sub: type
+        for sub in base.__subclasses__():
+            yield from cls.subclasses(sub)
+
+    def wrap(self, init: Callable) -> Callable:
+        def counting_init(obj: Any, *args: Any, **kwargs: Any) -> None:
+            init(obj, *args, **kwargs)
+            # an __init__ calling the one of its base counts only once
+            if type(obj).__init__ is counting_init:
+                self.count(obj)
+
+        return counting_init
+
+    def count(self, obj: MObject) -> None:
+        name = type(obj).__name__
+        self.counts[name] += 1
+        if not self.sites:
+            return
+
+        size = approximate_size(obj)
+        self.sizes[name] += size
+        site = f"{current_site(sys._getframe(2))} {name}"
+        self.site_counts[site] += 1
+        self.site_sizes[site] += size
+
+    def __enter__(self) -> Self:
+        for cls in self.subclasses(MObject):
+            if "__init__" in cls.__dict__:
+                self.originals[cls] = cls.__dict__["__init__"]
+                setattr(cls, "__init__", self.wrap(cls.__dict__["__init__"]))
+        if self.sites and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.tracing = True
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        for cls, init in self.originals.items():
+            setattr(cls, "__init__", init)
+        self.originals.clear()
+        if self.tracing:
+            self.peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            self.tracing = False
+
+    def report(self, top: int = ALLOCATIONS_TOP) -> str:
+        lines = [f"{sum(self.counts.values())} objects, peak heap {self.peak} bytes"]
+        lines.append("   count      bytes  type")
+        for name, count in self.counts.most_common():
+            lines.append(f"{count:8d} {self.sizes[name]:10d}  {name}")
+        if self.site_counts:
+            lines.append("   count      bytes  site")
+            for site, count in self.site_counts.most_common(top):
+                lines.append(f"{count:8d} {self.site_sizes[site]:10d}  {site}")
+        return "\n".join(lines)
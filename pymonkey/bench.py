@@ -0,0 +1,232 @@
+import json
+import math
+import platform
+import statistics
+import time
+import tracemalloc
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, List
+
+from pymonkey.compiler.compiler import Compiler
+from pymonkey.evaluator.closure_evaluator import ClosureEvaluator
+from pymonkey.evaluator.mevaluator import MEvaluator
+from pymonkey.evaluator.mobject import MObject
+from pymonkey.evaluator.trampoline_evaluator import STACK_LIMIT, TrampolineEvaluator
+from pymonkey.parser.mast import MProgram
+from pymonkey.parser.mparser import parse_source
+from pymonkey.vm.register_vm import RegisterVM
+from pymonkey.vm.vm import VM
+
+CORPUS_PATH = Path(__file__).parent.parent / "benchmarks" / "corpus"
+BENCH_WARMUP = 1
+BENCH_REPEAT = 5
+REGRESSION_THRESHOLD = 0.1
+
+
+def run_vm(program: MProgram, optimize: int, backend: str) -> tuple[MObject, int]:
+    compiler = Compiler(optimize=optimize, backend=backend)
+    compiler.compile(program)
+    bytecode = compiler.bytecode()
+    vm = RegisterVM(bytecode) if backend == "register" else VM(bytecode)
+    vm.run()
+    return vm.last_pop, vm.executed
+
+
+# result and executed instructions of a parsed program, None for evaluators
+ENGINES: Dict[str, Callable[[MProgram], tuple[MObject, None | int]]] = {
+    "closure": lambda program: (ClosureEvaluator(program).evaluate(), None),
+    "tree-walk": lambda program: (MEvaluator(program).evaluate(), None),
+    "deep": lambda program: (
+        TrampolineEvaluator(program, None, STACK_LIMIT).evaluate(),
+        None,
+    ),
+    "vm-O0": lambda program: run_vm(program, 0, "stack"),
+    "vm-O1": lambda program: run_vm(program, 1, "stack"),
+    "register": lambda program: run_vm(program, 1, "register"),
+}
+
+
+def run_source(source: str, engine: str) -> tuple[MObject, None | int]:
+    return ENGINES[engine](parse_source(source))
+
+
+@dataclass
+class BenchResult:
+    program: str
+    engine: str
+    result: None | str = None
+    error: None | str = None
+    # wall seconds of each repetition, from source to result
+    times: List[float] = field(default_factory=list)
+    instructions: None | int = None
+    peak_memory: None | int = None
+
+    @property
+    def median(self) -> None | float:
+        return statistics.median(self.times) if self.times else None
+
+    @property
+    def p95(self) -> None | float:
+        if not self.times:
+            return None
+        ordered = sorted(self.times)
+        return ordered[math.ceil(0.95 * len(ordered)) - 1]
+
+    @property
+    def instructions_per_second(self) -> None | float:
+        if self.instructions is None or not self.median:
+            return None
+        return self.instructions / self.median
+
+    def to_dict(self) -> dict:
+        return {
+            **vars(self),
+            "median": self.median,
+            "p95": self.p95,
+            "instructions_per_second": self.instructions_per_second,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "BenchResult":
+        return cls(
+            data["program"],
+            data["engine"],
+            data["result"],
+            data["error"],
+            data["times"],
+            data["instructions"],
+            data["peak_memory"],
+        )
+
+
+@dataclass
+class BenchReport:
+    warmup: int = BENCH_WARMUP
+    repeat: int = BENCH_REPEAT
+    results: List[BenchResult] = field(default_factory=list)
+
+    def to_json(self) -> str:
+        return json.dumps(
+            {
+                "python": platform.python_version(),
+                "warmup": self.warmup,
+                "repeat": self.repeat,
+                "results": [result.to_dict() for result in self.results],
+            },
+            indent=2,
+        )
+
+    @classmethod
+    def from_json(cls, text: str) -> "BenchReport":
+        data = json.loads(text)
+        return cls(
+            data["warmup"],
+            data["repeat"],
+            [BenchResult.from_dict(result) for result in data["results"]],
+        )
+
+    def compare(
+        self, baseline: "BenchReport", threshold: float = REGRESSION_THRESHOLD
+    ) -> List[str]:
+        """
+        Programs and engines whose median time grew by more than threshold
+        over the baseline, or which fail but did not before
+        """
+        previous = {(r.program, r.engine): r for r in baseline.results}
+        regressions = []
+        for result in self.results:
+            before = previous.get((result.program, result.engine))
+            if before is None or before.median is None:
+                continue
+            name = f"{result.program} {result.engine}"
+            if result.median is None:
+                regressions.append(f"{name}: fails with {result.error}")
+            elif result.median > before.median * (1 + threshold):
+                regressions.append(
+                    f"{name}: {before.median * 1000:.2f}ms ->"
+                    f" {result.median * 1000:.2f}ms"
+                    f" ({100 * (result.median / before.median - 1):+.0f}%)"
+                )
+        return regressions
+
+    def __str__(self) -> str:
+        lines = [
+            f"{'program':<12} {'engine':<10} {'median':>10} {'p95':>10}"
+            f" {'instr/s':>12} {'peak KiB':>9}  result"
+        ]
+        for r in self.results:
+            median, p95 = r.median, r.p95
+            if median is None or p95 is None:
+                lines.append(f"{r.program:<12} {r.engine:<10} error: {r.error}")
+                continue
+            rate = f"{r.instructions_per_second:12.0f}" if r.instructions else " " * 12
+            lines.append(
+                f"{r.program:<12} {r.engine:<10} {median * 1000:8.2f}ms"
+                f" {p95 * 1000:8.2f}ms {rate} {(r.peak_memory or 0) / 1024:9.0f}"
+                f"  {r.result}"
+            )
+        return "\n".join(lines)
+
+
+def corpus_files(paths: List[str]) -> List[Path]:
+    """
+    Monkey files of the given files and directories, the bundled corpus when
+    none are given
+    """
+    files = []
+    for path in map(Path, paths or [str(CORPUS_PATH)]):
+        if path.is_dir():
+            files += sorted(path.glob("*.monkey"))
+        else:
+            files.append(path)
+    return files
+
+
+def bench(
+    source: str,
+    program: str,
+    engine: str,
+    warmup: int = BENCH_WARMUP,
+    repeat: int = BENCH_REPEAT,
+) -> BenchResult:
+    """
+    Time one program in one engine, the peak memory is taken from a separate
+    run since tracing allocations slows it down
+    """
+    result = BenchResult(program, engine)
+    try:
+        for _ in range(warmup):
+            run_source(source, engine)
+        for _ in range(repeat):
+            start = time.perf_counter()
+            value, result.instructions = run_source(source, engine)
+            result.times.append(time.perf_counter() - start)
+        result.result = str(value)
+
+        tracemalloc.start()
+        try:
+            run_source(source, engine)
+            result.peak_memory = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    except Exception as err:
+        # e.g. deep recursion in the evaluators that recurse in python
+        result.error = f"{type(err).__name__}: {err}"
+        result.times = []
+        result.instructions = None
+    return result
+
+
+def bench_corpus(
+    files: List[Path],
+    engines: List[str],
+    warmup: int = BENCH_WARMUP,
+    repeat: int = BENCH_REPEAT,
+) -> BenchReport:
+    report = BenchReport(warmup, repeat)
+    for file in files:
+        source = file.read_text()
+        for engine in engines:
+            report.results.append(bench(source, file.stem, engine, warmup, repeat))
+    return report
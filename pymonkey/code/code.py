@@ -1,11 +1,102 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from enum import Enum
-from typing import Generator
+from typing import Generator, Iterator, List, Self
+
+
+def encode_varint(value: int, out: bytearray) -> None:
+    while value >= 0x80:
+        out.append(value & 0x7F | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def decode_varints(data: bytes) -> Iterator[int]:
+    value = 0
+    shift = 0
+    for byte in data:
+        value |= (byte & 0x7F) << shift
+        shift += 7
+        if not byte & 0x80:
+            yield value
+            value = 0
+            shift = 0
+
+
+@dataclass
+class LineTable:
+    """
+    Source positions of the instructions of a function, run-length encoded:
+    every run is three varints, the number of instructions and the line and
+    column they share. Line 0 is an unknown position. It is only decoded when
+    a position is looked up. Instructions compiled from the body of an inlined
+    function are listed as (start, end, function name) ranges
+    """
+
+    file: str
+    runs: bytes
+    inlined: tuple[tuple[int, int, str], ...] = ()
+
+    @classmethod
+    def encode(
+        cls,
+        file: str,
+        positions: List[tuple[int, int]],
+        inlined: None | List[None | str] = None,
+    ) -> Self:
+        runs = bytearray()
+        count = 0
+        for i, position in enumerate(positions):
+            count += 1
+            if i + 1 == len(positions) or positions[i + 1] != position:
+                encode_varint(count, runs)
+                encode_varint(position[0], runs)
+                encode_varint(position[1], runs)
+                count = 0
+
+        ranges = []
+        names = inlined or []
+        for i, name in enumerate(names):
+            if name is not None and (i == 0 or names[i - 1] != name):
+                start = i
+            if name is not None and (i + 1 == len(names) or names[i + 1] != name):
+                ranges.append((start, i + 1, name))
+        return cls(file, bytes(runs), tuple(ranges))
+
+    def entries(self) -> Iterator[tuple[int, int, int]]:
+        """
+        First instruction, line and column of every run
+        """
+        start = 0
+        varints = decode_varints(self.runs)
+        for count, line, column in zip(varints, varints, varints):
+            yield start, line, column
+            start += count
+
+    def lookup(self, index: int) -> None | tuple[int, int]:
+        """
+        1-based line and column of instruction index
+        """
+        varints = decode_varints(self.runs)
+        for count, line, column in zip(varints, varints, varints):
+            if index < count:
+                return (line, column) if line > 0 else None
+            index -= count
+        return None
+
+    def inlined_at(self, index: int) -> None | str:
+        """
+        Name of the inlined function instruction index was compiled from
+        """
+        for start, end, name in self.inlined:
+            if start <= index < end:
+                return name
+        return None
 
 
 @dataclass
 class Instructions:
     instructions: list[bytearray]
+    lines: None | LineTable = field(default=None, compare=False)
 
     def __len__(self) -> int:
         return self.instructions.__len__()
@@ -81,6 +172,8 @@ class MOpcode(Enum):
     OpGetLocal = 0x19
     OpSetLocal = 0x20
 
+    OpGetBuiltin = 0x21
+
     OpUndefined = 0xFF
 
     @property
@@ -137,6 +230,7 @@ definitions: dict[str, list[int]] = {
     "OpUndefined": [],
     "OpGetLocal": [2],
     "OpSetLocal": [2],
+    "OpGetBuiltin": [2],
 }
 
 
@@ -0,0 +1,92 @@
+from dataclasses import dataclass
+from enum import IntEnum
+from typing import List
+
+# a register instruction is (op, a, b, c), unused operands are 0
+RInstruction = tuple[int, int, int, int]
+
+
+class ROp(IntEnum):
+    """
+    Three address instructions of the register VM. Operands >= 0 are
+    registers of the frame, negative operands ~k are the constant k.
+    """
+
+    MOVE = 0x01  # a = b
+    ADD = 0x02  # a = b + c
+    SUB = 0x03
+    MUL = 0x04
+    DIV = 0x05
+    EQ = 0x06  # a = b == c
+    NE = 0x07
+    GT = 0x08  # a = b > c
+    NEG = 0x09  # a = -b
+    NOT = 0x0A  # a = !b
+    JMP = 0x0B  # jump to a
+    JMPF = 0x0C  # jump to b if a is not truthy
+    GETG = 0x0D  # a = global b
+    SETG = 0x0E  # global a = b
+    GETB = 0x0F  # a = builtin b
+    ARRAY = 0x10  # a = [b, ..., b + c - 1]
+    HASH = 0x11  # a = {b: b + 1, ..., b + c - 2: b + c - 1}
+    INDEX = 0x12  # a = b[c]
+    CALL = 0x13  # a = b(b + 1, ..., b + c)
+    RET = 0x14  # return a
+    POP = 0x15  # value of an expression statement of the main program is a
+
+
+# kind of each operand: v is a register or constant, n a plain number
+OPERANDS: dict[ROp, str] = {
+    ROp.MOVE: "vv",
+    ROp.ADD: "vvv",
+    ROp.SUB: "vvv",
+    ROp.MUL: "vvv",
+    ROp.DIV: "vvv",
+    ROp.EQ: "vvv",
+    ROp.NE: "vvv",
+    ROp.GT: "vvv",
+    ROp.NEG: "vv",
+    ROp.NOT: "vv",
+    ROp.JMP: "n",
+    ROp.JMPF: "vn",
+    ROp.GETG: "vn",
+    ROp.SETG: "nv",
+    ROp.GETB: "vn",
+    ROp.ARRAY: "vvn",
+    ROp.HASH: "vvn",
+    ROp.INDEX: "vvv",
+    ROp.CALL: "vvn",
+    ROp.RET: "v",
+    ROp.POP: "v",
+}
+
+
+@dataclass
+class RegisterCode:
+    """
+    Register code of one function. Parameters are in the first registers,
+    followed by the other locals and the temporaries.
+    """
+
+    code: List[RInstruction]
+    num_registers: int
+
+    def __len__(self) -> int:
+        return len(self.code)
+
+    def __str__(self) -> str:
+        lines = []
+        for position, (op, *operands) in enumerate(self.code):
+            rop = ROp(op)
+            shown = [
+                RegisterCode.operand_str(o) if kind == "v" else str(o)
+                for kind, o in zip(OPERANDS[rop], operands)
+            ]
+            lines.append(f"{position:04d} {rop.name} {', '.join(shown)}")
+        return "\n".join(lines)
+
+    @classmethod
+    def operand_str(cls, operand: int) -> str:
+        if operand < 0:
+            return f"k{~operand}"
+        return f"r{operand}"
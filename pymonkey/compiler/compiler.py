@@ -1,16 +1,37 @@
 import pickle
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from typing import List
 
-from pymonkey.code.code import Encoder, Instructions, MOpcode
-from pymonkey.compiler.symbol_table import SymbolScope, SymbolTable
-from pymonkey.evaluator.mobject import MIntegerObject, MObject, MStringObject
+from pymonkey.code.code import Instructions, MOpcode
+from pymonkey.code.registers import RegisterCode
+from pymonkey.compiler.inliner import INLINE_THRESHOLD, InlineAnalysis, InlineCandidate
+from pymonkey.compiler.ir import BasicBlock, BytecodeEmitter, IRFunction, IRInstruction
+from pymonkey.compiler.passes import PassManager
+from pymonkey.compiler.purity import PurityAnalysis
+from pymonkey.compiler.registers import RegisterAllocator
+from pymonkey.compiler.symbol_table import Symbol, SymbolScope, SymbolTable
+from pymonkey.evaluator.mbuiltins import Builtins
+from pymonkey.evaluator.mobject import (
+    MArrayObject,
+    MBooleanObject,
+    MHashMapObject,
+    MIntegerObject,
+    MNullObject,
+    MObject,
+    MStringObject,
+    MValuedObject,
+)
+from pymonkey.lexer.mtoken import MToken
+from pymonkey.memo import MemoCache
 from pymonkey.object.object import CompliedFunction
 from pymonkey.parser.mast import (
     MArrayExpression,
+    MAssignStatement,
     MBlockStatement,
     MBooleanExpression,
+    MBreakStatement,
     MCallExpression,
+    MContinueStatement,
     MExpressionStatement,
     MFunctionExpression,
     MHashMapExpression,
@@ -24,32 +45,147 @@ from pymonkey.parser.mast import (
     MPrefixExpression,
     MProgram,
     MReturnStatement,
+    MStatement,
     MStringExpression,
+    MWhileStatement,
 )
-from pymonkey.util import flog
+
+BACKENDS = ("stack", "register")
 
 
 @dataclass
 class Bytecode:
     instructions: Instructions
     constants: List[MObject]
+    registers: None | RegisterCode = None
+    # names of the globals by index, for the disassembler
+    global_names: tuple[str, ...] = ()
+
+    @classmethod
+    def from_pickle(cls, file_name: str) -> "Bytecode":
+        with open(file_name, "rb") as file:
+            return pickle.load(file)
 
     def to_pickle(self, file_name) -> None:
         with open(file_name, "wb") as file:
             pickle.dump(self, file)
 
+    def __getstate__(self) -> dict:
+        # constant aggregates are stored as plain python values, which pickle
+        # far more compactly than one object per element
+        constants = [
+            ConstantAggregate.pack(c)
+            if isinstance(c, MArrayObject | MHashMapObject)
+            else c
+            for c in self.constants
+        ]
+        return {
+            "instructions": self.instructions,
+            "constants": constants,
+            "registers": self.registers,
+            "global_names": self.global_names,
+        }
+
+    def __setstate__(self, state: dict) -> None:
+        self.instructions = state["instructions"]
+        self.registers = state.get("registers")
+        self.global_names = state.get("global_names", ())
+        self.constants = [
+            ConstantAggregate.unpack(c.value) if isinstance(c, ConstantAggregate) else c
+            for c in state["constants"]
+        ]
+
+
+@dataclass
+class ConstantAggregate:
+    """
+    Compact file encoding of an array or hashmap literal built from constants.
+    Arrays are stored as lists, hashmaps as flat (key, value, ...) tuples.
+    """
+
+    value: list | tuple
+
+    @classmethod
+    def pack(cls, obj: MObject) -> "ConstantAggregate":
+        value = cls._to_native(obj)
+        if not isinstance(value, list | tuple):
+            raise TypeError(f"not an array or hashmap {obj}")
+        return ConstantAggregate(value)
+
+    @classmethod
+    def unpack(cls, value: object) -> MObject:
+        if isinstance(value, list):
+            return MArrayObject([cls.unpack(v) for v in value])
+        if isinstance(value, tuple):
+            hashmap: dict[MValuedObject, MObject] = {}
+            for i in range(0, len(value), 2):
+                key = cls.unpack(value[i])
+                if not isinstance(key, MValuedObject):
+                    raise TypeError("hashmap key not hashable")
+                hashmap[key] = cls.unpack(value[i + 1])
+            return MHashMapObject(hashmap)
+        if isinstance(value, bool):
+            return MBooleanObject(value)
+        if isinstance(value, int):
+            return MIntegerObject(value)
+        if isinstance(value, str):
+            return MStringObject(value)
+        raise TypeError(f"unknown constant aggregate value {value!r}")
+
+    @classmethod
+    def _to_native(cls, obj: MObject) -> object:
+        if isinstance(obj, MArrayObject):
+            return [cls._to_native(o) for o in obj.value]
+        if isinstance(obj, MHashMapObject):
+            flat: list[object] = []
+            for key, value in obj.value.items():
+                flat.append(cls._to_native(key))
+                flat.append(cls._to_native(value))
+            return tuple(flat)
+        if isinstance(obj, MIntegerObject | MStringObject | MBooleanObject):
+            return obj.value
+        raise TypeError(f"not a constant aggregate {obj}")
+
 
 @dataclass
-class EmittedInstruction:
-    opcode: MOpcode
-    position: int
+class LoopContext:
+    start: BasicBlock
+    exit: BasicBlock
 
 
 @dataclass
 class CompilationScope:
-    instructions: Instructions
-    last_instruction: EmittedInstruction
-    previous_instruction: EmittedInstruction
+    function: IRFunction
+    loops: List[LoopContext] = field(default_factory=list)
+
+    @property
+    def instructions(self) -> Instructions:
+        return BytecodeEmitter.emit(self.function)
+
+
+@dataclass
+class FoldedCall:
+    call: str
+    # resolved functions and constant arguments, see Compiler.fold_key
+    key: tuple
+    result: MObject
+
+    def __str__(self) -> str:
+        return f"folded {self.call} -> {self.result}"
+
+
+@dataclass
+class CompilerCheckpoint:
+    """
+    State of the global scope of a compiler, to roll an input back
+    """
+
+    symbol_table: SymbolTable
+    store: dict[str, Symbol]
+    num_definitions: int
+    num_constants: int
+    num_functions: int
+    inline_candidates: dict[str, InlineCandidate]
 
 
 @dataclass
@@ -58,16 +194,40 @@ class Compiler:
     symbol_table: SymbolTable
     scopes: List[CompilationScope]
     scope_index: int
-
-    def __init__(self) -> None:
+    fold_budget: int
+    purity: PurityAnalysis
+    folded_calls: List[FoldedCall]
+    optimize: int
+    inline_functions: dict[str, MFunctionExpression]
+    inline_candidates: dict[str, InlineCandidate]
+    inlining: List[str]
+    passes: PassManager
+    ir_functions: List[IRFunction]
+    backend: str
+    # (file, line, column) of the node being compiled
+    position: None | tuple[str, int, int]
+
+    def __init__(
+        self, fold_budget: int = 0, optimize: int = 0, backend: str = "stack"
+    ) -> None:
+        if backend not in BACKENDS:
+            raise ValueError("unknown backend", backend)
+        self.backend = backend
+        self.fold_budget = fold_budget
+        self.purity = PurityAnalysis({}, set(), {})
+        self.folded_calls = []
+        self.optimize = optimize
+        self.inline_functions = {}
+        self.inline_candidates = {}
+        self.inlining = []
+        self.passes = PassManager.for_level(optimize)
+        self.ir_functions = []
+        self.position = None
         self.constants = []
         self.symbol_table = SymbolTable()
-        main_scope = CompilationScope(
-            Instructions([]),
-            EmittedInstruction(MOpcode.OpUndefined, 0),
-            EmittedInstruction(MOpcode.OpUndefined, 0),
-        )
-        self.scopes = [main_scope]
+        for i, name in enumerate(Builtins().fns):
+            self.symbol_table.define_builtin(i, name)
+        self.scopes = [CompilationScope(IRFunction("main"))]
         self.scope_index = 0
 
     def __str__(self) -> str:
@@ -81,27 +241,48 @@ class Compiler:
     def current_instructions(self) -> Instructions:
         return self.scopes[self.scope_index].instructions
 
-    def enter_scope(self) -> None:
-        scope = CompilationScope(
-            Instructions([]),
-            EmittedInstruction(MOpcode.OpUndefined, 0),
-            EmittedInstruction(MOpcode.OpUndefined, 0),
-        )
-        self.scopes.append(scope)
+    def current_function(self) -> IRFunction:
+        return self.scopes[self.scope_index].function
+
+    def enter_scope(self, name: str = "") -> None:
+        self.scopes.append(CompilationScope(IRFunction(name)))
         self.scope_index += 1
         self.symbol_table = SymbolTable(self.symbol_table)
 
     def leave_scope(self) -> Instructions:
-        instructions = self.current_instructions()
+        function = self.current_function()
+        self.passes.run(function)
+        self.ir_functions.append(function)
+        instructions = BytecodeEmitter.emit(function)
         self.scopes.pop()
         self.scope_index -= 1
         if self.symbol_table.outer is not None:
             self.symbol_table = self.symbol_table.outer
         return instructions
 
-    @flog
     def compile(self, node: MNode) -> None:
+        # instructions of node get the position of its token, the ones its
+        # parent emits after it get the parent's again
+        outer_position = self.position
+        token = getattr(node, "token", None)
+        token_position = token.position if isinstance(token, MToken) else None
+        if token_position is not None:
+            self.position = (
+                token_position.file,
+                token_position.line + 1,
+                token_position.pos,
+            )
+        try:
+            self.compile_node(node)
+        finally:
+            self.position = outer_position
+
+    def compile_node(self, node: MNode) -> None:
         if isinstance(node, MProgram):
+            self.purity = PurityAnalysis.analyze(node)
+            self.inline_functions = InlineAnalysis.analyze(
+                node, INLINE_THRESHOLD[min(self.optimize, max(INLINE_THRESHOLD))]
+            )
             for stmt in node.statements:
                 self.compile(stmt)
 
@@ -170,67 +351,107 @@ class Compiler:
                 raise ValueError
 
         elif isinstance(node, MIfExpression):
-            self.compile(node.condition)
-            jump_not_truthy_pos = self.emit(MOpcode.OpJumpNotTruthy, 65535)
-            self.compile(node.consequence)
-            if self.scopes[self.scope_index].last_instruction.opcode == MOpcode.OpPop:
-                self.current_instructions().instructions.pop()
-                self.scopes[self.scope_index].last_instruction = self.scopes[
-                    self.scope_index
-                ].previous_instruction
+            function = self.current_function()
+            alternative = function.new_block()
+            after = function.new_block()
 
-            jump_pos = self.emit(MOpcode.OpJump, 65535)
-
-            after_consequence_pos = len(self.current_instructions().instructions)
-            self.current_instructions().instructions[
-                jump_not_truthy_pos
-            ] = Encoder.make(MOpcode.OpJumpNotTruthy, after_consequence_pos)
+            self.compile(node.condition)
+            self.emit_jump(MOpcode.OpJumpNotTruthy, alternative)
+            function.start_block(function.new_block())
+            self.compile_block_value(node.consequence)
+            self.emit_jump(MOpcode.OpJump, after)
 
+            function.start_block(alternative)
             if node.alternative is None:
                 self.emit(MOpcode.OpNull)
             else:
-                self.compile(node.alternative)
-                if (
-                    self.scopes[self.scope_index].last_instruction.opcode
-                    == MOpcode.OpPop
-                ):
-                    self.current_instructions().instructions.pop()
-                    self.scopes[self.scope_index].last_instruction = self.scopes[
-                        self.scope_index
-                    ].previous_instruction
-
-            after_alternative_pos = len(self.current_instructions().instructions)
-            self.current_instructions().instructions[jump_pos] = Encoder.make(
-                MOpcode.OpJump, after_alternative_pos
-            )
+                self.compile_block_value(node.alternative)
+
+            function.start_block(after)
 
         elif isinstance(node, MBlockStatement):
             for stmt in node.statements:
                 self.compile(stmt)
 
+        elif isinstance(node, MWhileStatement):
+            function = self.current_function()
+            loop = LoopContext(function.new_block(), function.new_block())
+
+            function.start_block(loop.start)
+            self.compile(node.condition)
+            self.emit_jump(MOpcode.OpJumpNotTruthy, loop.exit)
+            function.start_block(function.new_block())
+
+            self.scopes[self.scope_index].loops.append(loop)
+            self.compile(node.body)
+            self.scopes[self.scope_index].loops.pop()
+            self.emit_jump(MOpcode.OpJump, loop.start)
+
+            function.start_block(loop.exit)
+            # a loop evaluates to null, like in the evaluator
+            self.emit(MOpcode.OpNull)
+            self.emit(MOpcode.OpPop)
+
+        elif isinstance(node, MBreakStatement):
+            if not self.scopes[self.scope_index].loops:
+                raise ValueError("break outside loop")
+            loop = self.scopes[self.scope_index].loops[-1]
+            self.emit_jump(MOpcode.OpJump, loop.exit)
+
+        elif isinstance(node, MContinueStatement):
+            if not self.scopes[self.scope_index].loops:
+                raise ValueError("continue outside loop")
+            loop = self.scopes[self.scope_index].loops[-1]
+            self.emit_jump(MOpcode.OpJump, loop.start)
+
         elif isinstance(node, MLetStatement):
-            self.compile(node.value)
-            symbol_set = self.symbol_table.define(node.name.value)
-            if symbol_set.scope == SymbolScope.Global:
-                self.emit(MOpcode.OpSetGlobal, symbol_set.index)
+            if isinstance(node.value, MFunctionExpression):
+                # define the name first, so that the function can call itself
+                symbol_set = self.symbol_table.define(node.name.value)
+                self.compile_function(node.value, node.name.value)
+                if self.inline_functions.get(node.name.value) is node.value:
+                    self.add_inline_candidate(node.name.value, node.value)
             else:
-                self.emit(MOpcode.OpSetLocal, symbol_set.index)
+                self.compile(node.value)
+                symbol_set = self.symbol_table.define(node.name.value)
+            self.emit_store(symbol_set)
+
+        elif isinstance(node, MAssignStatement):
+            self.compile(node.value)
+            symbol_assign = self.symbol_table.resolve(node.name.value)
+            if symbol_assign is None:
+                raise ValueError("undefined variable", node.name.value)
+            if symbol_assign.scope == SymbolScope.Builtin:
+                raise ValueError("cannot assign to builtin", node.name.value)
+            if (
+                symbol_assign.scope == SymbolScope.Local
+                and node.name.value not in self.symbol_table.store
+            ):
+                raise ValueError("cannot assign to enclosing variable", node.name.value)
+            self.emit_store(symbol_assign)
 
         elif isinstance(node, MIdentifier):
             symbol_get = self.symbol_table.resolve(node.value)
             if symbol_get is None:
                 raise ValueError("undefined variable", node.value)
-            if symbol_get.scope == SymbolScope.Global:
-                self.emit(MOpcode.OpGetGlobal, symbol_get.index)
-            else:
-                self.emit(MOpcode.OpGetLocal, symbol_get.index)
+            self.emit_load(symbol_get)
 
         elif isinstance(node, MArrayExpression):
+            aggregate = Compiler.constant_literal(node)
+            if aggregate is not None:
+                self.emit(MOpcode.OpConstant, self.add_constant(aggregate))
+                return
+
             for elem in node.value:
                 self.compile(elem)
             self.emit(MOpcode.OpArray, len(node.value))
 
         elif isinstance(node, MHashMapExpression):
+            aggregate = Compiler.constant_literal(node)
+            if aggregate is not None:
+                self.emit(MOpcode.OpConstant, self.add_constant(aggregate))
+                return
+
             for key, value in node.pairs.items():
                 self.compile(key)
                 self.compile(value)
@@ -242,34 +463,17 @@ class Compiler:
             self.emit(MOpcode.OpIndex)
 
         elif isinstance(node, MFunctionExpression):
-            self.enter_scope()
-
-            for param in node.parameters:
-                if not isinstance(param, MIdentifier):
-                    raise TypeError("function parameter is not an identifier")
-                self.symbol_table.define(param.value)
+            self.compile_function(node)
 
-            self.compile(node.body)
+        elif isinstance(node, MCallExpression):
+            folded = self.fold_call(node)
+            if folded is not None:
+                self.emit_constant(folded)
+                return
 
-            if self.last_instruction_is(MOpcode.OpPop):
-                last_pos = self.scopes[self.scope_index].last_instruction.position
-                self.current_instructions().instructions[last_pos] = Encoder.make(
-                    MOpcode.OpReturnValue
-                )
-                self.scopes[
-                    self.scope_index
-                ].last_instruction.opcode = MOpcode.OpReturnValue
-            if not self.last_instruction_is(MOpcode.OpReturnValue):
-                self.emit(MOpcode.OpReturn)
-
-            num_locals = self.symbol_table.num_definitions
-            instructions = self.leave_scope()
-            compiled_fn = CompliedFunction(
-                instructions, num_locals, len(node.parameters)
-            )
-            self.emit(MOpcode.OpConstant, self.add_constant(compiled_fn))
+            if self.inline_call(node):
+                return
 
-        elif isinstance(node, MCallExpression):
             self.compile(node.function)
 
             for arg in node.arguments:
@@ -278,44 +482,392 @@ class Compiler:
             self.emit(MOpcode.OpCall, len(node.arguments))
 
         elif isinstance(node, MReturnStatement):
-            print("return stmt")
             self.compile(node.value)
             self.emit(MOpcode.OpReturnValue)
 
         else:
             raise TypeError(f"unknown MObject {node}")
 
-    @flog
-    def emit(self, op: MOpcode, *operands: int) -> int:
-        ins = Encoder.make(op, *operands)
-        pos = self.add_instruction(ins)
-        self.scopes[self.scope_index].previous_instruction = self.scopes[
-            self.scope_index
-        ].last_instruction
-        self.scopes[self.scope_index].last_instruction = EmittedInstruction(op, pos)
-        return pos
-
-    @flog
-    def add_instruction(self, ins: bytearray) -> int:
-        pos_new_ins = len(self.current_instructions())
-        updated_ins = self.current_instructions()
-        updated_ins.append(ins)
-        self.scopes[self.scope_index].instructions = updated_ins
-        return pos_new_ins
-
-    @flog
+    def compile_function(self, node: MFunctionExpression, name: str = "") -> None:
+        self.enter_scope(name)
+
+        for param in node.parameters:
+            if not isinstance(param, MIdentifier):
+                raise TypeError("function parameter is not an identifier")
+            self.symbol_table.define(param.value)
+
+        self.compile(node.body)
+
+        last = self.current_function().last_instruction()
+        if last is not None and last.opcode == MOpcode.OpPop:
+            # the implicit return is at the last expression
+            self.remove_last_pop()
+            self.current_function().append(
+                IRInstruction(
+                    MOpcode.OpReturnValue,
+                    position=last.position,
+                    inlined=last.inlined,
+                )
+            )
+        if not self.last_instruction_is(MOpcode.OpReturnValue):
+            self.emit(MOpcode.OpReturn)
+
+        num_locals = self.symbol_table.num_definitions
+        local_names = tuple(self.symbol_table.names)
+        instructions = self.leave_scope()
+        compiled_fn = CompliedFunction(
+            instructions,
+            num_locals,
+            len(node.parameters),
+            name,
+            node.pure,
+            local_names=local_names,
+        )
+        if self.backend == "register":
+            compiled_fn.registers = RegisterAllocator.translate(
+                self.ir_functions[-1], num_locals, self.constants
+            )
+        self.emit(MOpcode.OpConstant, self.add_constant(compiled_fn))
+
+    def add_inline_candidate(self, name: str, fn: MFunctionExpression) -> None:
+        body = InlineAnalysis.body_expression(fn)
+        if body is None or self.scope_index != 0:
+            return
+
+        symbols = {}
+        for free_name in [name, *InlineAnalysis.free_names(fn)]:
+            symbol = self.symbol_table.resolve(free_name)
+            if symbol is None:
+                return
+            symbols[free_name] = symbol
+
+        parameters = [p.value for p in fn.parameters if isinstance(p, MIdentifier)]
+        self.inline_candidates[name] = InlineCandidate(name, parameters, body, symbols)
+
+    def inline_call(self, node: MCallExpression) -> bool:
+        """
+        Compile the body of a small global function in place of a call to it.
+        The arguments are stored in slots of the current scope, one per
+        parameter position and inlining depth, so every call site reuses them
+        """
+        if not isinstance(node.function, MIdentifier):
+            return False
+
+        candidate = self.inline_candidates.get(node.function.value)
+        if candidate is None or candidate.name in self.inlining:
+            return False
+        if len(node.arguments) != len(candidate.parameters):
+            return False
+        # the body must see the same variables as at its definition
+        for name, symbol in candidate.symbols.items():
+            if self.symbol_table.resolve(name) != symbol:
+                return False
+
+        # calls inlined in the arguments reuse the slots of this depth, so
+        # all arguments are evaluated before any is stored
+        for arg in node.arguments:
+            self.compile(arg)
+        depth = len(self.inlining)
+        slot_names = [f"arg#{depth}.{i}" for i in range(len(node.arguments))]
+        for slot_name in reversed(slot_names):
+            slot = self.symbol_table.store.get(slot_name)
+            if slot is None:
+                slot = self.symbol_table.define(slot_name)
+            self.emit_store(slot)
+
+        self.inlining.append(candidate.name)
+        self.compile(candidate.substitute(slot_names))
+        self.inlining.pop()
+        return True
+
+    def fold_call(self, node: MCallExpression) -> None | MObject:
+        """
+        Run a call of a pure global function with constant arguments at compile
+        time. Returns None if the call can not be folded or takes more than
+        fold_budget instructions.
+        """
+        if self.fold_budget <= 0:
+            return None
+
+        names = self.foldable_functions(node)
+        if names is None:
+            return None
+
+        # the same text can call another function, e.g. in a shadowing scope
+        key = self.fold_key(node)
+        for folded_call in self.folded_calls:
+            if folded_call.key == key:
+                return folded_call.result
+
+        token = node.token
+        statements: List[MStatement] = [
+            MLetStatement(MIdentifier(name, token), fn, token)
+            for name, fn in self.purity.functions.items()
+            if name in names
+        ]
+        statements.append(MExpressionStatement(node, token))
+
+        # imported here, the vm itself depends on the compiler
+        from pymonkey.vm.vm import VM
+
+        try:
+            compiler = Compiler()
+            compiler.compile(MProgram(statements))
+            vm = VM(compiler.bytecode(), MemoCache())
+            vm.run(self.fold_budget)
+        except Exception:
+            return None
+
+        result = vm.last_pop
+        if not Compiler.is_constant_value(result):
+            return None
+
+        self.folded_calls.append(FoldedCall(str(node), key, result))
+        return result
+
+    def fold_key(self, node: MNode) -> tuple:
+        """
+        Identity of a foldable node: the symbols and definitions of the called
+        functions and the values of the constant arguments
+        """
+        constant = Compiler.constant_literal(node)
+        if constant is not None:
+            return ("constant", repr(constant))
+
+        assert isinstance(node, MCallExpression)
+        assert isinstance(node.function, MIdentifier)
+        name = node.function.value
+        return (
+            self.symbol_table.resolve(name),
+            id(self.purity.functions[name]),
+            tuple(self.fold_key(arg) for arg in node.arguments),
+        )
+
+    def foldable_functions(self, node: MNode) -> None | set[str]:
+        """
+        Functions needed to evaluate node at compile time, or None if node is
+        not made of constants and calls to defined pure global functions
+        """
+        if Compiler.constant_literal(node) is not None:
+            return set()
+
+        if not isinstance(node, MCallExpression):
+            return None
+        if not isinstance(node.function, MIdentifier):
+            return None
+        if node.function.value not in self.purity.pure:
+            return None
+
+        names = set(self.purity.closure(node.function.value))
+        for name in names:
+            symbol = self.symbol_table.resolve(name)
+            if symbol is None or symbol.scope != SymbolScope.Global:
+                return None
+
+        for arg in node.arguments:
+            arg_names = self.foldable_functions(arg)
+            if arg_names is None:
+                return None
+            names |= arg_names
+
+        return names
+
+    @classmethod
+    def is_constant_value(cls, obj: MObject) -> bool:
+        if isinstance(obj, MArrayObject):
+            return all(Compiler.is_constant_value(o) for o in obj.value)
+        if isinstance(obj, MHashMapObject):
+            return all(Compiler.is_constant_value(o) for o in obj.value.values())
+        return isinstance(
+            obj, MIntegerObject | MStringObject | MBooleanObject | MNullObject
+        )
+
+    def emit_constant(self, obj: MObject) -> None:
+        if isinstance(obj, MNullObject):
+            self.emit(MOpcode.OpNull)
+        elif isinstance(obj, MBooleanObject):
+            self.emit(MOpcode.OpTrue if obj.value else MOpcode.OpFalse)
+        else:
+            self.emit(MOpcode.OpConstant, self.add_constant(obj))
+
+    @classmethod
+    def constant_literal(cls, node: MNode) -> None | MObject:
+        """
+        Build the object of a literal made only of constants, or return None.
+        Monkey values are immutable, so the object can be shared by every load.
+        """
+        if isinstance(node, MIntegerExpression):
+            return MIntegerObject(node.value)
+
+        if isinstance(node, MStringExpression):
+            return MStringObject(node.value)
+
+        if isinstance(node, MBooleanExpression):
+            return MBooleanObject(node.value)
+
+        if isinstance(node, MArrayExpression):
+            elements = []
+            for elem in node.value:
+                obj = Compiler.constant_literal(elem)
+                if obj is None:
+                    return None
+                elements.append(obj)
+            return MArrayObject(elements)
+
+        if isinstance(node, MHashMapExpression):
+            hashmap: dict[MValuedObject, MObject] = {}
+            for node_key, node_value in node.pairs.items():
+                key = Compiler.constant_literal(node_key)
+                value = Compiler.constant_literal(node_value)
+                if not isinstance(key, MValuedObject) or value is None:
+                    return None
+                hashmap[key] = value
+            return MHashMapObject(hashmap)
+
+        return None
+
+    def compile_block_value(self, block: MBlockStatement) -> None:
+        """
+        Compile a block that leaves its value on the stack, like an if branch
+        """
+        self.compile(block)
+        if block.statements and isinstance(block.statements[-1], MExpressionStatement):
+            self.remove_last_pop()
+        else:
+            self.emit(MOpcode.OpNull)
+
+    def remove_last_pop(self) -> None:
+        block = self.current_function().current
+        if block.terminator is not None or not block.instructions:
+            raise ValueError("no OpPop to remove")
+        block.instructions.pop()
+
+    def inlined(self) -> None | str:
+        """
+        The functions being inlined, outermost first, joined by ">"
+        """
+        return ">".join(self.inlining) if self.inlining else None
+
+    def emit(self, op: MOpcode, operand: None | int = None) -> None:
+        self.current_function().append(
+            IRInstruction(op, operand, position=self.position, inlined=self.inlined())
+        )
+
+    def emit_jump(self, op: MOpcode, target: BasicBlock) -> None:
+        self.current_function().append(
+            IRInstruction(
+                op, target=target.label, position=self.position, inlined=self.inlined()
+            )
+        )
+
+    def emit_load(self, symbol: Symbol) -> None:
+        if symbol.scope == SymbolScope.Global:
+            op = MOpcode.OpGetGlobal
+        elif symbol.scope == SymbolScope.Builtin:
+            op = MOpcode.OpGetBuiltin
+        else:
+            op = MOpcode.OpGetLocal
+        self.current_function().append(
+            IRInstruction(
+                op, slot=symbol, position=self.position, inlined=self.inlined()
+            )
+        )
+
+    def emit_store(self, symbol: Symbol) -> None:
+        if symbol.scope == SymbolScope.Global:
+            op = MOpcode.OpSetGlobal
+        else:
+            op = MOpcode.OpSetLocal
+        self.current_function().append(
+            IRInstruction(
+                op, slot=symbol, position=self.position, inlined=self.inlined()
+            )
+        )
+
     def add_constant(self, obj: MObject) -> int:
         self.constants.append(obj)
         return len(self.constants) - 1
 
     def last_instruction_is(self, op: MOpcode) -> bool:
-        if not self.current_instructions():
-            return False
-        return self.scopes[self.scope_index].last_instruction.opcode == op
+        last = self.current_function().last_instruction()
+        return last is not None and last.opcode == op
 
     def bytecode(self) -> Bytecode:
-        ins = Instructions(self.current_instructions().instructions)
-        return Bytecode(ins, self.constants)
+        self.passes.run(self.current_function())
+        registers = None
+        if self.backend == "register":
+            registers = RegisterAllocator.translate(
+                self.current_function(), 0, self.constants, keep_pops=True
+            )
+        return Bytecode(
+            self.current_instructions(),
+            self.constants,
+            registers,
+            tuple(self.symbol_table.names),
+        )
+
+    def checkpoint(self) -> CompilerCheckpoint:
+        return CompilerCheckpoint(
+            self.symbol_table,
+            dict(self.symbol_table.store),
+            self.symbol_table.num_definitions,
+            len(self.constants),
+            len(self.ir_functions),
+            dict(self.inline_candidates),
+        )
+
+    def restore(
+        self, checkpoint: CompilerCheckpoint, keep_constants: bool = False
+    ) -> None:
+        """
+        Roll back to checkpoint. Constants are kept when code that refers to
+        them may have run, e.g. a function stored before a later error
+        """
+        self.symbol_table = checkpoint.symbol_table
+        self.symbol_table.store = checkpoint.store
+        self.symbol_table.num_definitions = checkpoint.num_definitions
+        del self.symbol_table.names[checkpoint.num_definitions :]
+        if not keep_constants:
+            del self.constants[checkpoint.num_constants :]
+        del self.ir_functions[checkpoint.num_functions :]
+        # a candidate dropped since stays dropped, its name may be bound to
+        # another function by now
+        self.inline_candidates = {
+            name: candidate
+            for name, candidate in checkpoint.inline_candidates.items()
+            if self.inline_candidates.get(name) is candidate
+        }
+        self.scopes = [CompilationScope(IRFunction("main"))]
+        self.scope_index = 0
+
+    def compile_incremental(self, program: MProgram) -> Bytecode:
+        """
+        Compile program as the next input of a session. Globals and constants
+        of earlier inputs stay visible, on error the session is left as it was
+        """
+        # a function bound again may have another body by the time it is
+        # called, calls of it can no longer be inlined
+        for name in InlineAnalysis.bound_names(program):
+            self.inline_candidates.pop(name, None)
+
+        checkpoint = self.checkpoint()
+        self.scopes = [CompilationScope(IRFunction("main"))]
+        self.scope_index = 0
+        try:
+            self.compile(program)
+            return self.bytecode()
+        except Exception:
+            self.restore(checkpoint)
+            raise
+
+    def dump_ir(self) -> str:
+        functions = [*self.ir_functions, self.scopes[0].function]
+        return "\n\n".join(fn.dump(self.constants) for fn in functions)
+
+    def dump_cfg(self) -> str:
+        functions = [*self.ir_functions, self.scopes[0].function]
+        subgraphs = "\n".join(fn.to_dot(self.constants) for fn in functions)
+        return f"digraph cfg {{\n{subgraphs}\n}}\n"
 
     def to_pickle(self, file_path) -> None:
         with open(file_path, "bw") as file:
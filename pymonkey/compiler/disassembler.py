@@ -0,0 +1,169 @@
+import json
+import pickle
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import List
+
+from pymonkey.code.code import MOpcode
+from pymonkey.compiler.compiler import Bytecode
+from pymonkey.evaluator.mbuiltins import Builtins
+from pymonkey.evaluator.mobject import MObject, MStringObject
+from pymonkey.object.object import CompliedFunction
+
+JUMPS = (MOpcode.OpJump, MOpcode.OpJumpNotTruthy)
+LARGEST_FUNCTIONS = 10
+CONSTANT_WIDTH = 40
+
+
+@dataclass
+class FunctionSize:
+    name: str
+    instructions: int
+    bytes: int
+
+
+@dataclass
+class SizeReport:
+    functions: List[FunctionSize] = field(default_factory=list)
+    # constant pool by type, count and pickled bytes
+    constants: Counter[str] = field(default_factory=Counter)
+    constant_bytes: Counter[str] = field(default_factory=Counter)
+
+    def to_dict(self) -> dict:
+        return {
+            "functions": [vars(fn) for fn in self.functions],
+            "instructions": sum(fn.instructions for fn in self.functions),
+            "bytes": sum(fn.bytes for fn in self.functions),
+            "constants": {
+                name: {"count": count, "bytes": self.constant_bytes[name]}
+                for name, count in self.constants.most_common()
+            },
+        }
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict(), indent=2)
+
+    def __str__(self) -> str:
+        report = self.to_dict()
+        lines = [
+            f"{len(self.functions)} functions, {report['instructions']} instructions,"
+            f" {report['bytes']} bytes",
+            "",
+            "instructions  bytes  largest functions",
+        ]
+        largest = sorted(self.functions, key=lambda fn: -fn.bytes)
+        for fn in largest[:LARGEST_FUNCTIONS]:
+            lines.append(f"{fn.instructions:12d} {fn.bytes:6d}  {fn.name}")
+        lines += ["", "   count  bytes  constants"]
+        for name, count in self.constants.most_common():
+            lines.append(f"{count:8d} {self.constant_bytes[name]:6d}  {name}")
+        return "\n".join(lines)
+
+
+@dataclass
+class Disassembler:
+    """
+    Readable listing of a bytecode file: every function, with constants,
+    jump targets as labels and the names of globals, locals and builtins
+    """
+
+    bytecode: Bytecode
+    builtins: List[str] = field(default_factory=lambda: list(Builtins().fns))
+
+    def functions(self) -> List[CompliedFunction]:
+        main = CompliedFunction(self.bytecode.instructions, 0, 0, "main")
+        return [
+            main,
+            *(c for c in self.bytecode.constants if isinstance(c, CompliedFunction)),
+        ]
+
+    @classmethod
+    def function_name(cls, fn: CompliedFunction) -> str:
+        return fn.name or "<anonymous>"
+
+    def describe_constant(self, index: int) -> str:
+        constant: MObject = self.bytecode.constants[index]
+        if isinstance(constant, CompliedFunction):
+            return f"fn {self.function_name(constant)}"
+        if isinstance(constant, MStringObject):
+            text = repr(constant.value)
+        else:
+            text = str(constant)
+        if len(text) > CONSTANT_WIDTH:
+            text = text[: CONSTANT_WIDTH - 3] + "..."
+        return text
+
+    def describe_operand(
+        self, fn: CompliedFunction, op: MOpcode, operand: int, labels: dict[int, str]
+    ) -> str:
+        names: tuple[str, ...] | List[str] = ()
+        if op in JUMPS:
+            return labels[operand]
+        if op == MOpcode.OpConstant:
+            return f"{operand}  ; {self.describe_constant(operand)}"
+        if op in (MOpcode.OpGetGlobal, MOpcode.OpSetGlobal):
+            names = self.bytecode.global_names
+        elif op in (MOpcode.OpGetLocal, MOpcode.OpSetLocal):
+            names = fn.local_names
+        elif op == MOpcode.OpGetBuiltin:
+            names = self.builtins
+        elif op == MOpcode.OpCall:
+            return f"{operand}  ; {operand} arguments"
+        if operand < len(names):
+            return f"{operand}  ; {names[operand]}"
+        return str(operand)
+
+    def disassemble_function(self, fn: CompliedFunction) -> str:
+        instructions = fn.instructions
+        targets = sorted(
+            {
+                instructions.get_opargs(i)
+                for i in range(len(instructions))
+                if instructions.get_opcode(i) in JUMPS
+            }
+        )
+        labels = {target: f"L{i}" for i, target in enumerate(targets)}
+
+        size = sum(len(ins) for ins in instructions)
+        lines = [
+            f"== {self.function_name(fn)}: {fn.num_parameters} parameters,"
+            f" {max(fn.num_locals, 0)} locals, {len(instructions)} instructions,"
+            f" {size} bytes =="
+        ]
+        offset = 0
+        previous_line = None
+        for i, ins in enumerate(instructions):
+            op = instructions.get_opcode(i)
+            position = instructions.lines.lookup(i) if instructions.lines else None
+            line = ""
+            if position is not None and position[0] != previous_line:
+                line = str(position[0])
+                previous_line = position[0]
+
+            text = op.name
+            if len(ins) > 1:
+                operand = instructions.get_opargs(i)
+                text = f"{op.name:<16} {self.describe_operand(fn, op, operand, labels)}"
+            label = f"{labels[i]}:" if i in labels else ""
+            lines.append(f"{line:>5} {label:<5} {offset:04d}  {text}")
+            offset += len(ins)
+        return "\n".join(lines)
+
+    def disassemble(self) -> str:
+        return "\n\n".join(self.disassemble_function(fn) for fn in self.functions())
+
+    def size_report(self) -> SizeReport:
+        report = SizeReport()
+        for fn in self.functions():
+            report.functions.append(
+                FunctionSize(
+                    self.function_name(fn),
+                    len(fn.instructions),
+                    sum(len(ins) for ins in fn.instructions),
+                )
+            )
+        for constant in self.bytecode.constants:
+            name = type(constant).__name__
+            report.constants[name] += 1
+            report.constant_bytes[name] += len(pickle.dumps(constant))
+        return report
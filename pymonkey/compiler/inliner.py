@@ -0,0 +1,160 @@
+import copy
+from dataclasses import dataclass
+
+from pymonkey.compiler.symbol_table import Symbol
+from pymonkey.parser.mast import (
+    MArrayExpression,
+    MAssignStatement,
+    MBlockStatement,
+    MBooleanExpression,
+    MCallExpression,
+    MExpression,
+    MExpressionStatement,
+    MFunctionExpression,
+    MHashMapExpression,
+    MIdentifier,
+    MIfExpression,
+    MIndexExpression,
+    MInfixExpression,
+    MIntegerExpression,
+    MLetStatement,
+    MNode,
+    MPrefixExpression,
+    MProgram,
+    MReturnStatement,
+    MStringExpression,
+)
+from pymonkey.parser.mvisitor import walk
+
+# max number of AST nodes in the body of an inlined function, per -O level
+INLINE_THRESHOLD = {0: 0, 1: 12, 2: 40}
+
+INLINABLE_NODES = (
+    MIntegerExpression,
+    MStringExpression,
+    MBooleanExpression,
+    MIdentifier,
+    MPrefixExpression,
+    MInfixExpression,
+    MIndexExpression,
+    MCallExpression,
+    MArrayExpression,
+    MHashMapExpression,
+    MIfExpression,
+    MBlockStatement,
+    MExpressionStatement,
+)
+
+
+@dataclass
+class InlineCandidate:
+    """
+    A small global function whose calls can be replaced by its body.
+    symbols holds what the free names of the body resolved to at the definition.
+    """
+
+    name: str
+    parameters: list[str]
+    body: MExpression
+    symbols: dict[str, Symbol]
+
+    def substitute(self, slot_names: list[str]) -> MExpression:
+        """
+        Copy of the body with the parameters renamed to slot_names. The copy
+        keeps the tokens of the function, so positions still point at its source.
+        """
+        renames = dict(zip(self.parameters, slot_names))
+        body = copy.deepcopy(self.body)
+        for node in walk(body):
+            if isinstance(node, MIdentifier) and node.value in renames:
+                node.value = renames[node.value]
+        return body
+
+
+class InlineAnalysis:
+    @classmethod
+    def analyze(cls, program: MNode, max_size: int) -> dict[str, MFunctionExpression]:
+        """
+        Global functions of program that are small, not recursive and only ever
+        called directly, so never escape as a value
+        """
+        if not isinstance(program, MProgram) or max_size <= 0:
+            return {}
+
+        functions: dict[str, MFunctionExpression] = {}
+        defined: set[str] = set()
+        for stmt in program.statements:
+            if isinstance(stmt, MLetStatement):
+                if stmt.name.value in defined:
+                    functions.pop(stmt.name.value, None)
+                elif isinstance(stmt.value, MFunctionExpression):
+                    functions[stmt.name.value] = stmt.value
+                defined.add(stmt.name.value)
+
+        called: set[int] = set()
+        bound: set[int] = set()
+        for node in walk(program):
+            if isinstance(node, MCallExpression):
+                called.add(id(node.function))
+            elif isinstance(node, MLetStatement):
+                bound.add(id(node.name))
+        for node in walk(program):
+            if isinstance(node, MIdentifier) and node.value in functions:
+                if id(node) not in called and id(node) not in bound:
+                    functions.pop(node.value)
+
+        return {
+            name: fn
+            for name, fn in functions.items()
+            if cls.body_expression(fn) is not None
+            and cls.size(fn) <= max_size
+            and not cls.references(fn, name)
+        }
+
+    @classmethod
+    def body_expression(cls, fn: MFunctionExpression) -> None | MExpression:
+        """
+        The expression of a body made of a single expression, or None
+        """
+        if len(fn.body.statements) != 1:
+            return None
+
+        stmt = fn.body.statements[0]
+        if isinstance(stmt, MExpressionStatement):
+            expression = stmt.expression
+        elif isinstance(stmt, MReturnStatement):
+            expression = stmt.value
+        else:
+            return None
+
+        if not all(isinstance(n, INLINABLE_NODES) for n in walk(expression)):
+            return None
+        return expression
+
+    @classmethod
+    def size(cls, fn: MFunctionExpression) -> int:
+        return sum(1 for _ in walk(fn.body))
+
+    @classmethod
+    def references(cls, fn: MFunctionExpression, name: str) -> bool:
+        return any(isinstance(n, MIdentifier) and n.value == name for n in walk(fn))
+
+    @classmethod
+    def bound_names(cls, program: MNode) -> set[str]:
+        """
+        Names a let or an assignment anywhere in program binds
+        """
+        return {
+            n.name.value
+            for n in walk(program)
+            if isinstance(n, MLetStatement | MAssignStatement)
+        }
+
+    @classmethod
+    def free_names(cls, fn: MFunctionExpression) -> set[str]:
+        parameters = {p.value for p in fn.parameters if isinstance(p, MIdentifier)}
+        return {
+            n.value
+            for n in walk(fn.body)
+            if isinstance(n, MIdentifier) and n.value not in parameters
+        }
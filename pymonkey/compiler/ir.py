@@ -0,0 +1,237 @@
+from dataclasses import dataclass, field
+from typing import List
+
+from pymonkey.code.code import Encoder, Instructions, LineTable, MOpcode
+from pymonkey.compiler.symbol_table import Symbol
+from pymonkey.evaluator.mobject import MObject
+
+TERMINATORS = (
+    MOpcode.OpJump,
+    MOpcode.OpJumpNotTruthy,
+    MOpcode.OpReturnValue,
+    MOpcode.OpReturn,
+)
+
+
+@dataclass
+class IRInstruction:
+    """
+    One instruction of the IR. Variables are virtual slots, the Symbol they
+    were resolved to, and jumps name the label of their target block.
+    """
+
+    opcode: MOpcode
+    operand: None | int = None
+    slot: None | Symbol = None
+    target: None | int = None
+    # (file, 1-based line, column) of the node the instruction was compiled from
+    position: None | tuple[str, int, int] = field(default=None, compare=False)
+    # the inlined functions the instruction was compiled from, see
+    # Compiler.inlined
+    inlined: None | str = field(default=None, compare=False)
+
+    def dump(self, constants: None | List[MObject] = None) -> str:
+        if self.target is not None:
+            return f"{self.opcode.name} B{self.target}"
+        if self.slot is not None:
+            scope = self.slot.scope.name.lower()
+            return f"{self.opcode.name} {self.slot.name} ({scope} {self.slot.index})"
+        if self.operand is None:
+            return self.opcode.name
+        if self.opcode == MOpcode.OpConstant and constants is not None:
+            return f"{self.opcode.name} {self.operand} ({constants[self.operand]})"
+        return f"{self.opcode.name} {self.operand}"
+
+    def encode(self, positions: dict[int, int]) -> bytearray:
+        if self.target is not None:
+            return Encoder.make(self.opcode, positions[self.target])
+        if self.slot is not None:
+            return Encoder.make(self.opcode, self.slot.index)
+        if self.operand is not None:
+            return Encoder.make(self.opcode, self.operand)
+        return Encoder.make(self.opcode)
+
+
+@dataclass
+class BasicBlock:
+    """
+    Straight line code, optionally ended by a jump or return. Without a jump
+    or after a OpJumpNotTruthy control continues in the fallthrough block.
+    """
+
+    label: int
+    instructions: List[IRInstruction] = field(default_factory=list)
+    terminator: None | IRInstruction = None
+    fallthrough: None | int = None
+
+    @property
+    def successors(self) -> List[int]:
+        successors = []
+        if self.terminator is not None and self.terminator.target is not None:
+            successors.append(self.terminator.target)
+        if self.fallthrough is not None and self.fallthrough not in successors:
+            successors.append(self.fallthrough)
+        return successors
+
+    @property
+    def is_terminated(self) -> bool:
+        return self.terminator is not None
+
+
+@dataclass
+class IRFunction:
+    """
+    Control flow graph of one function. blocks are in layout order, the first
+    one is the entry.
+    """
+
+    name: str
+    blocks: List[BasicBlock]
+    current: BasicBlock
+    next_label: int
+
+    def __init__(self, name: str = "") -> None:
+        self.name = name
+        self.next_label = 0
+        self.current = self.new_block()
+        self.blocks = [self.current]
+
+    def __str__(self) -> str:
+        return self.dump()
+
+    def new_block(self) -> BasicBlock:
+        """
+        Create a block, it is placed in the layout once it is started
+        """
+        block = BasicBlock(self.next_label)
+        self.next_label += 1
+        return block
+
+    def start_block(self, block: BasicBlock) -> None:
+        terminator = self.current.terminator
+        if terminator is None or terminator.opcode == MOpcode.OpJumpNotTruthy:
+            self.current.fallthrough = block.label
+        self.blocks.append(block)
+        self.current = block
+
+    def append(self, ins: IRInstruction) -> None:
+        if ins.opcode in TERMINATORS:
+            self.terminate(ins)
+            return
+        if self.current.is_terminated:
+            # code after a jump or return is unreachable, but still compiled
+            self.start_block(self.new_block())
+        self.current.instructions.append(ins)
+
+    def terminate(self, ins: IRInstruction) -> None:
+        if self.current.is_terminated:
+            self.start_block(self.new_block())
+        self.current.terminator = ins
+
+    def last_instruction(self) -> None | IRInstruction:
+        if self.current.terminator is not None:
+            return self.current.terminator
+        if self.current.instructions:
+            return self.current.instructions[-1]
+        return None
+
+    def block(self, label: int) -> BasicBlock:
+        for block in self.blocks:
+            if block.label == label:
+                return block
+        raise KeyError(f"no block B{label} in {self.name}")
+
+    def predecessors(self) -> dict[int, List[int]]:
+        predecessors: dict[int, List[int]] = {b.label: [] for b in self.blocks}
+        for block in self.blocks:
+            for successor in block.successors:
+                predecessors[successor].append(block.label)
+        return predecessors
+
+    def dump(self, constants: None | List[MObject] = None) -> str:
+        lines = [f"fn {self.name or '<anonymous>'}:"]
+        for block in self.blocks:
+            lines.append(f"  B{block.label}:")
+            for ins in block.instructions:
+                lines.append(f"    {ins.dump(constants)}")
+            if block.terminator is not None:
+                lines.append(f"    {block.terminator.dump(constants)}")
+            if block.fallthrough is not None:
+                lines.append(f"    -> B{block.fallthrough}")
+        return "\n".join(lines)
+
+    def to_dot(self, constants: None | List[MObject] = None) -> str:
+        """
+        Control flow graph as a graphviz subgraph
+        """
+        name = self.name or "anonymous"
+        lines = [f'  subgraph "cluster_{name}" {{', f'    label="{name}";']
+        for block in self.blocks:
+            body = [f"B{block.label}"] + [i.dump(constants) for i in block.instructions]
+            if block.terminator is not None:
+                body.append(block.terminator.dump(constants))
+            text = "\\l".join(b.replace('"', '\\"') for b in body) + "\\l"
+            lines.append(f'    "{name}.B{block.label}" [shape=box, label="{text}"];')
+            for successor in block.successors:
+                lines.append(f'    "{name}.B{block.label}" -> "{name}.B{successor}";')
+        lines.append("  }")
+        return "\n".join(lines)
+
+
+class BytecodeEmitter:
+    @classmethod
+    def emit(cls, fn: IRFunction) -> Instructions:
+        """
+        Lay out the blocks of fn in order. Jump targets are known before any
+        instruction is encoded, so nothing has to be patched afterwards.
+        """
+        positions: dict[int, int] = {}
+        position = 0
+        for i, block in enumerate(fn.blocks):
+            positions[block.label] = position
+            position += len(block.instructions) + len(cls.exit(fn, i))
+
+        instructions = Instructions([])
+        # instructions without a position, like jumps added by passes, share
+        # the one before them
+        file = ""
+        source_positions: List[tuple[int, int]] = []
+        source_position = (0, 0)
+        inlined: List[None | str] = []
+        for i, block in enumerate(fn.blocks):
+            for ins in [*block.instructions, *cls.exit(fn, i)]:
+                instructions.append(ins.encode(positions))
+                if ins.position is not None:
+                    file, line, column = ins.position
+                    source_position = (line, column)
+                source_positions.append(source_position)
+                inlined.append(ins.inlined)
+        instructions.lines = LineTable.encode(file, source_positions, inlined)
+        return instructions
+
+    @classmethod
+    def exit(cls, fn: IRFunction, index: int) -> List[IRInstruction]:
+        """
+        The instructions leaving block index: its terminator and a jump if the
+        fallthrough block is not the next one
+        """
+        block = fn.blocks[index]
+        next_label = fn.blocks[index + 1].label if index + 1 < len(fn.blocks) else None
+
+        instructions = []
+        terminator = block.terminator
+        if terminator is not None and not (
+            terminator.opcode == MOpcode.OpJump and terminator.target == next_label
+        ):
+            instructions.append(terminator)
+
+        if block.fallthrough is not None and block.fallthrough != next_label:
+            instructions.append(
+                IRInstruction(
+                    MOpcode.OpJump,
+                    target=block.fallthrough,
+                    position=terminator.position if terminator is not None else None,
+                    inlined=terminator.inlined if terminator is not None else None,
+                )
+            )
+        return instructions
@@ -0,0 +1,158 @@
+from dataclasses import dataclass, field
+from typing import Callable, List
+
+from pymonkey.code.code import MOpcode
+from pymonkey.compiler.ir import IRFunction, IRInstruction
+
+Pass = Callable[[IRFunction], bool]
+
+
+def fold_constant_branches(fn: IRFunction) -> bool:
+    """
+    Replace a OpJumpNotTruthy on a literal true, false or null by an
+    unconditional jump or a fallthrough, like the condition of while (true)
+    """
+    changed = False
+    for block in fn.blocks:
+        terminator = block.terminator
+        if terminator is None or terminator.opcode != MOpcode.OpJumpNotTruthy:
+            continue
+        if not block.instructions:
+            continue
+
+        condition = block.instructions[-1].opcode
+        if condition == MOpcode.OpTrue:
+            block.terminator = None
+        elif condition in (MOpcode.OpFalse, MOpcode.OpNull):
+            block.terminator = IRInstruction(
+                MOpcode.OpJump,
+                target=terminator.target,
+                position=terminator.position,
+                inlined=terminator.inlined,
+            )
+            block.fallthrough = None
+        else:
+            continue
+        block.instructions.pop()
+        changed = True
+    return changed
+
+
+def thread_jumps(fn: IRFunction) -> bool:
+    """
+    Point jumps at empty blocks directly to where those blocks continue
+    """
+    changed = False
+    for block in fn.blocks:
+        terminator = block.terminator
+        if terminator is None or terminator.target is None:
+            continue
+
+        target = terminator.target
+        visited = {block.label}
+        while target not in visited:
+            visited.add(target)
+            target_block = fn.block(target)
+            if target_block.instructions:
+                break
+            if target_block.terminator is None and target_block.fallthrough is not None:
+                target = target_block.fallthrough
+            elif (
+                target_block.terminator is not None
+                and target_block.terminator.opcode == MOpcode.OpJump
+                and target_block.terminator.target is not None
+            ):
+                target = target_block.terminator.target
+            else:
+                break
+
+        if target != terminator.target:
+            terminator.target = target
+            changed = True
+    return changed
+
+
+def remove_unreachable_blocks(fn: IRFunction) -> bool:
+    """
+    Drop the blocks that can not be reached from the entry block, like
+    statements after a return or break
+    """
+    reachable = set()
+    todo = [fn.blocks[0].label]
+    while todo:
+        label = todo.pop()
+        if label in reachable:
+            continue
+        reachable.add(label)
+        todo.extend(fn.block(label).successors)
+
+    blocks = [b for b in fn.blocks if b.label in reachable]
+    if len(blocks) == len(fn.blocks):
+        return False
+    fn.blocks = blocks
+    return True
+
+
+def merge_blocks(fn: IRFunction) -> bool:
+    """
+    Append a block to the one before it, if that is the only way to reach it
+    """
+    changed = False
+    predecessors = fn.predecessors()
+    i = 0
+    while i < len(fn.blocks) - 1:
+        block, following = fn.blocks[i], fn.blocks[i + 1]
+        if (
+            block.terminator is None
+            and block.fallthrough == following.label
+            and predecessors[following.label] == [block.label]
+        ):
+            block.instructions.extend(following.instructions)
+            block.terminator = following.terminator
+            block.fallthrough = following.fallthrough
+            del fn.blocks[i + 1]
+            predecessors = fn.predecessors()
+            changed = True
+        else:
+            i += 1
+    return changed
+
+
+# passes with the lowest -O level they run at, in order
+OPTIMIZATION_PASSES: List[tuple[int, Pass]] = [
+    (1, fold_constant_branches),
+    (1, thread_jumps),
+    (1, remove_unreachable_blocks),
+    (1, merge_blocks),
+]
+
+
+@dataclass
+class PassManager:
+    """
+    Runs the IR passes of an optimization level on each function until none of
+    them changes anything. changes counts how often each pass did something.
+    """
+
+    passes: List[Pass]
+    max_rounds: int = 8
+    changes: dict[str, int] = field(default_factory=dict)
+
+    @classmethod
+    def for_level(cls, optimize: int) -> "PassManager":
+        return PassManager([p for level, p in OPTIMIZATION_PASSES if optimize >= level])
+
+    def add_pass(self, ir_pass: Pass) -> None:
+        self.passes.append(ir_pass)
+
+    def run(self, fn: IRFunction) -> None:
+        for _ in range(self.max_rounds):
+            changed = False
+            for ir_pass in self.passes:
+                if ir_pass(fn):
+                    self.changes[ir_pass.__name__] = (
+                        self.changes.get(ir_pass.__name__, 0) + 1
+                    )
+                    changed = True
+            if not changed:
+                return
@@ -0,0 +1,114 @@
+from dataclasses import dataclass
+
+from pymonkey.parser.mast import (
+    MAssignStatement,
+    MFunctionExpression,
+    MIdentifier,
+    MLetStatement,
+    MNode,
+    MProgram,
+)
+from pymonkey.parser.mvisitor import walk
+
+PURE_BUILTINS = {"len"}
+
+
+@dataclass
+class PurityAnalysis:
+    """
+    Find the global functions of a program whose result depends only on their
+    arguments: no puts, no access to global variables and no calls to impure
+    functions. Pure MFunctionExpression nodes get pure set to True.
+    """
+
+    functions: dict[str, MFunctionExpression]
+    pure: set[str]
+    dependencies: dict[str, set[str]]
+
+    @classmethod
+    def analyze(cls, program: MNode) -> "PurityAnalysis":
+        if not isinstance(program, MProgram):
+            return PurityAnalysis({}, set(), {})
+
+        functions: dict[str, MFunctionExpression] = {}
+        rebound: set[str] = set()
+        for stmt in program.statements:
+            if isinstance(stmt, MLetStatement):
+                if stmt.name.value in functions or stmt.name.value in rebound:
+                    rebound.add(stmt.name.value)
+                elif isinstance(stmt.value, MFunctionExpression):
+                    functions[stmt.name.value] = stmt.value
+                else:
+                    rebound.add(stmt.name.value)
+        for node in walk(program):
+            if isinstance(node, MAssignStatement):
+                rebound.add(node.name.value)
+        for name in rebound:
+            functions.pop(name, None)
+
+        calls: dict[str, set[str]] = {}
+        for name, fn in functions.items():
+            dependencies = cls._dependencies(fn, functions)
+            if dependencies is not None:
+                calls[name] = dependencies
+
+        # drop functions calling impure ones until nothing changes, recursive
+        # functions stay pure unless something in their cycle is impure
+        pure = set(calls)
+        changed = True
+        while changed:
+            changed = False
+            for name in list(pure):
+                if not calls[name] <= pure:
+                    pure.remove(name)
+                    changed = True
+
+        for name in pure:
+            functions[name].pure = True
+
+        return PurityAnalysis(functions, pure, calls)
+
+    def closure(self, name: str) -> list[str]:
+        """
+        Names of the functions name depends on, including itself, in order of
+        definition
+        """
+        needed = {name}
+        todo = [name]
+        while todo:
+            for dependency in self.dependencies.get(todo.pop(), set()):
+                if dependency not in needed:
+                    needed.add(dependency)
+                    todo.append(dependency)
+        return [n for n in self.functions if n in needed]
+
+    @classmethod
+    def _dependencies(
+        cls, fn: MFunctionExpression, functions: dict[str, MFunctionExpression]
+    ) -> None | set[str]:
+        """
+        Return the global functions fn uses, or None if fn is impure by itself
+        """
+        local_names = {p.value for p in fn.parameters if isinstance(p, MIdentifier)}
+        for node in walk(fn.body):
+            if isinstance(node, MLetStatement):
+                local_names.add(node.name.value)
+
+        dependencies: set[str] = set()
+        for node in walk(fn.body):
+            if isinstance(node, MFunctionExpression):
+                return None
+
+            if isinstance(node, MAssignStatement):
+                if node.name.value not in local_names:
+                    return None
+
+            elif isinstance(node, MIdentifier):
+                if node.value in local_names:
+                    continue
+                if node.value in functions:
+                    dependencies.add(node.value)
+                elif node.value not in PURE_BUILTINS:
+                    return None
+
+        return dependencies
@@ -0,0 +1,282 @@
+from dataclasses import dataclass
+from typing import List
+
+from pymonkey.code.code import MOpcode
+from pymonkey.code.registers import RegisterCode, ROp
+from pymonkey.compiler.ir import BasicBlock, IRFunction, IRInstruction
+from pymonkey.evaluator.mobject import MBooleanObject, MNullObject, MObject
+
+BINARY_OPS = {
+    MOpcode.OpAdd: ROp.ADD,
+    MOpcode.OpSub: ROp.SUB,
+    MOpcode.OpMul: ROp.MUL,
+    MOpcode.OpDiv: ROp.DIV,
+    MOpcode.OpEqual: ROp.EQ,
+    MOpcode.OpNotEqual: ROp.NE,
+    MOpcode.OpGreater: ROp.GT,
+    MOpcode.OpIndex: ROp.INDEX,
+}
+
+UNARY_OPS = {
+    MOpcode.OpMinus: ROp.NEG,
+    MOpcode.OpBang: ROp.NOT,
+}
+
+LITERALS = {
+    MOpcode.OpTrue: MBooleanObject(True),
+    MOpcode.OpFalse: MBooleanObject(False),
+    MOpcode.OpNull: MNullObject(),
+}
+
+# ops whose first operand is the register they write
+WRITES_A = {
+    ROp.MOVE,
+    *BINARY_OPS.values(),
+    *UNARY_OPS.values(),
+    ROp.GETG,
+    ROp.GETB,
+    ROp.ARRAY,
+    ROp.HASH,
+    ROp.CALL,
+}
+
+
+def stack_effect(ins: IRInstruction) -> int:
+    op = ins.opcode
+    if op in BINARY_OPS or op in (MOpcode.OpPop, MOpcode.OpJumpNotTruthy):
+        return -1
+    if op in (MOpcode.OpSetGlobal, MOpcode.OpSetLocal, MOpcode.OpReturnValue):
+        return -1
+    if op in (MOpcode.OpArray, MOpcode.OpHash):
+        return 1 - (ins.operand or 0)
+    if op == MOpcode.OpCall:
+        return -(ins.operand or 0)
+    if op in UNARY_OPS or op in (MOpcode.OpJump, MOpcode.OpReturn):
+        return 0
+    return 1
+
+
+@dataclass
+class RegisterAllocator:
+    """
+    Translate the stack IR of a function to three address register code.
+    Locals keep their slot as register, the value at stack depth d lives in
+    register num_locals + d. Within a block loads of locals and constants are
+    not copied, but used directly as operands.
+    """
+
+    function: IRFunction
+    num_locals: int
+    constants: List[MObject]
+    keep_pops: bool
+    code: List[list[int]]
+    stack: List[int]
+    max_depth: int
+    block_start: int
+    literals: dict[str, int]
+
+    @classmethod
+    def translate(
+        cls,
+        function: IRFunction,
+        num_locals: int,
+        constants: List[MObject],
+        keep_pops: bool = False,
+    ) -> RegisterCode:
+        """
+        Register code of function. Literal true, false and null are added to
+        constants. keep_pops records the value of every expression statement,
+        which the main program needs for its result.
+        """
+        allocator = RegisterAllocator(
+            function, num_locals, constants, keep_pops, [], [], 0, 0, {}
+        )
+        return allocator.run()
+
+    def run(self) -> RegisterCode:
+        depths = self.entry_depths()
+        blocks = [b for b in self.function.blocks if b.label in depths]
+
+        starts: dict[int, int] = {}
+        jumps: List[tuple[int, int, int]] = []
+        for i, block in enumerate(blocks):
+            starts[block.label] = len(self.code)
+            self.block_start = len(self.code)
+            self.stack = [self.temp(d) for d in range(depths[block.label])]
+            self.max_depth = max(self.max_depth, len(self.stack))
+
+            for ins in block.instructions:
+                self.translate_instruction(ins)
+
+            next_label = blocks[i + 1].label if i + 1 < len(blocks) else None
+            jumps.extend(self.translate_exit(block, next_label))
+
+        # jumps name blocks until all of them are placed
+        for position, operand, label in jumps:
+            self.code[position][operand] = starts[label]
+
+        code = [(op, a, b, c) for op, a, b, c in self.code]
+        return RegisterCode(code, self.num_locals + self.max_depth)
+
+    def entry_depths(self) -> dict[int, int]:
+        """
+        Stack depth at the start of each reachable block
+        """
+        depths = {self.function.blocks[0].label: 0}
+        todo = [self.function.blocks[0]]
+        while todo:
+            block = todo.pop()
+            depth = depths[block.label]
+            for ins in block.instructions:
+                depth += stack_effect(ins)
+            if block.terminator is not None:
+                depth += stack_effect(block.terminator)
+            for successor in block.successors:
+                if successor not in depths:
+                    depths[successor] = depth
+                    todo.append(self.function.block(successor))
+        return depths
+
+    def temp(self, depth: int) -> int:
+        return self.num_locals + depth
+
+    def emit(self, op: ROp, a: int = 0, b: int = 0, c: int = 0) -> int:
+        self.code.append([int(op), a, b, c])
+        return len(self.code) - 1
+
+    def push(self, operand: int) -> None:
+        self.stack.append(operand)
+        self.max_depth = max(self.max_depth, len(self.stack))
+
+    def push_result(self, op: ROp, b: int = 0, c: int = 0) -> None:
+        destination = self.temp(len(self.stack))
+        self.emit(op, destination, b, c)
+        self.push(destination)
+
+    def constant(self, obj: MObject) -> int:
+        key = repr(obj)
+        if key not in self.literals:
+            for i, constant in enumerate(self.constants):
+                if type(constant) is type(obj) and constant == obj:
+                    self.literals[key] = ~i
+                    break
+            else:
+                self.constants.append(obj)
+                self.literals[key] = ~(len(self.constants) - 1)
+        return self.literals[key]
+
+    def materialize(self, start: int = 0) -> None:
+        """
+        Copy the stack values from depth start on into their own registers
+        """
+        for depth in range(start, len(self.stack)):
+            if self.stack[depth] != self.temp(depth):
+                self.emit(ROp.MOVE, self.temp(depth), self.stack[depth])
+                self.stack[depth] = self.temp(depth)
+
+    def translate_instruction(self, ins: IRInstruction) -> None:
+        op = ins.opcode
+        operand = ins.operand or 0
+
+        if op == MOpcode.OpConstant:
+            self.push(~operand)
+
+        elif op in LITERALS:
+            self.push(self.constant(LITERALS[op]))
+
+        elif op == MOpcode.OpGetLocal and ins.slot is not None:
+            self.push(ins.slot.index)
+
+        elif op == MOpcode.OpGetGlobal and ins.slot is not None:
+            self.push_result(ROp.GETG, ins.slot.index)
+
+        elif op == MOpcode.OpGetBuiltin and ins.slot is not None:
+            self.push_result(ROp.GETB, ins.slot.index)
+
+        elif op == MOpcode.OpSetLocal and ins.slot is not None:
+            self.store_local(ins.slot.index)
+
+        elif op == MOpcode.OpSetGlobal and ins.slot is not None:
+            self.emit(ROp.SETG, ins.slot.index, self.stack.pop())
+
+        elif op in BINARY_OPS:
+            right = self.stack.pop()
+            left = self.stack.pop()
+            self.push_result(BINARY_OPS[op], left, right)
+
+        elif op in UNARY_OPS:
+            self.push_result(UNARY_OPS[op], self.stack.pop())
+
+        elif op == MOpcode.OpPop:
+            value = self.stack.pop()
+            if self.keep_pops:
+                self.emit(ROp.POP, value)
+
+        elif op in (MOpcode.OpArray, MOpcode.OpHash, MOpcode.OpCall):
+            # the operands have to be in consecutive registers
+            count = operand + 1 if op == MOpcode.OpCall else operand
+            base = len(self.stack) - count
+            self.materialize(base)
+            del self.stack[base:]
+            rop = {
+                MOpcode.OpArray: ROp.ARRAY,
+                MOpcode.OpHash: ROp.HASH,
+                MOpcode.OpCall: ROp.CALL,
+            }[op]
+            self.push_result(rop, self.temp(base), operand)
+
+        else:
+            raise TypeError(f"can not translate {ins.dump()} to registers")
+
+    def store_local(self, register: int) -> None:
+        value = self.stack.pop()
+        # values still on the stack must keep reading the old value
+        for depth, operand in enumerate(self.stack):
+            if operand == register:
+                self.emit(ROp.MOVE, self.temp(depth), register)
+                self.stack[depth] = self.temp(depth)
+
+        last = self.code[-1] if len(self.code) > self.block_start else None
+        if (
+            last is not None
+            and value == self.temp(len(self.stack))
+            and last[0] in WRITES_A
+            and last[1] == value
+        ):
+            # write the result straight into the local
+            last[1] = register
+        elif value != register:
+            self.emit(ROp.MOVE, register, value)
+
+    def translate_exit(
+        self, block: BasicBlock, next_label: None | int
+    ) -> List[tuple[int, int, int]]:
+        """
+        Translate the terminator and fallthrough of block, return the
+        positions of jump targets to fill in
+        """
+        jumps = []
+        terminator = block.terminator
+        if terminator is not None:
+            if terminator.opcode == MOpcode.OpReturnValue:
+                self.emit(ROp.RET, self.stack.pop())
+            elif terminator.opcode == MOpcode.OpReturn:
+                self.emit(ROp.RET, self.constant(MNullObject()))
+            elif terminator.opcode == MOpcode.OpJumpNotTruthy:
+                condition = self.stack.pop()
+                self.materialize()
+                position = self.emit(ROp.JMPF, condition)
+                jumps.append((position, 2, terminator.target or 0))
+            elif terminator.target != next_label:
+                self.materialize()
+                position = self.emit(ROp.JMP)
+                jumps.append((position, 1, terminator.target or 0))
+            else:
+                self.materialize()
+
+        if block.fallthrough is not None:
+            self.materialize()
+            if block.fallthrough != next_label:
+                position = self.emit(ROp.JMP)
+                jumps.append((position, 1, block.fallthrough))
+        return jumps
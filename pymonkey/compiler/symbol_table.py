@@ -5,6 +5,7 @@ from enum import Enum, auto
 class SymbolScope(Enum):
     Global = auto()
     Local = auto()
+    Builtin = auto()
 
 
 @dataclass
@@ -19,11 +20,14 @@ class SymbolTable:
     outer: "None | SymbolTable"
     store: dict[str, Symbol]
     num_definitions: int
+    # name of every index, a redefinition shadows but keeps the old index
+    names: list[str]
 
     def __init__(self, outer: "None | SymbolTable" = None) -> None:
         self.outer = outer
         self.store = {}
         self.num_definitions = 0
+        self.names = []
 
     @classmethod
     def new_enclosed(cls, outer: "SymbolTable") -> "SymbolTable":
@@ -37,6 +41,12 @@ class SymbolTable:
 
         self.store[name] = symbol
         self.num_definitions += 1
+        self.names.append(name)
+        return symbol
+
+    def define_builtin(self, index: int, name: str) -> Symbol:
+        symbol = Symbol(name, SymbolScope.Builtin, index)
+        self.store[name] = symbol
         return symbol
 
     def resolve(self, name: str) -> None | Symbol:
@@ -0,0 +1,243 @@
+import json
+import random
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List
+
+from pymonkey.bench import ENGINES
+from pymonkey.evaluator.mobject import MErrorObject
+from pymonkey.parser.mast import MProgram
+from pymonkey.parser.mparser import parse_source
+from pymonkey.workload import WorkloadConfig, generate
+
+CONFORMANCE_ENGINES = ["tree-walk", "vm-O1"]
+FUZZ_PROGRAMS = 200
+FUZZ_DEPTH = 3
+# characters of a program shown in the report
+SOURCE_WIDTH = 200
+
+
+@dataclass
+class Outcome:
+    value: None | str = None
+    # error objects of the evaluators and exceptions of the VMs alike
+    error: None | str = None
+    seconds: float = 0.0
+
+
+@dataclass
+class ConformanceResult:
+    program: str
+    source: str
+    outcomes: Dict[str, Outcome] = field(default_factory=dict)
+
+    @property
+    def status(self) -> str:
+        """
+        match when all engines return the same value or all fail, error when
+        only some fail, otherwise mismatch
+        """
+        failed = [outcome.error is not None for outcome in self.outcomes.values()]
+        if any(failed) and not all(failed):
+            return "error"
+        values = {outcome.value for outcome in self.outcomes.values()}
+        return "match" if len(values) == 1 else "mismatch"
+
+    def to_dict(self) -> dict:
+        return {
+            "program": self.program,
+            "source": self.source,
+            "status": self.status,
+            "outcomes": {name: vars(o) for name, o in self.outcomes.items()},
+        }
+
+
+@dataclass
+class ConformanceReport:
+    engines: List[str]
+    results: List[ConformanceResult] = field(default_factory=list)
+
+    def differences(self) -> List[ConformanceResult]:
+        return [result for result in self.results if result.status != "match"]
+
+    def seconds(self) -> Dict[str, float]:
+        return {
+            engine: sum(r.outcomes[engine].seconds for r in self.results)
+            for engine in self.engines
+        }
+
+    def to_json(self) -> str:
+        return json.dumps(
+            {
+                "engines": self.engines,
+                "programs": len(self.results),
+                "differences": len(self.differences()),
+                "seconds": self.seconds(),
+                "results": [result.to_dict() for result in self.results],
+            },
+            indent=2,
+        )
+
+    def __str__(self) -> str:
+        lines = []
+        for result in self.differences():
+            source = result.source.strip()
+            if len(source) > SOURCE_WIDTH:
+                source = source[: SOURCE_WIDTH - 3] + "..."
+            lines += [f"{result.status}: {result.program}", f"  {source}"]
+            for engine, outcome in result.outcomes.items():
+                text = outcome.value if outcome.error is None else outcome.error
+                lines.append(f"  {engine:<10} {text}")
+        lines.append(
+            f"{len(self.results)} programs, {len(self.differences())} differences"
+        )
+        for engine, seconds in self.seconds().items():
+            lines.append(f"{engine:<10} {seconds:9.3f}s")
+        return "\n".join(lines)
+
+
+@dataclass
+class Fuzzer:
+    """
+    Small programs mixing every type with every operator, including the
+    corners like out of range indices, null and mismatched types where
+    engines tend to drift apart
+    """
+
+    seed: int = 0
+    depth: int = FUZZ_DEPTH
+
+    def __post_init__(self) -> None:
+        self.rng = random.Random(self.seed)
+
+    def literal(self) -> str:
+        rng = self.rng
+        match rng.randrange(5):
+            case 0:
+                return str(rng.randint(-3, 10))
+            case 1:
+                return rng.choice(["true", "false"])
+            case 2:
+                return '"' + "".join(rng.choices("ab", k=rng.randint(0, 3))) + '"'
+            case 3:
+                return "(if (false) { 1 })"
+            case _:
+                return f"-{rng.randint(0, 5)}"
+
+    def key(self) -> str:
+        rng = self.rng
+        return rng.choice([str(rng.randint(-1, 2)), '"a"', '"b"', "true"])
+
+    def expression(self, depth: int, names: List[str]) -> str:
+        rng = self.rng
+        if depth <= 0:
+            if names and rng.random() < 0.4:
+                return rng.choice(names)
+            return self.literal()
+
+        inner = depth - 1
+        match rng.randrange(8):
+            case 0:
+                return f"({rng.choice('!-')}{self.expression(inner, names)})"
+            case 1:
+                left = self.expression(inner, names)
+                operator = rng.choice(["+", "-", "*", "/", "<", ">", "==", "!="])
+                return f"({left} {operator} {self.expression(inner, names)})"
+            case 2:
+                size = rng.randint(0, 3)
+                elements = [self.expression(inner, names) for _ in range(size)]
+                return f"[{', '.join(elements)}][{rng.randint(-1, size)}]"
+            case 3:
+                pairs = [
+                    f"{self.key()}: {self.expression(inner, names)}"
+                    for _ in range(rng.randint(0, 3))
+                ]
+                return f"{{{', '.join(pairs)}}}[{self.key()}]"
+            case 4:
+                return f"len({self.expression(inner, names)})"
+            case 5:
+                condition = self.expression(inner, names)
+                then = self.expression(inner, names)
+                if rng.random() < 0.5:
+                    return f"(if ({condition}) {{ {then} }})"
+                other = self.expression(inner, names)
+                return f"(if ({condition}) {{ {then} }} else {{ {other} }})"
+            case 6:
+                body = self.expression(inner, ["x", "y"])
+                arguments = [self.expression(inner, names), self.literal()]
+                return f"fn(x, y) {{ {body} }}({', '.join(arguments)})"
+            case _:
+                size = rng.randint(0, 3)
+                elements = [self.expression(inner, names) for _ in range(size)]
+                return f"[{', '.join(elements)}]"
+
+    def program(self) -> str:
+        names: List[str] = []
+        lines = []
+        for name in ["p", "q", "r"][: self.rng.randint(0, 3)]:
+            lines.append(f"let {name} = {self.expression(self.depth, names)};")
+            names.append(name)
+        lines.append(f"{self.expression(self.depth, names)};")
+        return "\n".join(lines)
+
+
+def run_engine(program: MProgram, engine: str) -> Outcome:
+    start = time.perf_counter()
+    try:
+        value, _ = ENGINES[engine](program)
+    except Exception as err:
+        return Outcome(
+            error=f"{type(err).__name__}: {err}",
+            seconds=time.perf_counter() - start,
+        )
+    seconds = time.perf_counter() - start
+    if isinstance(value, MErrorObject):
+        return Outcome(error=value.message, seconds=seconds)
+    return Outcome(str(value), seconds=seconds)
+
+
+def check(name: str, source: str, engines: List[str]) -> ConformanceResult:
+    """
+    Parse source once and run it in each engine
+    """
+    result = ConformanceResult(name, source)
+    try:
+        program = parse_source(source)
+    except SyntaxError as err:
+        error = str(err)
+    except Exception as err:
+        error = f"{type(err).__name__}: {err}"
+    else:
+        for engine in engines:
+            result.outcomes[engine] = run_engine(program, engine)
+        return result
+
+    # both paths share the parser, there is nothing to compare
+    result.outcomes = {engine: Outcome(error=error) for engine in engines}
+    return result
+
+
+def check_all(
+    files: List[Path],
+    engines: List[str] = CONFORMANCE_ENGINES,
+    fuzz: int = 0,
+    workloads: int = 0,
+    seed: int = 0,
+) -> ConformanceReport:
+    """
+    Run the files, fuzz generated programs and workloads generated with
+    consecutive seeds in every engine
+    """
+    report = ConformanceReport(engines)
+    for file in files:
+        report.results.append(check(str(file), file.read_text(), engines))
+    for i in range(fuzz):
+        source = Fuzzer(seed + i).program()
+        report.results.append(check(f"fuzz seed {seed + i}", source, engines))
+    for i in range(workloads):
+        workload = generate(WorkloadConfig(seed=seed + i, statements=20))
+        report.results.append(
+            check(f"workload seed {seed + i}", workload.source, engines)
+        )
+    return report
@@ -0,0 +1,500 @@
+import operator
+from dataclasses import dataclass, field
+from typing import Any, Callable, List
+
+from pymonkey.compiler.purity import PurityAnalysis
+from pymonkey.evaluator.mevaluator import BUILTINS, MEvaluator
+from pymonkey.evaluator.mobject import (
+    MArrayObject,
+    MBooleanObject,
+    MBreakObject,
+    MBuiltinFunction,
+    MContinueObject,
+    MErrorObject,
+    MHashMapObject,
+    MIntegerObject,
+    MNullObject,
+    MObject,
+    MReturnValueObject,
+    MSlotEnvironment,
+    MStringObject,
+    MValuedObject,
+)
+from pymonkey.evaluator.resolver import Resolver
+from pymonkey.memo import MemoCache
+from pymonkey.parser.mast import (
+    MArrayExpression,
+    MAssignStatement,
+    MBlockStatement,
+    MBooleanExpression,
+    MBreakStatement,
+    MCallExpression,
+    MContinueStatement,
+    MExpressionStatement,
+    MFunctionExpression,
+    MHashMapExpression,
+    MIdentifier,
+    MIfExpression,
+    MIndexExpression,
+    MInfixExpression,
+    MIntegerExpression,
+    MLetStatement,
+    MNode,
+    MPrefixExpression,
+    MProgram,
+    MReturnStatement,
+    MStringExpression,
+    MWhileStatement,
+)
+
+Code = Callable[[MSlotEnvironment], MObject]
+
+NULL = MNullObject()
+
+# results that end a block early
+UNWINDING = (MReturnValueObject, MErrorObject, MBreakObject, MContinueObject)
+
+INTEGER_OPERATORS: dict[
+    str, tuple[Callable[[int, int], Any], type[MIntegerObject] | type[MBooleanObject]]
+] = {
+    "+": (operator.add, MIntegerObject),
+    "-": (operator.sub, MIntegerObject),
+    "*": (operator.mul, MIntegerObject),
+    "/": (operator.floordiv, MIntegerObject),
+    "<": (operator.lt, MBooleanObject),
+    ">": (operator.gt, MBooleanObject),
+    "==": (operator.eq, MBooleanObject),
+    "!=": (operator.ne, MBooleanObject),
+}
+
+
+@dataclass
+class MClosureFunctionObject(MObject):
+    """
+    Function whose body was compiled to a closure, env is the environment it
+    was defined in. The form of code depends on the evaluator.
+    """
+
+    function: MFunctionExpression
+    env: MSlotEnvironment
+    code: Callable = field(compare=False, repr=False)
+    parameter_slots: tuple[int, ...] = field(compare=False, repr=False)
+
+    def __str__(self) -> str:
+        params = ", ".join([str(p) for p in self.function.parameters])
+        return f"fn ({params}) {{ {self.function.body} }}"
+
+
+@dataclass
+class ClosureEvaluator:
+    """
+    Evaluator with the results and errors of MEvaluator. Every node is turned
+    into a python closure once, before the program runs, so nodes are not
+    dispatched on their type again each time they are evaluated.
+    """
+
+    top_node: MNode
+    memo: None | MemoCache = None
+    top_env: None | MSlotEnvironment = None
+
+    def evaluate(self) -> MObject:
+        if self.memo is not None:
+            PurityAnalysis.analyze(self.top_node)
+        names = Resolver.resolve(self.top_node)
+        self.top_env = MSlotEnvironment([None] * len(names), names, None)
+        return self.compile(self.top_node)(self.top_env)
+
+    def compile(self, node: MNode) -> Code:
+        if isinstance(node, MProgram):
+            return self.compile_program(node)
+
+        elif isinstance(node, MBlockStatement):
+            return self.compile_block(node)
+
+        elif isinstance(node, MExpressionStatement):
+            return self.compile(node.expression)
+
+        elif isinstance(node, MReturnStatement):
+            return self.compile_return(node)
+
+        elif isinstance(node, MLetStatement):
+            return self.compile_let(node)
+
+        elif isinstance(node, MAssignStatement):
+            return self.compile_assign(node)
+
+        elif isinstance(node, MWhileStatement):
+            return self.compile_while(node)
+
+        elif isinstance(node, MBreakStatement):
+            return lambda env: MBreakObject()
+
+        elif isinstance(node, MContinueStatement):
+            return lambda env: MContinueObject()
+
+        elif isinstance(node, MIntegerExpression):
+            integer = MIntegerObject(node.value)
+            return lambda env: integer
+
+        elif isinstance(node, MBooleanExpression):
+            boolean = MBooleanObject(node.value)
+            return lambda env: boolean
+
+        elif isinstance(node, MStringExpression):
+            string = MStringObject(node.value)
+            return lambda env: string
+
+        elif isinstance(node, MArrayExpression):
+            return self.compile_array(node)
+
+        elif isinstance(node, MIndexExpression):
+            return self.compile_index(node)
+
+        elif isinstance(node, MHashMapExpression):
+            return self.compile_hash_literal(node)
+
+        elif isinstance(node, MPrefixExpression):
+            return self.compile_prefix(node)
+
+        elif isinstance(node, MInfixExpression):
+            return self.compile_infix(node)
+
+        elif isinstance(node, MIfExpression):
+            return self.compile_if(node)
+
+        elif isinstance(node, MIdentifier):
+            return self.compile_identifier(node)
+
+        elif isinstance(node, MFunctionExpression):
+            return self.compile_function(node)
+
+        elif isinstance(node, MCallExpression):
+            return self.compile_call(node)
+
+        return lambda env: NULL
+
+    def compile_program(self, program: MProgram) -> Code:
+        statements = [self.compile(stmt) for stmt in program.statements]
+
+        def run_program(env: MSlotEnvironment) -> MObject:
+            result: MObject = NULL
+            for stmt in statements:
+                result = stmt(env)
+                if type(result) in UNWINDING:
+                    if isinstance(result, MReturnValueObject):
+                        return result.value
+                    if isinstance(result, MErrorObject):
+                        return result
+                    return MErrorObject(f"{result} outside loop")
+            return result
+
+        return run_program
+
+    def compile_block(self, block: MBlockStatement) -> Code:
+        statements = [self.compile(stmt) for stmt in block.statements]
+
+        def run_block(env: MSlotEnvironment) -> MObject:
+            result: MObject = NULL
+            for stmt in statements:
+                result = stmt(env)
+                if type(result) in UNWINDING:
+                    return result
+            return result
+
+        return run_block
+
+    def compile_return(self, node: MReturnStatement) -> Code:
+        value = self.compile(node.value)
+
+        def run_return(env: MSlotEnvironment) -> MObject:
+            val = value(env)
+            if type(val) is MErrorObject:
+                return val
+            return MReturnValueObject(val)
+
+        return run_return
+
+    def compile_let(self, node: MLetStatement) -> Code:
+        slot = node.name.slot
+        value = self.compile(node.value)
+
+        def run_let(env: MSlotEnvironment) -> MObject:
+            val = value(env)
+            if type(val) is MErrorObject:
+                return val
+            env.slots[slot] = val  # type: ignore[index]
+            return NULL
+
+        return run_let
+
+    def compile_assign(self, node: MAssignStatement) -> Code:
+        name = node.name.value
+        depth, slot = node.name.depth, node.name.slot
+        value = self.compile(node.value)
+
+        def run_assign(env: MSlotEnvironment) -> MObject:
+            val = value(env)
+            if type(val) is MErrorObject:
+                return val
+            if depth is None:
+                return MErrorObject("identifier not found")
+
+            target = env
+            for _ in range(depth):
+                target = target.outer  # type: ignore[assignment]
+            if target.slots[slot] is not None:  # type: ignore[index]
+                target.slots[slot] = val  # type: ignore[index]
+                return NULL
+            # not set yet, the variable of an outer function is meant
+            try:
+                env.assign(name, val)
+            except KeyError:
+                return MErrorObject("identifier not found")
+            return NULL
+
+        return run_assign
+
+    def compile_while(self, node: MWhileStatement) -> Code:
+        condition = self.compile(node.condition)
+        body = self.compile_block(node.body)
+
+        def run_while(env: MSlotEnvironment) -> MObject:
+            while True:
+                cond = condition(env)
+                if type(cond) is MErrorObject:
+                    return cond
+                if not MEvaluator.is_truthy(cond):
+                    break
+
+                result = body(env)
+                if type(result) in UNWINDING:
+                    if isinstance(result, MBreakObject):
+                        break
+                    if not isinstance(result, MContinueObject):
+                        return result
+            return NULL
+
+        return run_while
+
+    def compile_array(self, node: MArrayExpression) -> Code:
+        elements = [self.compile(e) for e in node.value]
+
+        def run_array(env: MSlotEnvironment) -> MObject:
+            values = []
+            for element in elements:
+                value = element(env)
+                if type(value) is MErrorObject:
+                    return value
+                values.append(value)
+            return MArrayObject(values)
+
+        return run_array
+
+    def compile_index(self, node: MIndexExpression) -> Code:
+        left = self.compile(node.left)
+        index = self.compile(node.index)
+
+        def run_index(env: MSlotEnvironment) -> MObject:
+            container = left(env)
+            if type(container) is MErrorObject:
+                return container
+            position = index(env)
+            if type(position) is MErrorObject:
+                return position
+            return MEvaluator.eval_index_expression(container, position)
+
+        return run_index
+
+    def compile_hash_literal(self, node: MHashMapExpression) -> Code:
+        pairs = [(self.compile(k), self.compile(v)) for k, v in node.pairs.items()]
+
+        def run_hash_literal(env: MSlotEnvironment) -> MObject:
+            hash_dict = {}
+            for key_code, value_code in pairs:
+                key = key_code(env)
+                if type(key) is MErrorObject:
+                    return key
+                if not isinstance(key, MValuedObject):
+                    return MErrorObject("key not hashable")
+                value = value_code(env)
+                if type(value) is MErrorObject:
+                    return value
+                hash_dict[key] = value
+            return MHashMapObject(hash_dict)
+
+        return run_hash_literal
+
+    def compile_prefix(self, node: MPrefixExpression) -> Code:
+        right = self.compile(node.right)
+        operator_ = node.operator
+
+        def run_prefix(env: MSlotEnvironment) -> MObject:
+            value = right(env)
+            if type(value) is MErrorObject:
+                return value
+            return MEvaluator.eval_prefix_expression(operator_, value)
+
+        return run_prefix
+
+    def compile_infix(self, node: MInfixExpression) -> Code:
+        left = self.compile(node.left)
+        right = self.compile(node.right)
+        operator_ = node.operator
+        if operator_ not in INTEGER_OPERATORS:
+            return self.compile_generic_infix(operator_, left, right)
+        apply, result_type = INTEGER_OPERATORS[operator_]
+
+        def run_infix(env: MSlotEnvironment) -> MObject:
+            left_value = left(env)
+            if type(left_value) is MErrorObject:
+                return left_value
+            right_value = right(env)
+            if type(right_value) is MErrorObject:
+                return right_value
+
+            if (
+                type(left_value) is MIntegerObject
+                and type(right_value) is MIntegerObject
+            ):
+                return result_type(apply(left_value.value, right_value.value))
+            return MEvaluator.eval_infix_expression(operator_, left_value, right_value)
+
+        return run_infix
+
+    @classmethod
+    def compile_generic_infix(cls, operator_: str, left: Code, right: Code) -> Code:
+        def run_infix(env: MSlotEnvironment) -> MObject:
+            left_value = left(env)
+            if type(left_value) is MErrorObject:
+                return left_value
+            right_value = right(env)
+            if type(right_value) is MErrorObject:
+                return right_value
+            return MEvaluator.eval_infix_expression(operator_, left_value, right_value)
+
+        return run_infix
+
+    def compile_if(self, node: MIfExpression) -> Code:
+        condition = self.compile(node.condition)
+        consequence = self.compile(node.consequence)
+        alternative = (
+            None if node.alternative is None else self.compile(node.alternative)
+        )
+
+        def run_if(env: MSlotEnvironment) -> MObject:
+            cond = condition(env)
+            if type(cond) is MErrorObject:
+                return cond
+            if MEvaluator.is_truthy(cond):
+                return consequence(env)
+            if alternative is not None:
+                return alternative(env)
+            return NULL
+
+        return run_if
+
+    @classmethod
+    def compile_identifier(cls, node: MIdentifier) -> Code:
+        name = node.value
+        builtin = BUILTINS.get(name)
+        depth, slot = node.depth, node.slot
+        if depth is None or slot is None:
+            # no function declares name, so it can never be set
+            if builtin is None:
+                return lambda env: MErrorObject("identifier not found")
+            return lambda env: builtin
+
+        def unset(env: MSlotEnvironment) -> MObject:
+            # read before its let ran, look further out like MEvaluator
+            try:
+                return env.get(name)
+            except KeyError:
+                pass
+            if builtin is not None:
+                return builtin
+            return MErrorObject("identifier not found")
+
+        if depth == 0:
+
+            def run_local(env: MSlotEnvironment) -> MObject:
+                value = env.slots[slot]
+                if value is None:
+                    return unset(env)
+                return value
+
+            return run_local
+
+        def run_identifier(env: MSlotEnvironment) -> MObject:
+            target = env
+            for _ in range(depth):
+                target = target.outer  # type: ignore[assignment]
+            value = target.slots[slot]
+            if value is None:
+                return unset(env)
+            return value
+
+        return run_identifier
+
+    def compile_function(self, node: MFunctionExpression) -> Code:
+        body = self.compile_block(node.body)
+        parameter_slots = tuple(
+            p.slot for p in node.parameters if isinstance(p, MIdentifier)
+        )
+
+        def run_function(env: MSlotEnvironment) -> MObject:
+            return MClosureFunctionObject(node, env, body, parameter_slots)  # type: ignore[arg-type]
+
+        return run_function
+
+    def compile_call(self, node: MCallExpression) -> Code:
+        function = self.compile(node.function)
+        arguments = [self.compile(a) for a in node.arguments]
+
+        def run_call(env: MSlotEnvironment) -> MObject:
+            fn = function(env)
+            if type(fn) is MErrorObject:
+                return fn
+
+            args: List[MObject] = []
+            for argument in arguments:
+                value = argument(env)
+                if type(value) is MErrorObject:
+                    return value
+                args.append(value)
+
+            if isinstance(fn, MClosureFunctionObject):
+                return self.apply_function(fn, args)
+            if isinstance(fn, MBuiltinFunction):
+                # puts returns None, which would look like an unset slot
+                result = fn.fn(args)
+                return NULL if result is None else result
+            return MErrorObject("not a function")
+
+        return run_call
+
+    def apply_function(
+        self, fn: MClosureFunctionObject, args: List[MObject]
+    ) -> MObject:
+        memo = self.memo
+        memo_key = None
+        function = fn.function
+        if memo is not None and function.pure:
+            memo_key = MemoCache.make_key(id(function.body), args)
+            if memo_key is not None:
+                cached = memo.get(memo_key)
+                if cached is not None:
+                    return cached
+
+        slots: List[None | MObject] = [None] * len(function.slot_names)
+        for i, slot in enumerate(fn.parameter_slots):
+            slots[slot] = args[i]
+        evaluated = fn.code(MSlotEnvironment(slots, function.slot_names, fn.env))
+
+        if isinstance(evaluated, MReturnValueObject):
+            evaluated = evaluated.value
+        if isinstance(evaluated, MBreakObject | MContinueObject):
+            return MErrorObject(f"{evaluated} outside loop")
+
+        if memo_key is not None and not isinstance(evaluated, MErrorObject):
+            memo.put(memo_key, evaluated)  # type: ignore[union-attr]
+        return evaluated
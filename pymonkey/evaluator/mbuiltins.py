@@ -1,3 +1,4 @@
+import sys
 from typing import List
 
 from pymonkey.evaluator.mobject import (
@@ -15,6 +16,7 @@ class Builtins:
         self.fns = {
             "len": MBuiltinFunction(self.len),
             "puts": MBuiltinFunction(self.puts),
+            "input": MBuiltinFunction(self.input),
         }
 
     def len(self, args: List[MObject]) -> MErrorObject | MIntegerObject:
@@ -28,3 +30,9 @@ class Builtins:
 
     def puts(self, args: List[MObject]) -> None:
         print(*args)
+
+    def input(self, args: List[MObject]) -> MErrorObject | MStringObject:
+        if args:
+            return MErrorObject("input takes no arguments")
+
+        return MStringObject(sys.stdin.read())
@@ -1,8 +1,11 @@
+from pymonkey.compiler.purity import PurityAnalysis
 from pymonkey.evaluator.mbuiltins import Builtins
 from pymonkey.evaluator.mobject import (
     MArrayObject,
     MBooleanObject,
+    MBreakObject,
     MBuiltinFunction,
+    MContinueObject,
     MEnvironment,
     MErrorObject,
     MFunctionObject,
@@ -14,11 +17,15 @@ from pymonkey.evaluator.mobject import (
     MStringObject,
     MValuedObject,
 )
+from pymonkey.memo import MemoCache
 from pymonkey.parser.mast import (
     MArrayExpression,
+    MAssignStatement,
     MBlockStatement,
     MBooleanExpression,
+    MBreakStatement,
     MCallExpression,
+    MContinueStatement,
     MExpression,
     MExpressionStatement,
     MFunctionExpression,
@@ -34,16 +41,32 @@ from pymonkey.parser.mast import (
     MProgram,
     MReturnStatement,
     MStringExpression,
+    MWhileStatement,
 )
 
+BUILTINS = Builtins().fns
+
 
 class MEvaluator:
-    def __init__(self, top_node: MNode):
+    # memo cache of the running evaluation, if memoization is enabled
+    active_memo: None | MemoCache = None
+
+    def __init__(self, top_node: MNode, memo: None | MemoCache = None):
         self.top_node = top_node
         self.top_env = MEnvironment(store={}, outer=None)
+        self.memo = memo
 
     def evaluate(self) -> MObject:
-        return MEvaluator.eval_node(self.top_node, self.top_env)
+        if self.memo is None:
+            return MEvaluator.eval_node(self.top_node, self.top_env)
+
+        PurityAnalysis.analyze(self.top_node)
+        outer_memo = MEvaluator.active_memo
+        MEvaluator.active_memo = self.memo
+        try:
+            return MEvaluator.eval_node(self.top_node, self.top_env)
+        finally:
+            MEvaluator.active_memo = outer_memo
 
     @classmethod
     def eval_node(cls, node: MNode, env: MEnvironment) -> MObject:
@@ -69,6 +92,24 @@ class MEvaluator:
                 return val
             env.set(node.name.value, val)
 
+        elif isinstance(node, MAssignStatement):
+            val = MEvaluator.eval_node(node.value, env)
+            if isinstance(val, MErrorObject):
+                return val
+            try:
+                env.assign(node.name.value, val)
+            except KeyError:
+                return MErrorObject("identifier not found")
+
+        elif isinstance(node, MWhileStatement):
+            return MEvaluator.eval_while_statement(node, env)
+
+        elif isinstance(node, MBreakStatement):
+            return MBreakObject()
+
+        elif isinstance(node, MContinueStatement):
+            return MContinueObject()
+
         # Expression
         elif isinstance(node, MIntegerExpression):
             return MIntegerObject(node.value)
@@ -124,7 +165,7 @@ class MEvaluator:
             return MEvaluator.eval_identifier(node, env)
 
         elif isinstance(node, MFunctionExpression):
-            return MFunctionObject(node.parameters, node.body, env)
+            return MFunctionObject(node.parameters, node.body, env, node.pure)
 
         elif isinstance(node, MCallExpression):
             function = MEvaluator.eval_node(node.function, env)
@@ -158,6 +199,9 @@ class MEvaluator:
             if isinstance(result, MErrorObject):
                 return result
 
+            if isinstance(result, MBreakObject | MContinueObject):
+                return MErrorObject(f"{result} outside loop")
+
         return result
 
     @classmethod
@@ -167,13 +211,33 @@ class MEvaluator:
         for stmt in block.statements:
             result = MEvaluator.eval_node(stmt, env)
 
-            if isinstance(result, MReturnValueObject) or isinstance(
-                result, MErrorObject
+            if isinstance(
+                result,
+                MReturnValueObject | MErrorObject | MBreakObject | MContinueObject,
             ):
                 return result
 
         return result
 
+    @classmethod
+    def eval_while_statement(cls, node: MWhileStatement, env: MEnvironment) -> MObject:
+        while True:
+            condition = MEvaluator.eval_node(node.condition, env)
+            if isinstance(condition, MErrorObject):
+                return condition
+
+            if not MEvaluator.is_truthy(condition):
+                break
+
+            result = MEvaluator.eval_block_statement(node.body, env)
+            if isinstance(result, MReturnValueObject | MErrorObject):
+                return result
+
+            if isinstance(result, MBreakObject):
+                break
+
+        return MNullObject()
+
     @classmethod
     def native_bool_to_boolean_object(cls, input: bool) -> MBooleanObject:
         if input:
@@ -292,12 +356,10 @@ class MEvaluator:
         else:
             return val
 
-        try:
-            val = Builtins().fns[node.value]
-        except KeyError:
+        builtin = BUILTINS.get(node.value)
+        if builtin is None:
             return MErrorObject("identifier not found")
-
-        return val
+        return builtin
 
     @classmethod
     def is_truthy(cls, obj: MObject) -> bool:
@@ -356,11 +418,26 @@ class MEvaluator:
 
     @classmethod
     def apply_function(cls, fn: MFunctionObject, args: list[MObject]) -> MObject:
+        memo = MEvaluator.active_memo
+        memo_key = None
+        if memo is not None and fn.pure:
+            memo_key = MemoCache.make_key(id(fn.body), args)
+            if memo_key is not None:
+                cached = memo.get(memo_key)
+                if cached is not None:
+                    return cached
+
         extended_env = MEvaluator.extend_function_env(fn, args)
         evaluated = MEvaluator.eval_node(fn.body, extended_env)
 
         if isinstance(evaluated, MReturnValueObject):
-            return evaluated.value
+            evaluated = evaluated.value
+        if isinstance(evaluated, MBreakObject | MContinueObject):
+            return MErrorObject(f"{evaluated} outside loop")
+
+        if memo is not None and memo_key is not None:
+            if not isinstance(evaluated, MErrorObject):
+                memo.put(memo_key, evaluated)
         return evaluated
 
     @classmethod
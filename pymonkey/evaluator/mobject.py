@@ -67,6 +67,18 @@ class MReturnValueObject(MObject):
         return f"{self.value}"
 
 
+@dataclass
+class MBreakObject(MObject):
+    def __str__(self) -> str:
+        return "break"
+
+
+@dataclass
+class MContinueObject(MObject):
+    def __str__(self) -> str:
+        return "continue"
+
+
 @dataclass
 class MErrorObject(MObject):
     message: str
@@ -80,6 +92,7 @@ class MFunctionObject(MObject):
     parameters: List[MExpression]
     body: MBlockStatement
     env: "MEnvironment"
+    pure: bool = False
 
     def __str__(self) -> str:
         params = ", ".join([str(p) for p in self.parameters])
@@ -99,14 +112,62 @@ class MEnvironment:
         return val
 
     def get(self, name: str) -> MObject:
-        try:
-            return self.store[name]
-        except KeyError:
-            if self.outer is not None:
-                return self.outer.store[name]
+        env: MEnvironment | None = self
+        while env is not None:
+            if name in env.store:
+                return env.store[name]
+            env = env.outer
+        raise KeyError(name)
+
+    def assign(self, name: str, val: MObject) -> MObject:
+        env: MEnvironment | None = self
+        while env is not None:
+            if name in env.store:
+                env.store[name] = val
+                return val
+            env = env.outer
         raise KeyError
 
 
+@dataclass
+class MSlotEnvironment:
+    """
+    Environment of one function call, variables are stored at the slots the
+    resolver gave them. A slot is None until its variable is set.
+    """
+
+    slots: List[None | MObject]
+    names: tuple[str, ...]
+    outer: Union["MSlotEnvironment", None]
+
+    def __str__(self) -> str:
+        return f"SlotEnvironment <{dict(zip(self.names, self.slots))}, {self.outer}>"
+
+    def get(self, name: str) -> MObject:
+        """
+        Look name up by its name, for variables read before they are set
+        """
+        env: MSlotEnvironment | None = self
+        while env is not None:
+            if name in env.names:
+                value = env.slots[env.names.index(name)]
+                if value is not None:
+                    return value
+            env = env.outer
+        raise KeyError(name)
+
+    def assign(self, name: str, val: MObject) -> MObject:
+        env: MSlotEnvironment | None = self
+        while env is not None:
+            if name in env.names:
+                slot = env.names.index(name)
+                if env.slots[slot] is not None:
+                    env.slots[slot] = val
+                    return val
+            env = env.outer
+        raise KeyError(name)
+
+
 @dataclass
 class MBuiltinFunction(MObject):
     fn: Callable
@@ -0,0 +1,77 @@
+from dataclasses import dataclass, field
+from typing import Iterator, List
+
+from pymonkey.parser.mast import MFunctionExpression, MIdentifier, MLetStatement, MNode
+from pymonkey.parser.mvisitor import iter_child_nodes
+
+
+@dataclass
+class Resolver:
+    """
+    Number the variables of every function, parameters first and then the
+    names bound by let, and annotate each MIdentifier with the (depth, slot)
+    of the function that declares it. Depth 0 is the function the identifier
+    is in, depth 1 the one enclosing it and so on. Identifiers that no
+    function declares, like builtins, keep depth None.
+    """
+
+    scopes: List[dict[str, int]] = field(default_factory=list)
+
+    @classmethod
+    def resolve(cls, program: MNode) -> tuple[str, ...]:
+        """
+        Annotate program, return the names of the top level slots
+        """
+        return Resolver().resolve_scope([], [program])
+
+    @classmethod
+    def scope_nodes(cls, nodes: List[MNode]) -> Iterator[MNode]:
+        """
+        Nodes belonging to the scope of nodes, nested functions are yielded
+        but not entered
+        """
+        stack = list(reversed(nodes))
+        while stack:
+            node = stack.pop()
+            yield node
+            if not isinstance(node, MFunctionExpression):
+                stack.extend(reversed(list(iter_child_nodes(node))))
+
+    def resolve_scope(
+        self, parameters: List[MIdentifier], body: List[MNode]
+    ) -> tuple[str, ...]:
+        slots: dict[str, int] = {}
+        for param in parameters:
+            slots.setdefault(param.value, len(slots))
+        for node in self.scope_nodes(body):
+            if isinstance(node, MLetStatement):
+                slots.setdefault(node.name.value, len(slots))
+
+        self.scopes.append(slots)
+        for param in parameters:
+            self.annotate(param)
+        for node in self.scope_nodes(body):
+            if isinstance(node, MIdentifier):
+                self.annotate(node)
+            elif isinstance(node, MFunctionExpression):
+                self.resolve_function(node)
+        self.scopes.pop()
+
+        return tuple(slots)
+
+    def resolve_function(self, node: MFunctionExpression) -> None:
+        parameters = []
+        for param in node.parameters:
+            if not isinstance(param, MIdentifier):
+                raise TypeError("function parameter is not an identifier")
+            parameters.append(param)
+        node.slot_names = self.resolve_scope(parameters, [node.body])
+
+    def annotate(self, node: MIdentifier) -> None:
+        for depth, slots in enumerate(reversed(self.scopes)):
+            if node.value in slots:
+                node.depth = depth
+                node.slot = slots[node.value]
+                return
+        node.depth = None
+        node.slot = None
@@ -0,0 +1,502 @@
+from dataclasses import dataclass, field
+from typing import Any, Callable, List, cast
+
+from pymonkey.compiler.purity import PurityAnalysis
+from pymonkey.evaluator.closure_evaluator import (
+    INTEGER_OPERATORS,
+    NULL,
+    UNWINDING,
+    ClosureEvaluator,
+    MClosureFunctionObject,
+)
+from pymonkey.evaluator.mevaluator import MEvaluator
+from pymonkey.evaluator.mobject import (
+    MArrayObject,
+    MBooleanObject,
+    MBreakObject,
+    MBuiltinFunction,
+    MContinueObject,
+    MErrorObject,
+    MHashMapObject,
+    MIntegerObject,
+    MObject,
+    MReturnValueObject,
+    MSlotEnvironment,
+    MStringObject,
+    MValuedObject,
+)
+from pymonkey.evaluator.resolver import Resolver
+from pymonkey.memo import MemoCache
+from pymonkey.parser.mast import (
+    MArrayExpression,
+    MAssignStatement,
+    MBlockStatement,
+    MBooleanExpression,
+    MBreakStatement,
+    MCallExpression,
+    MContinueStatement,
+    MExpressionStatement,
+    MFunctionExpression,
+    MHashMapExpression,
+    MIdentifier,
+    MIfExpression,
+    MIndexExpression,
+    MInfixExpression,
+    MIntegerExpression,
+    MLetStatement,
+    MNode,
+    MPrefixExpression,
+    MProgram,
+    MReturnStatement,
+    MStringExpression,
+    MWhileStatement,
+)
+
+# max entries of the work stack, each Monkey call takes a few
+STACK_LIMIT = 1_000_000
+
+Run = Callable[[MSlotEnvironment, Any], None]
+
+
+@dataclass
+class Step:
+    """
+    A compiled node. run pushes the value of the node or the tasks that
+    compute it, value is set for nodes that never need the work stack.
+    """
+
+    run: Run
+    value: None | Callable[[MSlotEnvironment], MObject] = None
+
+
+@dataclass
+class TrampolineEvaluator:
+    """
+    Evaluator with the results and errors of MEvaluator that does not use the
+    python stack for Monkey calls. Nodes push tasks onto a work stack and
+    their values onto a value stack, a loop runs the tasks. Recursion is only
+    limited by stack_limit, exceeding it is the error "stack overflow".
+    """
+
+    top_node: MNode
+    memo: None | MemoCache = None
+    stack_limit: int = STACK_LIMIT
+    top_env: None | MSlotEnvironment = None
+    work: List[tuple[Run, MSlotEnvironment, Any]] = field(default_factory=list)
+    values: List[MObject] = field(default_factory=list)
+
+    def evaluate(self) -> MObject:
+        if self.memo is not None:
+            PurityAnalysis.analyze(self.top_node)
+        names = Resolver.resolve(self.top_node)
+        self.top_env = MSlotEnvironment([None] * len(names), names, None)
+
+        work, values = self.work, self.values
+        self.schedule(self.compile(self.top_node), self.top_env)
+        while work:
+            run, env, data = work.pop()
+            run(env, data)
+        return values.pop()
+
+    def schedule(self, step: Step, env: MSlotEnvironment) -> None:
+        if step.value is not None:
+            self.values.append(step.value(env))
+        else:
+            self.work.append((step.run, env, None))
+
+    def immediate(self, value: Callable[[MSlotEnvironment], MObject]) -> Step:
+        values = self.values
+        return Step(lambda env, data: values.append(value(env)), value)
+
+    def compile(self, node: MNode) -> Step:
+        if isinstance(node, MProgram):
+            return self.compile_sequence(node.statements, True)
+
+        elif isinstance(node, MBlockStatement):
+            return self.compile_sequence(node.statements, False)
+
+        elif isinstance(node, MExpressionStatement):
+            return self.compile(node.expression)
+
+        elif isinstance(node, MReturnStatement):
+            return self.compile_return(node)
+
+        elif isinstance(node, MLetStatement):
+            return self.compile_let(node)
+
+        elif isinstance(node, MAssignStatement):
+            return self.compile_assign(node)
+
+        elif isinstance(node, MWhileStatement):
+            return self.compile_while(node)
+
+        elif isinstance(node, MBreakStatement):
+            return self.immediate(lambda env: MBreakObject())
+
+        elif isinstance(node, MContinueStatement):
+            return self.immediate(lambda env: MContinueObject())
+
+        elif isinstance(node, MIntegerExpression):
+            integer = MIntegerObject(node.value)
+            return self.immediate(lambda env: integer)
+
+        elif isinstance(node, MBooleanExpression):
+            boolean = MBooleanObject(node.value)
+            return self.immediate(lambda env: boolean)
+
+        elif isinstance(node, MStringExpression):
+            string = MStringObject(node.value)
+            return self.immediate(lambda env: string)
+
+        elif isinstance(node, MArrayExpression):
+            return self.compile_array(node)
+
+        elif isinstance(node, MIndexExpression):
+            return self.compile_binary(
+                node.left, node.index, MEvaluator.eval_index_expression
+            )
+
+        elif isinstance(node, MHashMapExpression):
+            return self.compile_hash_literal(node)
+
+        elif isinstance(node, MPrefixExpression):
+            return self.compile_prefix(node)
+
+        elif isinstance(node, MInfixExpression):
+            return self.compile_infix(node)
+
+        elif isinstance(node, MIfExpression):
+            return self.compile_if(node)
+
+        elif isinstance(node, MIdentifier):
+            return self.immediate(ClosureEvaluator.compile_identifier(node))
+
+        elif isinstance(node, MFunctionExpression):
+            return self.compile_function(node)
+
+        elif isinstance(node, MCallExpression):
+            return self.compile_call(node)
+
+        return self.immediate(lambda env: NULL)
+
+    def compile_sequence(self, statements: List[Any], program: bool) -> Step:
+        steps = [self.compile(stmt) for stmt in statements]
+        work, values = self.work, self.values
+
+        def after_statement(env: MSlotEnvironment, i: int) -> None:
+            result = values[-1]
+            if type(result) in UNWINDING:
+                if program:
+                    values.pop()
+                    if isinstance(result, MReturnValueObject):
+                        values.append(result.value)
+                    elif isinstance(result, MErrorObject):
+                        values.append(result)
+                    else:
+                        values.append(MErrorObject(f"{result} outside loop"))
+                return
+            if i + 1 < len(steps):
+                values.pop()
+                work.append((after_statement, env, i + 1))
+                self.schedule(steps[i + 1], env)
+
+        def run_sequence(env: MSlotEnvironment, data: Any) -> None:
+            if not steps:
+                values.append(NULL)
+                return
+            work.append((after_statement, env, 0))
+            self.schedule(steps[0], env)
+
+        return Step(run_sequence)
+
+    def then(self, step: Step, after: Run) -> Step:
+        """
+        Step evaluating step and calling after with its value on the value
+        stack, unless it is an error
+        """
+        work, values = self.work, self.values
+
+        def check(env: MSlotEnvironment, data: Any) -> None:
+            if type(values[-1]) is not MErrorObject:
+                after(env, data)
+
+        def run_then(env: MSlotEnvironment, data: Any) -> None:
+            work.append((check, env, data))
+            self.schedule(step, env)
+
+        return Step(run_then)
+
+    def compile_return(self, node: MReturnStatement) -> Step:
+        values = self.values
+
+        def after_value(env: MSlotEnvironment, data: Any) -> None:
+            values.append(MReturnValueObject(values.pop()))
+
+        return self.then(self.compile(node.value), after_value)
+
+    def compile_let(self, node: MLetStatement) -> Step:
+        slot = node.name.slot
+        values = self.values
+
+        def after_value(env: MSlotEnvironment, data: Any) -> None:
+            env.slots[slot] = values.pop()  # type: ignore[index]
+            values.append(NULL)
+
+        return self.then(self.compile(node.value), after_value)
+
+    def compile_assign(self, node: MAssignStatement) -> Step:
+        name = node.name.value
+        depth, slot = node.name.depth, node.name.slot
+        values = self.values
+
+        def after_value(env: MSlotEnvironment, data: Any) -> None:
+            val = values.pop()
+            values.append(NULL)
+            if depth is not None:
+                target = env
+                for _ in range(depth):
+                    target = target.outer  # type: ignore[assignment]
+                if target.slots[slot] is not None:  # type: ignore[index]
+                    target.slots[slot] = val  # type: ignore[index]
+                    return
+            try:
+                env.assign(name, val)
+            except KeyError:
+                values[-1] = MErrorObject("identifier not found")
+
+        return self.then(self.compile(node.value), after_value)
+
+    def compile_while(self, node: MWhileStatement) -> Step:
+        condition = self.compile(node.condition)
+        body = self.compile(node.body)
+        work, values = self.work, self.values
+
+        def after_condition(env: MSlotEnvironment, data: Any) -> None:
+            cond = values.pop()
+            if type(cond) is MErrorObject:
+                values.append(cond)
+            elif not MEvaluator.is_truthy(cond):
+                values.append(NULL)
+            else:
+                work.append((after_body, env, None))
+                self.schedule(body, env)
+
+        def after_body(env: MSlotEnvironment, data: Any) -> None:
+            result = values.pop()
+            if isinstance(result, MBreakObject):
+                values.append(NULL)
+            elif isinstance(result, MReturnValueObject | MErrorObject):
+                values.append(result)
+            else:
+                run_while(env, None)
+
+        def run_while(env: MSlotEnvironment, data: Any) -> None:
+            work.append((after_condition, env, None))
+            self.schedule(condition, env)
+
+        return Step(run_while)
+
+    def compile_array(self, node: MArrayExpression) -> Step:
+        elements = [self.compile(e) for e in node.value]
+        work, values = self.work, self.values
+
+        def after_element(env: MSlotEnvironment, collected: List[MObject]) -> None:
+            value = values.pop()
+            if type(value) is MErrorObject:
+                values.append(value)
+                return
+            collected.append(value)
+            next_element(env, collected)
+
+        def next_element(env: MSlotEnvironment, collected: List[MObject]) -> None:
+            if len(collected) == len(elements):
+                values.append(MArrayObject(collected))
+                return
+            work.append((after_element, env, collected))
+            self.schedule(elements[len(collected)], env)
+
+        return Step(lambda env, data: next_element(env, []))
+
+    def compile_binary(
+        self,
+        left: MNode,
+        right: MNode,
+        apply: Callable[[MObject, MObject], MObject],
+    ) -> Step:
+        left_step = self.compile(left)
+        right_step = self.compile(right)
+        work, values = self.work, self.values
+
+        def after_right(env: MSlotEnvironment, left_value: MObject) -> None:
+            right_value = values.pop()
+            if type(right_value) is MErrorObject:
+                values.append(right_value)
+            else:
+                values.append(apply(left_value, right_value))
+
+        def after_left(env: MSlotEnvironment, data: Any) -> None:
+            left_value = values.pop()
+            work.append((after_right, env, left_value))
+            self.schedule(right_step, env)
+
+        return self.then(left_step, after_left)
+
+    def compile_infix(self, node: MInfixExpression) -> Step:
+        operator_ = node.operator
+        if operator_ not in INTEGER_OPERATORS:
+            return self.compile_binary(
+                node.left,
+                node.right,
+                lambda left, right: MEvaluator.eval_infix_expression(
+                    operator_, left, right
+                ),
+            )
+        apply, result_type = INTEGER_OPERATORS[operator_]
+
+        def infix(left: MObject, right: MObject) -> MObject:
+            if type(left) is MIntegerObject and type(right) is MIntegerObject:
+                return result_type(apply(left.value, right.value))
+            return MEvaluator.eval_infix_expression(operator_, left, right)
+
+        return self.compile_binary(node.left, node.right, infix)
+
+    def compile_prefix(self, node: MPrefixExpression) -> Step:
+        operator_ = node.operator
+        values = self.values
+
+        def after_right(env: MSlotEnvironment, data: Any) -> None:
+            values.append(MEvaluator.eval_prefix_expression(operator_, values.pop()))
+
+        return self.then(self.compile(node.right), after_right)
+
+    def compile_hash_literal(self, node: MHashMapExpression) -> Step:
+        pairs = [(self.compile(k), self.compile(v)) for k, v in node.pairs.items()]
+        work, values = self.work, self.values
+
+        # the index of the pair is carried along, repeated keys do not grow
+        # the dict
+        def after_key(env: MSlotEnvironment, data: tuple[dict, int]) -> None:
+            hash_dict, index = data
+            key = values.pop()
+            if type(key) is MErrorObject:
+                values.append(key)
+            elif not isinstance(key, MValuedObject):
+                values.append(MErrorObject("key not hashable"))
+            else:
+                work.append((after_value, env, (hash_dict, index, key)))
+                self.schedule(pairs[index][1], env)
+
+        def after_value(env: MSlotEnvironment, data: tuple[dict, int, MObject]) -> None:
+            hash_dict, index, key = data
+            value = values.pop()
+            if type(value) is MErrorObject:
+                values.append(value)
+                return
+            hash_dict[key] = value
+            next_pair(env, hash_dict, index + 1)
+
+        def next_pair(env: MSlotEnvironment, hash_dict: dict, index: int) -> None:
+            if index == len(pairs):
+                values.append(MHashMapObject(hash_dict))
+                return
+            work.append((after_key, env, (hash_dict, index)))
+            self.schedule(pairs[index][0], env)
+
+        return Step(lambda env, data: next_pair(env, {}, 0))
+
+    def compile_if(self, node: MIfExpression) -> Step:
+        consequence = self.compile(node.consequence)
+        alternative = (
+            None if node.alternative is None else self.compile(node.alternative)
+        )
+        values = self.values
+
+        def after_condition(env: MSlotEnvironment, data: Any) -> None:
+            if MEvaluator.is_truthy(values.pop()):
+                self.schedule(consequence, env)
+            elif alternative is not None:
+                self.schedule(alternative, env)
+            else:
+                values.append(NULL)
+
+        return self.then(self.compile(node.condition), after_condition)
+
+    def compile_function(self, node: MFunctionExpression) -> Step:
+        body = self.compile(node.body)
+        parameter_slots = tuple(
+            p.slot for p in node.parameters if isinstance(p, MIdentifier)
+        )
+        return self.immediate(
+            lambda env: MClosureFunctionObject(
+                node, env, body, parameter_slots  # type: ignore[arg-type]
+            )
+        )
+
+    def compile_call(self, node: MCallExpression) -> Step:
+        arguments = [self.compile(a) for a in node.arguments]
+        work, values = self.work, self.values
+
+        def after_argument(env: MSlotEnvironment, data: tuple) -> None:
+            fn, args = data
+            value = values.pop()
+            if type(value) is MErrorObject:
+                values.append(value)
+                return
+            args.append(value)
+            next_argument(env, fn, args)
+
+        def next_argument(
+            env: MSlotEnvironment, fn: MObject, args: List[MObject]
+        ) -> None:
+            if len(args) < len(arguments):
+                work.append((after_argument, env, (fn, args)))
+                self.schedule(arguments[len(args)], env)
+            else:
+                self.call(fn, args)
+
+        def after_function(env: MSlotEnvironment, data: Any) -> None:
+            next_argument(env, values.pop(), [])
+
+        return self.then(self.compile(node.function), after_function)
+
+    def call(self, fn: MObject, args: List[MObject]) -> None:
+        values = self.values
+        if isinstance(fn, MBuiltinFunction):
+            result = fn.fn(args)
+            values.append(NULL if result is None else result)
+            return
+        if not isinstance(fn, MClosureFunctionObject):
+            values.append(MErrorObject("not a function"))
+            return
+        if len(self.work) >= self.stack_limit:
+            values.append(MErrorObject("stack overflow"))
+            return
+
+        function = fn.function
+        memo_key = None
+        if self.memo is not None and function.pure:
+            memo_key = MemoCache.make_key(id(function.body), args)
+            if memo_key is not None:
+                cached = self.memo.get(memo_key)
+                if cached is not None:
+                    values.append(cached)
+                    return
+
+        slots: List[None | MObject] = [None] * len(function.slot_names)
+        for i, slot in enumerate(fn.parameter_slots):
+            slots[slot] = args[i]
+        env = MSlotEnvironment(slots, function.slot_names, fn.env)
+        self.work.append((self.after_call, env, memo_key))
+        # functions made by compile_function carry a Step as their code
+        self.schedule(cast(Step, fn.code), env)
+
+    def after_call(self, env: MSlotEnvironment, memo_key: None | tuple) -> None:
+        evaluated = self.values.pop()
+        if isinstance(evaluated, MReturnValueObject):
+            evaluated = evaluated.value
+        if isinstance(evaluated, MBreakObject | MContinueObject):
+            evaluated = MErrorObject(f"{evaluated} outside loop")
+
+        if memo_key is not None and not isinstance(evaluated, MErrorObject):
+            self.memo.put(memo_key, evaluated)  # type: ignore[union-attr]
+        self.values.append(evaluated)
@@ -1,4 +1,4 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, replace
 
 from pymonkey.lexer.mtoken import KEYWORDS, MToken, MTokenPosition, MTokenType
 
@@ -41,49 +41,49 @@ class MLexer:
                 self._token_position.pos = 0
             self._read_ch()
 
+        # every token keeps its own copy, the lexer moves on
+        position = replace(self._token_position)
         token: MToken
         match self._ch:
             case "=":
                 if self._next_ch() == "=":
                     self._read_ch()
-                    token = MToken(MTokenType.Equal, "==", self._token_position)
+                    token = MToken(MTokenType.Equal, "==", position)
                 else:
-                    token = MToken(MTokenType.Assign, "=", self._token_position)
+                    token = MToken(MTokenType.Assign, "=", position)
             case "+":
-                token = MToken(MTokenType.Plus, "+", self._token_position)
+                token = MToken(MTokenType.Plus, "+", position)
             case "-":
-                token = MToken(MTokenType.Minus, "-", self._token_position)
+                token = MToken(MTokenType.Minus, "-", position)
             case "!":
                 if self._next_ch() == "=":
                     self._read_ch()
-                    token = MToken(MTokenType.NotEqual, "!=", self._token_position)
+                    token = MToken(MTokenType.NotEqual, "!=", position)
                 else:
-                    token = MToken(MTokenType.Bang, "!", self._token_position)
+                    token = MToken(MTokenType.Bang, "!", position)
             case "*":
-                token = MToken(MTokenType.Asterisk, "*", self._token_position)
+                token = MToken(MTokenType.Asterisk, "*", position)
             case "/":
-                token = MToken(MTokenType.Slash, "/", self._token_position)
+                token = MToken(MTokenType.Slash, "/", position)
             case "<":
-                token = MToken(MTokenType.Lesser, "<", self._token_position)
+                token = MToken(MTokenType.Lesser, "<", position)
             case ">":
-                token = MToken(MTokenType.Greater, ">", self._token_position)
+                token = MToken(MTokenType.Greater, ">", position)
 
             case ",":
-                token = MToken(MTokenType.Comma, ",", self._token_position)
+                token = MToken(MTokenType.Comma, ",", position)
             case ";":
-                token = MToken(MTokenType.Semicolon, ";", self._token_position)
+                token = MToken(MTokenType.Semicolon, ";", position)
             case ":":
-                token = MToken(MTokenType.Colon, ":", self._token_position)
+                token = MToken(MTokenType.Colon, ":", position)
             case '"':
-                token = MToken(
-                    MTokenType.String, self._read_string(), self._token_position
-                )
+                token = MToken(MTokenType.String, self._read_string(), position)
             case "(":
-                token = MToken(MTokenType.LParen, "(", self._token_position)
+                token = MToken(MTokenType.LParen, "(", position)
                 self._n_paren += 1
                 self._last_paren = token
             case ")":
-                token = MToken(MTokenType.RParen, ")", self._token_position)
+                token = MToken(MTokenType.RParen, ")", position)
                 self._n_paren -= 1
                 if self._n_paren < 0:
                     self.errors.append(
@@ -91,11 +91,11 @@ class MLexer:
                     )
                 self._last_paren = token
             case "{":
-                token = MToken(MTokenType.LBrace, "{", self._token_position)
+                token = MToken(MTokenType.LBrace, "{", position)
                 self._n_braces += 1
                 self._last_brace = token
             case "}":
-                token = MToken(MTokenType.RBrace, "}", self._token_position)
+                token = MToken(MTokenType.RBrace, "}", position)
                 self._n_braces -= 1
                 if self._n_braces < 0:
                     self.errors.append(
@@ -103,11 +103,11 @@ class MLexer:
                     )
                 self._last_brace = token
             case "[":
-                token = MToken(MTokenType.LBracket, "[", self._token_position)
+                token = MToken(MTokenType.LBracket, "[", position)
                 self._n_brackets += 1
                 self._last_bracket = token
             case "]":
-                token = MToken(MTokenType.RBracket, "]", self._token_position)
+                token = MToken(MTokenType.RBracket, "]", position)
                 self._n_brackets -= 1
                 if self._n_brackets < 0:
                     self.errors.append(
@@ -125,20 +125,16 @@ class MLexer:
                         self._read_ch()
                     identifier = self._input[pos : self._position]
                     if identifier in KEYWORDS:
-                        return MToken(
-                            MTokenType.Keyword, identifier, self._token_position
-                        )
+                        return MToken(MTokenType.Keyword, identifier, position)
                     else:
-                        return MToken(
-                            MTokenType.Identifier, identifier, self._token_position
-                        )
+                        return MToken(MTokenType.Identifier, identifier, position)
 
                 elif self._ch.isnumeric():
                     pos = self._position
                     while self._ch.isnumeric():
                         self._read_ch()
                     number = self._input[pos : self._position]
-                    return MToken(MTokenType.Number, number, self._token_position)
+                    return MToken(MTokenType.Number, number, position)
 
                 else:
                     token = MToken()
@@ -2,7 +2,18 @@ from dataclasses import dataclass
 from enum import Enum, auto
 from typing import Optional
 
-KEYWORDS = ["fn", "let", "true", "false", "if", "else", "return"]
+KEYWORDS = [
+    "fn",
+    "let",
+    "true",
+    "false",
+    "if",
+    "else",
+    "return",
+    "while",
+    "break",
+    "continue",
+]
 
 
 class MTokenType(Enum):
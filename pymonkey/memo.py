@@ -0,0 +1,66 @@
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Generic, Hashable, TypeVar
+
+from pymonkey.evaluator.mobject import MObject, MValuedObject
+
+V = TypeVar("V")
+
+
+@dataclass
+class MemoCache(Generic[V]):
+    """
+    Bounded LRU cache for results of pure function calls, the server keeps
+    compiled programs in one too
+    """
+
+    max_size: int = 4096
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    entries: OrderedDict = field(default_factory=OrderedDict)
+
+    def __str__(self) -> str:
+        return (
+            f"memo: {self.hits} hits, {self.misses} misses "
+            f"({self.hit_rate:.1%} hit rate), {len(self.entries)} entries, "
+            f"{self.evictions} evictions"
+        )
+
+    @property
+    def hit_rate(self) -> float:
+        calls = self.hits + self.misses
+        if calls == 0:
+            return 0.0
+        return self.hits / calls
+
+    @classmethod
+    def make_key(cls, function: Hashable, args: list[MObject]) -> None | tuple:
+        """
+        Key of a call, or None if an argument can not be hashed
+        """
+        key: list[Hashable] = [function]
+        for arg in args:
+            if not isinstance(arg, MValuedObject):
+                return None
+            # type is part of the key, since true == 1 for python values
+            key.append((type(arg), arg.value))
+        return tuple(key)
+
+    def get(self, key: tuple) -> None | V:
+        try:
+            value = self.entries[key]
+        except KeyError:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return value
+
+    def put(self, key: tuple, value: V) -> None:
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+            self.evictions += 1
@@ -1,22 +1,155 @@
+import contextlib
 import sys
+import textwrap
+import time
+from dataclasses import dataclass, field
 
-from pymonkey.evaluator.mevaluator import MEvaluator
-from pymonkey.lexer.mlexer import MLexer
-from pymonkey.parser.mparser import MParser
+from pymonkey.allocations import AllocationCounter
+from pymonkey.compiler.compiler import Compiler
+from pymonkey.evaluator.mobject import MObject
+from pymonkey.object.object import CompliedFunction
+from pymonkey.parser.mast import MExpressionStatement
+from pymonkey.parser.mparser import parse_source
+from pymonkey.vm.vm import VM
+
+PROFILE_TOP = 10
+
+
+@dataclass
+class ReplSession:
+    """
+    One compiler, with its symbol table and constant pool, and one VM globals
+    store shared by every input, so definitions persist from line to line
+    """
+
+    compiler: Compiler = field(default_factory=lambda: Compiler(optimize=1))
+    globals: dict[int, MObject] = field(default_factory=dict)
+    # whether the last input ends with an expression, only its value is echoed
+    echo: bool = False
+
+    def prepare(self, line: str, profile: bool = False) -> VM:
+        program = parse_source(line)
+        bytecode = self.compiler.compile_incremental(program)
+        self.echo = bool(program.statements) and isinstance(
+            program.statements[-1], MExpressionStatement
+        )
+        return VM(bytecode, globals_=self.globals, profile=profile)
+
+    def run(
+        self,
+        line: str,
+        profile: bool = False,
+        allocations: None | AllocationCounter = None,
+    ) -> VM:
+        """
+        Compile and run line. When the run fails the compiler forgets the
+        definitions of line, but keeps its constants, which functions it
+        stored may use
+        """
+        checkpoint = self.compiler.checkpoint()
+        vm = self.prepare(line, profile)
+        try:
+            with allocations or contextlib.nullcontext():
+                vm.run()
+        except Exception:
+            self.compiler.restore(checkpoint, keep_constants=True)
+            raise
+        return vm
+
+    def execute(self, line: str) -> None | MObject:
+        """
+        Value of line if it ends with an expression, otherwise None
+        """
+        vm = self.run(line)
+        return vm.last_pop if self.echo else None
+
+    def echoed(self, vm: VM) -> list[str]:
+        return [f"-> {vm.last_pop}"] if self.echo else []
+
+    def time(self, line: str) -> str:
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        vm = self.run(line)
+        wall = time.perf_counter() - wall
+        cpu = time.process_time() - cpu
+        return "\n".join(
+            [
+                *self.echoed(vm),
+                f"wall {wall * 1000:.3f}ms, cpu {cpu * 1000:.3f}ms, "
+                f"{vm.executed} instructions",
+            ]
+        )
+
+    def profile(self, line: str) -> str:
+        vm = self.run(line, profile=True)
+        profile = {**(vm.profile or {}), "<main>": vm.main_profile()}
+        hottest = sorted(profile.items(), key=lambda p: -p[1].instructions)
+        lines = [*self.echoed(vm), "instructions     %    calls  function"]
+        for name, stats in hottest[:PROFILE_TOP]:
+            share = 100 * stats.instructions / max(vm.executed, 1)
+            lines.append(
+                f"{stats.instructions:12d} {share:5.1f} {stats.calls:8d}  {name}"
+            )
+        return "\n".join(lines)
+
+    def disassemble(self, line: str) -> str:
+        """
+        Compile line without running it or keeping its definitions, show the
+        instructions and the constants it adds
+        """
+        checkpoint = self.compiler.checkpoint()
+        bytecode = self.compiler.compile_incremental(parse_source(line))
+        constants = bytecode.constants[checkpoint.num_constants :]
+        self.compiler.restore(checkpoint)
+
+        lines = [str(bytecode.instructions)]
+        for i, constant in enumerate(constants, checkpoint.num_constants):
+            lines.append(f"constant {i}: {constant}")
+            if isinstance(constant, CompliedFunction):
+                lines.append(textwrap.indent(str(constant.instructions), "    "))
+        return "\n".join(lines)
+
+    def memory(self, line: str) -> str:
+        allocations = AllocationCounter()
+        vm = self.run(line, allocations=allocations)
+        lines = self.echoed(vm)
+        for name, count in allocations.counts.most_common():
+            lines.append(f"{count:12d}  {name}")
+        return "\n".join(lines)
+
+    def command(self, line: str) -> str:
+        """
+        Run a meta command, ":<name> <monkey code>"
+        """
+        name, _, code = line.strip().partition(" ")
+        commands = {
+            ":time": self.time,
+            ":profile": self.profile,
+            ":dis": self.disassemble,
+            ":mem": self.memory,
+        }
+        if name not in commands:
+            raise ValueError(f"unknown command {name}, try {', '.join(commands)}")
+        return commands[name](code)
 
 
 def repl() -> None:
     print("Monkey REPL: (type exit() to close REPL)")
 
+    session = ReplSession()
     for line in sys.stdin:
         if line == "exit()\n":
             break
 
-        lexer = MLexer(line)
-        program = MParser(lexer).parse_program()
-        evaluation = MEvaluator(program).evaluate()
-
-        print(f"-> {evaluation}")
+        try:
+            if line.startswith(":"):
+                print(session.command(line))
+            else:
+                value = session.execute(line)
+                if value is not None:
+                    print(f"-> {value}")
+        except Exception as err:
+            print(f"error: {err}")
 
 
 if __name__ == "__main__":
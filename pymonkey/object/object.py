@@ -1,10 +1,21 @@
 from dataclasses import dataclass
 
 from pymonkey.code.code import Instructions
+from pymonkey.code.registers import RegisterCode
+from pymonkey.evaluator.mobject import MObject
 
 
 @dataclass
-class CompliedFunction:
+class CompliedFunction(MObject):
     instructions: Instructions
     num_locals: int
     num_parameters: int
+    name: str = ""
+    pure: bool = False
+    # code for the register VM, if built for it
+    registers: None | RegisterCode = None
+    # names of the parameters and locals by slot, for the disassembler
+    local_names: tuple[str, ...] = ()
+
+    def __str__(self) -> str:
+        return f"CompliedFunction({self.name or '<anonymous>'})"
@@ -1,5 +1,5 @@
 from abc import ABC, abstractmethod
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from typing import Dict, Hashable, List
 
 from pymonkey.lexer.mtoken import MToken
@@ -50,6 +50,9 @@ class MProgram(MNode):
 class MIdentifier(MExpression):
     value: str
     token: MToken
+    # set by the resolver of the evaluator, None if no function declares it
+    depth: None | int = field(default=None, compare=False, repr=False)
+    slot: None | int = field(default=None, compare=False, repr=False)
 
     def __str__(self) -> str:
         return f"{self.value}"
@@ -65,6 +68,16 @@ class MLetStatement(MStatement):
         return f"let {self.name} = {self.value};"
 
 
+@dataclass
+class MAssignStatement(MStatement):
+    name: MIdentifier
+    value: MExpression
+    token: MToken
+
+    def __str__(self) -> str:
+        return f"{self.name} = {self.value};"
+
+
 @dataclass
 class MReturnStatement(MStatement):
     value: MExpression
@@ -92,6 +105,32 @@ class MBlockStatement(MStatement):
         return "\n".join(str(s) for s in self.statements)
 
 
+@dataclass
+class MWhileStatement(MStatement):
+    condition: MExpression
+    body: MBlockStatement
+    token: MToken
+
+    def __str__(self) -> str:
+        return f"while ({self.condition}) {{ {self.body} }}"
+
+
+@dataclass
+class MBreakStatement(MStatement):
+    token: MToken
+
+    def __str__(self) -> str:
+        return "break;"
+
+
+@dataclass
+class MContinueStatement(MStatement):
+    token: MToken
+
+    def __str__(self) -> str:
+        return "continue;"
+
+
 @dataclass(eq=False, frozen=True)
 class MBooleanExpression(MValuedExpression):
     value: bool
@@ -171,6 +210,10 @@ class MFunctionExpression(MExpression):
     parameters: List[MExpression]
     body: MBlockStatement
     token: MToken
+    # set by the purity analysis, if the result depends only on the arguments
+    pure: bool = field(default=False, compare=False, repr=False)
+    # set by the resolver of the evaluator, names of the function's variables
+    slot_names: tuple[str, ...] = field(default=(), compare=False, repr=False)
 
     def __str__(self) -> str:
         params = ", ".join([str(p) for p in self.parameters])
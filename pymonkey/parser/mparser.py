@@ -6,9 +6,12 @@ from pymonkey.lexer.mlexer import MLexer
 from pymonkey.lexer.mtoken import MToken, MTokenPosition, MTokenType
 from pymonkey.parser.mast import (
     MArrayExpression,
+    MAssignStatement,
     MBlockStatement,
     MBooleanExpression,
+    MBreakStatement,
     MCallExpression,
+    MContinueStatement,
     MExpression,
     MExpressionStatement,
     MFunctionExpression,
@@ -25,6 +28,7 @@ from pymonkey.parser.mast import (
     MStatement,
     MStringExpression,
     MValuedExpression,
+    MWhileStatement,
 )
 
 
@@ -170,6 +174,12 @@ class MParser:
                 return self.parse_let_statement()
             case MTokenType.Keyword, "return":
                 return self.parse_return_statement()
+            case MTokenType.Keyword, "while":
+                return self.parse_while_statement()
+            case MTokenType.Keyword, "break" | "continue":
+                return self.parse_loop_control_statement()
+            case MTokenType.Identifier, _ if self.peek_token.type == MTokenType.Assign:
+                return self.parse_assign_statement()
             case _:
                 return self.parse_expression_statement()
 
@@ -200,6 +210,64 @@ class MParser:
 
         return MLetStatement(name, value, token)
 
+    def parse_assign_statement(self) -> MStatement:
+        name = MIdentifier(self.cur_token.literal, self.cur_token)
+
+        self.next_token()
+        token = self.cur_token
+        self.next_token()
+
+        value = self.parse_expression(Precedence.Lowest)
+        if value is None:
+            self._record_error("assignment has no expression")
+            raise UnknownTokenException()
+
+        if self.peek_token.type == MTokenType.Semicolon:
+            self.next_token()
+
+        return MAssignStatement(name, value, token)
+
+    def parse_while_statement(self) -> MStatement:
+        token = self.cur_token
+
+        if not self.expect_peek(MTokenType.LParen):
+            self._record_error("expected '('")
+            raise UnknownTokenException(f"expected (, got token {self.cur_token}")
+
+        self.next_token()
+
+        condition = self.parse_expression(Precedence.Lowest)
+        if condition is None:
+            self._record_error("while statement has no condition")
+            raise UnknownTokenException(
+                f"while has no condition, token {self.cur_token}"
+            )
+
+        if not self.expect_peek(MTokenType.RParen):
+            self._record_error("expected ')'")
+            raise UnknownTokenException(f"expected ), got token {self.cur_token}")
+
+        if not self.expect_peek(MTokenType.LBrace):
+            self._record_error("expected '{'")
+            raise UnknownTokenException(f"expected {{, got token {self.cur_token}")
+
+        body = self.parse_block_statement()
+
+        if self.peek_token.type == MTokenType.Semicolon:
+            self.next_token()
+
+        return MWhileStatement(condition, body, token)
+
+    def parse_loop_control_statement(self) -> MStatement:
+        token = self.cur_token
+
+        if self.peek_token.type == MTokenType.Semicolon:
+            self.next_token()
+
+        if token.literal == "break":
+            return MBreakStatement(token)
+        return MContinueStatement(token)
+
     def parse_return_statement(self) -> MStatement:
         token = self.cur_token
         self.next_token()
@@ -528,3 +596,17 @@ class MParser:
             left = infix(left)
 
         return left
+
+
+def parse_source(source: str) -> MProgram:
+    """
+    Parse source, the errors of the lexer and the parser are raised as one
+    SyntaxError
+    """
+    lexer = MLexer(source)
+    parser = MParser(lexer)
+    program = parser.parse_program()
+    messages = [err.msg for err in lexer.errors] + [err.msg for err in parser.errors]
+    if messages:
+        raise SyntaxError("; ".join(messages))
+    return program
@@ -0,0 +1,33 @@
+from dataclasses import fields
+from typing import Iterator
+
+from pymonkey.parser.mast import MNode
+
+
+def iter_child_nodes(node: MNode) -> Iterator[MNode]:
+    """
+    Yield the direct children of node, in source order
+    """
+    for f in fields(node):  # type: ignore[arg-type]
+        if f.name == "token":
+            continue
+        value = getattr(node, f.name)
+        if isinstance(value, MNode):
+            yield value
+        elif isinstance(value, list):
+            yield from (v for v in value if isinstance(v, MNode))
+        elif isinstance(value, dict):
+            for key, val in value.items():
+                yield key
+                yield val
+
+
+def walk(node: MNode) -> Iterator[MNode]:
+    """
+    Yield node and all of its descendants, depth first
+    """
+    stack = [node]
+    while stack:
+        current = stack.pop()
+        yield current
+        stack.extend(reversed(list(iter_child_nodes(current))))
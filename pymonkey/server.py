@@ -0,0 +1,214 @@
+import base64
+import contextlib
+import hashlib
+import io
+import json
+import os
+import pickle
+import signal
+import socket
+import sys
+from dataclasses import dataclass, field
+from types import FrameType
+from typing import Any
+
+from pymonkey.compiler.compiler import Bytecode, Compiler
+from pymonkey.memo import MemoCache
+from pymonkey.parser.mparser import parse_source
+from pymonkey.vm.vm import VM
+
+SOCKET_PATH = "monkey.sock"
+CACHE_SIZE = 256
+INSTRUCTION_LIMIT = 100_000_000
+TIME_LIMIT = 10.0
+
+
+class TimeLimitExceededException(Exception):
+    pass
+
+
+def raise_time_limit(signum: int, frame: None | FrameType) -> None:
+    raise TimeLimitExceededException("time limit exceeded")
+
+
+def send_message(conn: socket.socket, message: dict) -> None:
+    conn.sendall(json.dumps(message).encode())
+    conn.shutdown(socket.SHUT_WR)
+
+
+def receive_message(conn: socket.socket) -> dict:
+    chunks = []
+    while chunk := conn.recv(65536):
+        chunks.append(chunk)
+    return json.loads(b"".join(chunks))
+
+
+def request(
+    socket_path: str,
+    source: None | str = None,
+    bytecode: None | bytes = None,
+    **kw: Any,
+) -> dict:
+    """
+    Send a program, either source or a pickled bytecode file, to a server and
+    return its response. Further keywords like input or instruction_limit are
+    passed along
+    """
+    message = dict(kw)
+    if source is not None:
+        message["source"] = source
+    if bytecode is not None:
+        message["bytecode"] = base64.b64encode(bytecode).decode()
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as conn:
+        conn.connect(socket_path)
+        send_message(conn, message)
+        return receive_message(conn)
+
+
+@dataclass
+class Worker:
+    """
+    Serves requests accepted on the shared socket of the server. Compiled
+    programs are kept in an LRU cache keyed by the hash of their content
+    """
+
+    listener: socket.socket
+    instruction_limit: int = INSTRUCTION_LIMIT
+    time_limit: float = TIME_LIMIT
+    cache: MemoCache[Bytecode] = field(default_factory=lambda: MemoCache(CACHE_SIZE))
+
+    def serve_forever(self) -> None:
+        signal.signal(signal.SIGALRM, raise_time_limit)
+        while True:
+            conn, _ = self.listener.accept()
+            with conn:
+                try:
+                    response = self.handle(receive_message(conn))
+                except Exception as err:
+                    response = {"error": f"bad request: {err}"}
+                send_message(conn, response)
+
+    def load(self, message: dict) -> tuple[Bytecode, bool]:
+        """
+        Compiled program of a request and whether it came from the cache
+        """
+        if "source" in message:
+            content = message["source"].encode()
+            key = ("source", hashlib.sha256(content).hexdigest())
+        else:
+            content = base64.b64decode(message["bytecode"])
+            key = ("bytecode", hashlib.sha256(content).hexdigest())
+
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached, True
+
+        if key[0] == "bytecode":
+            bytecode = pickle.loads(content)
+        else:
+            compiler = Compiler(optimize=1)
+            compiler.compile(parse_source(message["source"]))
+            bytecode = compiler.bytecode()
+        self.cache.put(key, bytecode)
+        return bytecode, False
+
+    def handle(self, message: dict) -> dict:
+        instruction_limit = min(
+            message.get("instruction_limit", self.instruction_limit),
+            self.instruction_limit,
+        )
+        time_limit = min(message.get("time_limit", self.time_limit), self.time_limit)
+
+        try:
+            bytecode, cached = self.load(message)
+        except Exception as err:
+            return {"error": f"{type(err).__name__}: {err}"}
+
+        response: dict[str, Any] = {"cached": cached}
+        vm = VM(bytecode)
+        output = io.StringIO()
+        stdin = sys.stdin
+        sys.stdin = io.StringIO(message.get("input", ""))
+        signal.setitimer(signal.ITIMER_REAL, time_limit)
+        try:
+            with contextlib.redirect_stdout(output):
+                vm.run(instruction_limit)
+            response["result"] = str(vm.last_pop)
+        except Exception as err:
+            response["error"] = f"{type(err).__name__}: {err}"
+        finally:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            sys.stdin = stdin
+        response["output"] = output.getvalue()
+        response["instructions"] = vm.executed
+        return response
+
+
+@dataclass
+class Server:
+    """
+    Listens on a unix socket and forks workers that accept on it. The
+    workers inherit the imported modules, so a request only pays for
+    compiling its program, or nothing if a worker has it cached. The socket
+    is only accessible by its owner, since bytecode requests are unpickled.
+    """
+
+    socket_path: str = SOCKET_PATH
+    workers: int = os.cpu_count() or 1
+    cache_size: int = CACHE_SIZE
+    instruction_limit: int = INSTRUCTION_LIMIT
+    time_limit: float = TIME_LIMIT
+    pids: set[int] = field(default_factory=set)
+
+    def serve_forever(self) -> None:
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        # the socket is created without access for others, not chmod-ed after
+        umask = os.umask(0o077)
+        try:
+            listener.bind(self.socket_path)
+        finally:
+            os.umask(umask)
+        listener.listen()
+
+        signal.signal(signal.SIGTERM, self.shutdown)
+        try:
+            for _ in range(self.workers):
+                self.fork_worker(listener)
+            while True:
+                # replace workers that died, e.g. on a python stack overflow
+                pid, _ = os.wait()
+                if pid in self.pids:
+                    self.pids.remove(pid)
+                    self.fork_worker(listener)
+        except (KeyboardInterrupt, SystemExit):
+            pass
+        finally:
+            for pid in self.pids:
+                os.kill(pid, signal.SIGTERM)
+            listener.close()
+            os.unlink(self.socket_path)
+
+    def fork_worker(self, listener: socket.socket) -> None:
+        pid = os.fork()
+        if pid != 0:
+            self.pids.add(pid)
+            return
+
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        worker = Worker(
+            listener,
+            self.instruction_limit,
+            self.time_limit,
+            MemoCache(self.cache_size),
+        )
+        try:
+            worker.serve_forever()
+        finally:
+            os._exit(1)
+
+    def shutdown(self, signum: int, frame: None | FrameType) -> None:
+        raise SystemExit()
@@ -0,0 +1,44 @@
+import hashlib
+import importlib.util
+import os
+from pathlib import Path
+from types import ModuleType
+
+from pymonkey.transpiler.transpiler import TRANSPILER_VERSION
+
+CACHE_DIRECTORY = "__monkeycache__"
+
+
+def cache_path(source_path: Path, source: str) -> Path:
+    """
+    Where the module of a source file is cached. The name contains a hash of
+    the source, so an edited file is transpiled again.
+    """
+    digest = hashlib.sha256(f"{TRANSPILER_VERSION}\0{source}".encode()).hexdigest()
+    return source_path.parent / CACHE_DIRECTORY / f"{source_path.stem}.{digest[:16]}.py"
+
+
+def write_module(path: Path, code: str) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if path.parent.name == CACHE_DIRECTORY:
+        # drop modules of older versions of the same file
+        for stale in path.parent.glob(f"{path.name.split('.')[0]}.*.py"):
+            stale.unlink()
+
+    tmp_path = path.with_suffix(".tmp")
+    tmp_path.write_text(code)
+    os.replace(tmp_path, path)
+
+
+def load_module(path: Path) -> ModuleType:
+    """
+    Import a transpiled module. Python caches its bytecode in __pycache__,
+    so loading it again does not even parse the python source.
+    """
+    name = "monkey_" + "".join(c if c.isalnum() else "_" for c in path.stem)
+    spec = importlib.util.spec_from_file_location(name, path)
+    if spec is None or spec.loader is None:
+        raise ImportError(f"can not load {path}")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
@@ -0,0 +1,154 @@
+from typing import Callable, Hashable, List
+
+from pymonkey.evaluator.mbuiltins import Builtins
+from pymonkey.evaluator.mobject import (
+    MArrayObject,
+    MBooleanObject,
+    MBuiltinFunction,
+    MHashMapObject,
+    MIntegerObject,
+    MNullObject,
+    MObject,
+    MStringObject,
+    MValuedObject,
+)
+
+# Transpiled modules use python values: int, bool, str, None, list, dict and
+# functions. The helpers below give them the semantics of the VM.
+
+HASHABLE = (int, bool, str)
+
+
+def truthy(value: object) -> bool:
+    # only false and null are falsy, 0 and "" are not
+    return value is not None and value is not False
+
+
+def add(left: object, right: object) -> object:
+    if type(left) is int and type(right) is int:
+        return left + right
+    if type(left) is str and type(right) is str:
+        return left + right
+    raise TypeError("OpAdd operands not Integers")
+
+
+def sub(left: object, right: object) -> int:
+    if type(left) is int and type(right) is int:
+        return left - right
+    raise TypeError("unsupported operation for types")
+
+
+def mul(left: object, right: object) -> int:
+    if type(left) is int and type(right) is int:
+        return left * right
+    raise TypeError("unsupported operation for types")
+
+
+def div(left: object, right: object) -> int:
+    if type(left) is int and type(right) is int:
+        return left // right
+    raise TypeError("unsupported operation for types")
+
+
+def comparable(left: object, right: object) -> None:
+    if type(left) not in HASHABLE or type(right) not in HASHABLE:
+        raise ValueError("can only compare integers, booleans and strings")
+
+
+def eq(left: object, right: object) -> bool:
+    comparable(left, right)
+    return left == right
+
+
+def ne(left: object, right: object) -> bool:
+    comparable(left, right)
+    return left != right
+
+
+def gt(left: object, right: object) -> bool:
+    comparable(left, right)
+    return left > right  # type: ignore[operator]
+
+
+def neg(value: object) -> int:
+    if type(value) is not int:
+        raise TypeError("unsupported operand for -")
+    return -value
+
+
+def bang(value: object) -> bool:
+    if type(value) is bool:
+        return not value
+    return value is None
+
+
+def key(value: object) -> tuple[type, Hashable]:
+    """
+    Dict key of a hashmap key, the type keeps true and 1 apart
+    """
+    if type(value) not in HASHABLE:
+        raise TypeError("hashmap key not hashable")
+    return type(value), value  # type: ignore[return-value]
+
+
+def hashmap(*pairs: tuple[object, object]) -> dict:
+    return {key(k): v for k, v in pairs}
+
+
+def index(left: object, position: object) -> object:
+    if type(left) is list and type(position) is int:
+        return left[position]
+    if type(left) is dict:
+        return left[key(position)]
+    raise TypeError("cant apply index")
+
+
+def to_object(value: object) -> MObject:
+    """
+    MObject of a python value, as the VM would have produced it
+    """
+    if value is None:
+        return MNullObject()
+    if type(value) is bool:
+        return MBooleanObject(value)
+    if type(value) is int:
+        return MIntegerObject(value)
+    if type(value) is str:
+        return MStringObject(value)
+    if type(value) is list:
+        return MArrayObject([to_object(v) for v in value])
+    if type(value) is dict:
+        pairs: dict[MValuedObject, MObject] = {}
+        for (_, k), v in value.items():
+            pairs[to_object(k)] = to_object(v)  # type: ignore[index]
+        return MHashMapObject(pairs)
+    if isinstance(value, MObject):
+        return value
+    if callable(value):
+        return MBuiltinFunction(value)
+    raise TypeError(f"no monkey value for {value!r}")
+
+
+def from_object(obj: None | MObject) -> object:
+    if obj is None or isinstance(obj, MNullObject):
+        return None
+    if isinstance(obj, MValuedObject):
+        return obj.value
+    if isinstance(obj, MArrayObject):
+        return [from_object(v) for v in obj.value]
+    if isinstance(obj, MHashMapObject):
+        return {key(k.value): from_object(v) for k, v in obj.value.items()}
+    # errors and functions stay objects
+    return obj
+
+
+def wrap_builtin(builtin: MBuiltinFunction) -> Callable[..., object]:
+    def call(*args: object) -> object:
+        arguments: List[MObject] = [to_object(a) for a in args]
+        return from_object(builtin.fn(arguments))
+
+    call.__name__ = builtin.fn.__name__
+    return call
+
+
+BUILTINS = {name: wrap_builtin(fn) for name, fn in Builtins().fns.items()}
@@ -0,0 +1,468 @@
+from dataclasses import dataclass, field
+from typing import List
+
+from pymonkey.evaluator.mbuiltins import Builtins
+from pymonkey.parser.mast import (
+    MArrayExpression,
+    MAssignStatement,
+    MBlockStatement,
+    MBooleanExpression,
+    MBreakStatement,
+    MCallExpression,
+    MContinueStatement,
+    MExpression,
+    MExpressionStatement,
+    MFunctionExpression,
+    MHashMapExpression,
+    MIdentifier,
+    MIfExpression,
+    MIndexExpression,
+    MInfixExpression,
+    MIntegerExpression,
+    MLetStatement,
+    MNode,
+    MPrefixExpression,
+    MProgram,
+    MReturnStatement,
+    MStatement,
+    MStringExpression,
+    MWhileStatement,
+)
+
+# bump when the generated code changes, so that cached modules are rebuilt
+TRANSPILER_VERSION = 1
+
+INFIX_HELPERS = {
+    "+": "add",
+    "-": "sub",
+    "*": "mul",
+    "/": "div",
+    "==": "eq",
+    "!=": "ne",
+    ">": "gt",
+}
+
+COMPARISONS = ("==", "!=", "<", ">")
+
+RUNTIME_NAMES = (
+    "BUILTINS",
+    "add",
+    "bang",
+    "div",
+    "eq",
+    "gt",
+    "hashmap",
+    "index",
+    "mul",
+    "ne",
+    "neg",
+    "sub",
+    "to_object",
+    "truthy",
+)
+
+CONSTANTS = (MIntegerExpression, MBooleanExpression, MStringExpression)
+
+
+@dataclass
+class Scope:
+    """
+    Variables of one function, by monkey name. Every let gets its own python
+    name, so a redefined variable is a new one, like in the compiler.
+    """
+
+    outer: "None | Scope"
+    names: dict[str, str] = field(default_factory=dict)
+    nonlocals: List[str] = field(default_factory=list)
+
+    @property
+    def is_main(self) -> bool:
+        return self.outer is None
+
+    def resolve(self, name: str) -> "None | tuple[Scope, str]":
+        if name in self.names:
+            return self, self.names[name]
+        if self.outer is not None:
+            return self.outer.resolve(name)
+        return None
+
+
+@dataclass
+class Transpiler:
+    """
+    Python module equivalent to a MProgram. The program becomes the function
+    main, which returns the value the VM would have popped last, and monkey
+    functions become nested python functions.
+    """
+
+    lines: List[str] = field(default_factory=list)
+    indent: int = 0
+    scope: Scope = field(default_factory=lambda: Scope(None))
+    counts: dict[str, int] = field(default_factory=dict)
+    temps: int = 0
+    loops: int = 0
+
+    @classmethod
+    def transpile(cls, program: MProgram, source_name: str = "<monkey>") -> str:
+        transpiler = Transpiler()
+        transpiler.main(program)
+
+        header = [
+            f"# transpiled from {source_name} by monkey transpile, do not edit",
+            "from pymonkey.transpiler.runtime import (",
+            *[f"    {name}," for name in RUNTIME_NAMES],
+            ")",
+            "",
+            *[f'builtin_{name} = BUILTINS["{name}"]' for name in Builtins().fns],
+            "",
+            "",
+        ]
+        footer = [
+            "",
+            "",
+            'if __name__ == "__main__":',
+            "    print(to_object(main()))",
+        ]
+        return "\n".join(header + transpiler.lines + footer) + "\n"
+
+    def main(self, program: MProgram) -> None:
+        self.emit("def main():")
+        self.indent += 1
+        self.emit("_last = None")
+        for stmt in program.statements:
+            if isinstance(stmt, MExpressionStatement):
+                self.expression_statement(stmt.expression, "_last")
+                continue
+
+            self.statement(stmt)
+            if isinstance(stmt, (MLetStatement, MAssignStatement)):
+                # setting a global pops the value in the VM
+                self.emit(f"_last = {self.resolve(stmt.name.value)}")
+            elif isinstance(stmt, MWhileStatement):
+                self.emit("_last = None")
+        self.emit("return _last")
+        self.indent -= 1
+
+    def emit(self, line: str) -> None:
+        self.lines.append("    " * self.indent + line)
+
+    def temp(self) -> str:
+        self.temps += 1
+        return f"_t{self.temps}"
+
+    def define(self, name: str) -> str:
+        count = self.counts.get(name, 0)
+        self.counts[name] = count + 1
+        # monkey identifiers have no digits, so the suffix can not clash
+        python_name = f"m_{name}" if count == 0 else f"m_{name}_{count}"
+        self.scope.names[name] = python_name
+        return python_name
+
+    def resolve(self, name: str) -> str:
+        resolved = self.scope.resolve(name)
+        if resolved is not None:
+            return resolved[1]
+        if name in Builtins().fns:
+            return f"builtin_{name}"
+        raise ValueError("undefined variable", name)
+
+    def statement(self, node: MStatement) -> None:
+        if isinstance(node, MExpressionStatement):
+            self.expression_statement(node.expression, None)
+
+        elif isinstance(node, MLetStatement):
+            if isinstance(node.value, MFunctionExpression):
+                # define the name first, so that the function can call itself
+                self.function(node.value, self.define(node.name.value))
+                return
+            value = self.expression(node.value)
+            self.emit(f"{self.define(node.name.value)} = {value}")
+
+        elif isinstance(node, MAssignStatement):
+            value = self.expression(node.value)
+            self.emit(f"{self.assign_target(node.name.value)} = {value}")
+
+        elif isinstance(node, MReturnStatement):
+            self.emit(f"return {self.expression(node.value)}")
+
+        elif isinstance(node, MWhileStatement):
+            self.loop(node)
+
+        elif isinstance(node, MBreakStatement):
+            if self.loops == 0:
+                raise ValueError("break outside loop")
+            self.emit("break")
+
+        elif isinstance(node, MContinueStatement):
+            if self.loops == 0:
+                raise ValueError("continue outside loop")
+            self.emit("continue")
+
+        elif isinstance(node, MBlockStatement):
+            for stmt in node.statements:
+                self.statement(stmt)
+
+        else:
+            raise TypeError(f"unknown MObject {node}")
+
+    def assign_target(self, name: str) -> str:
+        resolved = self.scope.resolve(name)
+        if resolved is None:
+            if name in Builtins().fns:
+                raise ValueError("cannot assign to builtin", name)
+            raise ValueError("undefined variable", name)
+
+        scope, python_name = resolved
+        if scope is self.scope:
+            return python_name
+        if not scope.is_main:
+            raise ValueError("cannot assign to enclosing variable", name)
+        if python_name not in self.scope.nonlocals:
+            self.scope.nonlocals.append(python_name)
+        return python_name
+
+    def expression_statement(self, node: MExpression, result: None | str) -> None:
+        """
+        Evaluate node, result is None to drop its value, "return" to return it
+        or the variable to store it in
+        """
+        if isinstance(node, MIfExpression):
+            self.if_statement(node, result)
+            return
+
+        value = self.expression(node)
+        if result is None:
+            self.emit(value)
+        elif result == "return":
+            self.emit(f"return {value}")
+        else:
+            self.emit(f"{result} = {value}")
+
+    def block(self, statements: List[MStatement], result: None | str) -> None:
+        """
+        Statements of a block, the value of the last one is the block value
+        """
+        indent = self.indent
+        self.indent += 1
+        for stmt in statements[:-1]:
+            self.statement(stmt)
+
+        last = statements[-1] if statements else None
+        if isinstance(last, MExpressionStatement):
+            self.expression_statement(last.expression, result)
+        else:
+            if last is not None:
+                self.statement(last)
+            if isinstance(
+                last, (MReturnStatement, MBreakStatement, MContinueStatement)
+            ):
+                pass
+            elif result == "return":
+                self.emit("return None")
+            elif result is not None:
+                self.emit(f"{result} = None")
+            elif last is None:
+                self.emit("pass")
+        self.indent = indent
+
+    def if_statement(self, node: MIfExpression, result: None | str) -> None:
+        self.emit(f"if {self.condition(node.condition)}:")
+        self.block(node.consequence.statements, result)
+        if node.alternative is not None or result is not None:
+            self.emit("else:")
+            alternative = node.alternative.statements if node.alternative else []
+            self.block(alternative, result)
+
+    def loop(self, node: MWhileStatement) -> None:
+        if self.needs_statements(node.condition):
+            # the condition is evaluated again before every iteration
+            self.emit("while True:")
+            self.indent += 1
+            self.emit(f"if not {self.condition(node.condition)}:")
+            self.emit("    break")
+            self.indent -= 1
+        else:
+            self.emit(f"while {self.condition(node.condition)}:")
+
+        self.loops += 1
+        self.block(node.body.statements, None)
+        self.loops -= 1
+
+    def function(self, node: MFunctionExpression, python_name: str) -> None:
+        scope, loops = self.scope, self.loops
+        self.scope, self.loops = Scope(scope), 0
+
+        parameters = []
+        for param in node.parameters:
+            if not isinstance(param, MIdentifier):
+                raise TypeError("function parameter is not an identifier")
+            parameters.append(self.define(param.value))
+
+        self.emit(f"def {python_name}({', '.join(parameters)}):")
+        header = len(self.lines)
+        self.block(node.body.statements, "return")
+        if self.scope.nonlocals:
+            line = (
+                "    " * (self.indent + 1)
+                + f"nonlocal {', '.join(self.scope.nonlocals)}"
+            )
+            self.lines.insert(header, line)
+
+        self.scope, self.loops = scope, loops
+
+    def condition(self, node: MExpression) -> str:
+        value = self.expression(node)
+        if self.is_boolean(node):
+            return value
+        return f"truthy({value})"
+
+    @classmethod
+    def is_boolean(cls, node: MExpression) -> bool:
+        if isinstance(node, MInfixExpression):
+            return node.operator in COMPARISONS
+        if isinstance(node, MPrefixExpression):
+            return node.operator == "!"
+        return isinstance(node, MBooleanExpression)
+
+    @classmethod
+    def simple_block(cls, block: None | MBlockStatement) -> None | MExpression:
+        """
+        The expression of a block that is a single expression, if it needs no
+        statements
+        """
+        if block is None or len(block.statements) != 1:
+            return None
+        stmt = block.statements[0]
+        if not isinstance(stmt, MExpressionStatement):
+            return None
+        if cls.needs_statements(stmt.expression):
+            return None
+        return stmt.expression
+
+    @classmethod
+    def needs_statements(cls, node: MNode) -> bool:
+        """
+        Whether node can not be written as a single python expression
+        """
+        if isinstance(node, MFunctionExpression):
+            return True
+        if isinstance(node, MIfExpression):
+            if cls.needs_statements(node.condition):
+                return True
+            if cls.simple_block(node.consequence) is None:
+                return True
+            return (
+                node.alternative is not None
+                and cls.simple_block(node.alternative) is None
+            )
+        if isinstance(node, MInfixExpression):
+            return cls.needs_statements(node.left) or cls.needs_statements(node.right)
+        if isinstance(node, MPrefixExpression):
+            return cls.needs_statements(node.right)
+        if isinstance(node, MCallExpression):
+            return any(
+                cls.needs_statements(n) for n in [node.function, *node.arguments]
+            )
+        if isinstance(node, MIndexExpression):
+            return cls.needs_statements(node.left) or cls.needs_statements(node.index)
+        if isinstance(node, MArrayExpression):
+            return any(cls.needs_statements(n) for n in node.value)
+        if isinstance(node, MHashMapExpression):
+            return any(
+                cls.needs_statements(k) or cls.needs_statements(v)
+                for k, v in node.pairs.items()
+            )
+        return False
+
+    def operands(self, nodes: List[MExpression]) -> List[str]:
+        """
+        Python expressions of nodes, evaluated from left to right. If an
+        operand needs statements, the ones before it are stored in
+        temporaries first.
+        """
+        values: List[str] = []
+        for node in nodes:
+            mark = len(self.lines)
+            value = self.expression(node)
+            if len(self.lines) > mark:
+                hoisted = []
+                for i, (previous, previous_value) in enumerate(zip(nodes, values)):
+                    if isinstance(previous, CONSTANTS):
+                        continue
+                    temp = self.temp()
+                    hoisted.append("    " * self.indent + f"{temp} = {previous_value}")
+                    values[i] = temp
+                self.lines[mark:mark] = hoisted
+            values.append(value)
+        return values
+
+    def expression(self, node: MExpression) -> str:
+        if isinstance(node, MIntegerExpression):
+            return str(node.value)
+
+        elif isinstance(node, (MBooleanExpression, MStringExpression)):
+            return repr(node.value)
+
+        elif isinstance(node, MIdentifier):
+            return self.resolve(node.value)
+
+        elif isinstance(node, MInfixExpression):
+            if node.operator == "<":
+                # right before left, like in the VM
+                right, left = self.operands([node.right, node.left])
+                return f"gt({right}, {left})"
+            if node.operator not in INFIX_HELPERS:
+                raise TypeError("unknown operator")
+            left, right = self.operands([node.left, node.right])
+            return f"{INFIX_HELPERS[node.operator]}({left}, {right})"
+
+        elif isinstance(node, MPrefixExpression):
+            if node.operator == "-":
+                return f"neg({self.expression(node.right)})"
+            if node.operator == "!":
+                return f"bang({self.expression(node.right)})"
+            raise ValueError
+
+        elif isinstance(node, MIfExpression):
+            consequence = self.simple_block(node.consequence)
+            alternative = self.simple_block(node.alternative)
+            if not self.needs_statements(node):
+                condition = self.condition(node.condition)
+                then = self.expression(consequence)  # type: ignore[arg-type]
+                otherwise = (
+                    "None" if alternative is None else self.expression(alternative)
+                )
+                return f"({then} if {condition} else {otherwise})"
+
+            temp = self.temp()
+            self.if_statement(node, temp)
+            return temp
+
+        elif isinstance(node, MFunctionExpression):
+            self.temps += 1
+            python_name = f"_fn{self.temps}"
+            self.function(node, python_name)
+            return python_name
+
+        elif isinstance(node, MCallExpression):
+            function, *arguments = self.operands([node.function, *node.arguments])
+            return f"{function}({', '.join(arguments)})"
+
+        elif isinstance(node, MIndexExpression):
+            left, position = self.operands([node.left, node.index])
+            return f"index({left}, {position})"
+
+        elif isinstance(node, MArrayExpression):
+            return f"[{', '.join(self.operands(node.value))}]"
+
+        elif isinstance(node, MHashMapExpression):
+            nodes: List[MExpression] = []
+            for key, value in node.pairs.items():
+                nodes += [key, value]
+            values = self.operands(nodes)
+            pairs = [
+                f"({values[i]}, {values[i + 1]})" for i in range(0, len(values), 2)
+            ]
+            return f"hashmap({', '.join(pairs)})"
+
+        raise TypeError(f"unknown MObject {node}")
@@ -0,0 +1,159 @@
+from bisect import bisect_left
+from dataclasses import dataclass, field
+
+from pymonkey.code.code import MOpcode
+from pymonkey.compiler.compiler import Bytecode
+from pymonkey.memo import MemoCache
+from pymonkey.object.object import CompliedFunction
+from pymonkey.vm.vm import VM, BudgetExceededException
+
+
+@dataclass
+class FunctionCoverage:
+    """
+    Lines of one function and a bitmap of the ones that ran, bit i is
+    lines[i]. starts are the sorted instructions where a new line begins or
+    a jump enters one, bits the bit of each
+    """
+
+    function: CompliedFunction
+    file: str
+    lines: list[int]
+    starts: list[int]
+    bits: list[int]
+    hits: int = 0
+
+    @classmethod
+    def of(cls, function: CompliedFunction) -> "FunctionCoverage":
+        table = function.instructions.lines
+        if table is None:
+            return cls(function, "", [], [], [])
+
+        lines: list[int] = []
+        starts = {}
+        for start, line, _ in table.entries():
+            if line == 0:
+                continue
+            if line not in lines:
+                lines.append(line)
+            starts[start] = lines.index(line)
+
+        # a jump can enter a line in the middle of its run
+        instructions = function.instructions
+        for i in range(len(instructions)):
+            if instructions.get_opcode(i) in (MOpcode.OpJump, MOpcode.OpJumpNotTruthy):
+                target = instructions.get_opargs(i)
+                position = table.lookup(target)
+                if position is not None and target not in starts:
+                    starts[target] = lines.index(position[0])
+        offsets = sorted(starts)
+        return cls(function, table.file, lines, offsets, [starts[i] for i in offsets])
+
+    def covered(self, line: int) -> bool:
+        return bool(self.hits >> self.lines.index(line) & 1)
+
+
+@dataclass
+class Coverage:
+    functions: dict[int, FunctionCoverage] = field(default_factory=dict)
+
+    def add(self, function: CompliedFunction) -> FunctionCoverage:
+        self.functions[id(function)] = FunctionCoverage.of(function)
+        return self.functions[id(function)]
+
+    def get(self, function: CompliedFunction) -> FunctionCoverage:
+        fn = self.functions.get(id(function))
+        return self.add(function) if fn is None else fn
+
+    def lcov(self) -> str:
+        """
+        Report in the lcov tracefile format, a line counts 1 if it ran
+        """
+        files: dict[str, list[FunctionCoverage]] = {}
+        for fn in self.functions.values():
+            if fn.lines:
+                files.setdefault(fn.file, []).append(fn)
+
+        records = []
+        for file, functions in files.items():
+            record = ["TN:", f"SF:{file}"]
+            for fn in functions:
+                name = fn.function.name or f"<anonymous:{fn.lines[0]}>"
+                record.append(f"FN:{min(fn.lines)},{name}")
+                record.append(f"FNDA:{1 if fn.hits else 0},{name}")
+            record.append(f"FNF:{len(functions)}")
+            record.append(f"FNH:{sum(1 for fn in functions if fn.hits)}")
+
+            lines: dict[int, bool] = {}
+            for fn in functions:
+                for line in fn.lines:
+                    lines[line] = lines.get(line, False) or fn.covered(line)
+            for line, hit in sorted(lines.items()):
+                record.append(f"DA:{line},{int(hit)}")
+            record.append(f"LF:{len(lines)}")
+            record.append(f"LH:{sum(lines.values())}")
+            record.append("end_of_record")
+            records.append("\n".join(record) + "\n")
+        return "".join(records)
+
+
+@dataclass
+class CoverageVM(VM):
+    """
+    VM whose run loop sets the bit of a line when an instruction starts it,
+    the plain VM does not pay for any of it
+    """
+
+    coverage: Coverage
+
+    def __init__(self, bytecode: Bytecode, memo: None | MemoCache = None) -> None:
+        super().__init__(bytecode, memo)
+        self.coverage = Coverage()
+        self.coverage.add(self.frames[0].function)
+        for constant in bytecode.constants:
+            if isinstance(constant, CompliedFunction):
+                self.coverage.add(constant)
+
+    def run(self, instruction_budget: None | int = None, return_depth: int = 0) -> None:
+        # the coverage of the frame last run, the index and instruction of its
+        # next line start, and the instruction that follows when nothing jumps
+        frame = None
+        fn = self.coverage.get(self.current_frame().function)
+        index = 0
+        next_start = -1
+        expected = -1
+
+        try:
+            while self.current_frame().ip < len(self.current_frame().instructions) - 1:
+                current = self.current_frame()
+                current.ip += 1
+                ip = current.ip
+
+                self.executed += 1
+                if (
+                    instruction_budget is not None
+                    and self.executed > instruction_budget
+                ):
+                    raise BudgetExceededException(
+                        f"more than {instruction_budget} instructions executed"
+                    )
+
+                if current is not frame or ip != expected:
+                    # entered by a call, a return or a jump
+                    frame = current
+                    fn = self.coverage.get(frame.function)
+                    index = bisect_left(fn.starts, ip)
+                    next_start = fn.starts[index] if index < len(fn.starts) else -1
+                if ip == next_start:
+                    fn.hits |= 1 << fn.bits[index]
+                    index += 1
+                    next_start = fn.starts[index] if index < len(fn.starts) else -1
+                expected = ip + 1
+
+                op = current.instructions.get_opcode(ip)
+                opargs = current.instructions.get_opargs(ip)
+                if self.execute(op, opargs, return_depth):
+                    return
+        except Exception as err:
+            self.annotate_error(err)
+            raise
@@ -1,6 +1,7 @@
 from dataclasses import dataclass
 
 from pymonkey.code.code import Instructions
+from pymonkey.evaluator.mobject import MObject
 from pymonkey.object.object import CompliedFunction
 
 
@@ -9,7 +10,43 @@ class Frame:
     function: CompliedFunction
     ip: int
     base_pointer: int
+    memo_key: None | tuple = None
+    # executed count on entry and instructions run by callees, for profiling
+    entered: int = 0
+    children: int = 0
 
     @property
     def instructions(self) -> Instructions:
         return self.function.instructions
+
+    def position(self) -> None | tuple[str, int, int]:
+        """
+        File, line and column of the current instruction, if the bytecode has
+        a line table
+        """
+        lines = self.instructions.lines
+        if lines is None:
+            return None
+        found = lines.lookup(max(self.ip, 0))
+        if found is None:
+            return None
+        return (lines.file, *found)
+
+    def inlined(self) -> None | str:
+        """
+        Name of the function inlined at the current instruction
+        """
+        lines = self.instructions.lines
+        if lines is None:
+            return None
+        return lines.inlined_at(max(self.ip, 0))
+
+
+@dataclass
+class RegisterFrame:
+    function: CompliedFunction
+    registers: list[MObject]
+    pc: int
+    # register of the calling frame that receives the return value
+    destination: int
+    memo_key: None | tuple = None
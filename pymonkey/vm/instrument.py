@@ -0,0 +1,8 @@
+from dataclasses import dataclass
+
+
+@dataclass
+class FunctionProfile:
+    calls: int = 0
+    # instructions executed in the function itself, without its callees
+    instructions: int = 0
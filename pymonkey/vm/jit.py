@@ -0,0 +1,371 @@
+from dataclasses import dataclass, field
+from typing import Callable, List
+
+from pymonkey.code.code import Instructions, MOpcode
+from pymonkey.evaluator.mobject import (
+    MBooleanObject,
+    MIntegerObject,
+    MNullObject,
+    MObject,
+)
+from pymonkey.object.object import CompliedFunction
+
+JIT_THRESHOLD = 50
+# a function that deoptimizes this often goes back to the interpreter for good
+MAX_DEOPTS = 3
+
+ARITHMETIC = {
+    MOpcode.OpAdd: "+",
+    MOpcode.OpSub: "-",
+    MOpcode.OpMul: "*",
+    MOpcode.OpDiv: "//",
+}
+
+COMPARISONS = {
+    MOpcode.OpEqual: "==",
+    MOpcode.OpNotEqual: "!=",
+    MOpcode.OpGreater: ">",
+}
+
+
+class NotJittable(Exception):
+    pass
+
+
+class Deopt(Exception):
+    """
+    Raised by native code when a type guard fails. Only pure functions are
+    compiled, so the interpreter can simply run the call again.
+    """
+
+    def __init__(self, function_id: int) -> None:
+        super().__init__(function_id)
+        self.function_id = function_id
+
+
+@dataclass
+class NativeFunction:
+    function: CompliedFunction
+    source: str
+    raw: Callable[..., object]
+
+
+def box(value: object) -> MObject:
+    if value is None:
+        return MNullObject()
+    if type(value) is bool:
+        return MBooleanObject(value)
+    if type(value) is int:
+        return MIntegerObject(value)
+    raise TypeError(f"can not box {value!r}")
+
+
+def unbox(obj: MObject) -> object:
+    """
+    Python value of obj, or obj itself if native code can not represent it
+    """
+    if type(obj) is MIntegerObject or type(obj) is MBooleanObject:
+        return obj.value
+    if type(obj) is MNullObject:
+        return None
+    return obj
+
+
+@dataclass
+class JIT:
+    """
+    Counts the calls of every function and translates the bytecode of hot pure
+    functions to Python source. Native code keeps integers and booleans
+    unboxed and guards that calls return integers, if a guard fails the call
+    is run in the interpreter instead.
+    """
+
+    globals: dict[int, MObject]
+    constants: List[MObject]
+    call_function: Callable[[CompliedFunction, List[MObject]], MObject]
+    threshold: int = JIT_THRESHOLD
+    counts: dict[int, int] = field(default_factory=dict)
+    natives: dict[int, NativeFunction] = field(default_factory=dict)
+    deopts: dict[int, int] = field(default_factory=dict)
+    failed: set[int] = field(default_factory=set)
+
+    def lookup(self, fn: CompliedFunction) -> None | NativeFunction:
+        """
+        Count a call of fn and return its native version once it is hot
+        """
+        key = id(fn)
+        native = self.natives.get(key)
+        if native is not None or key in self.failed:
+            return native
+
+        count = self.counts.get(key, 0) + 1
+        self.counts[key] = count
+        if count < self.threshold or not fn.pure:
+            return None
+
+        try:
+            native = self.compile(fn)
+        except NotJittable:
+            self.failed.add(key)
+            return None
+        self.natives[key] = native
+        return native
+
+    def enter(self, native: NativeFunction, args: List[MObject]) -> None | MObject:
+        """
+        Call native code from the interpreter, None means run fn there instead
+        """
+        values = []
+        for arg in args:
+            # parameters are speculated to be integers
+            if type(arg) is not MIntegerObject:
+                return None
+            values.append(arg.value)
+
+        try:
+            return box(native.raw(*values))
+        except Deopt as e:
+            self.deoptimize(e.function_id)
+        except RecursionError:
+            # native calls recurse in python, the interpreter does not
+            self.deoptimize(id(native.function))
+        return None
+
+    def call(self, fn: MObject, args: tuple) -> object:
+        """
+        Call from native code, returns an unboxed value if possible
+        """
+        if not isinstance(fn, CompliedFunction):
+            raise ValueError("not a function")
+
+        native = self.lookup(fn)
+        if native is not None and all(type(a) is int for a in args):
+            return native.raw(*args)
+        return unbox(self.call_function(fn, [box(a) for a in args]))
+
+    def deoptimize(self, function_id: int) -> None:
+        self.deopts[function_id] = self.deopts.get(function_id, 0) + 1
+        if self.deopts[function_id] >= MAX_DEOPTS:
+            self.natives.pop(function_id, None)
+            self.failed.add(function_id)
+
+    def compile(self, fn: CompliedFunction) -> NativeFunction:
+        source = FunctionTranslator(fn, self.constants).translate()
+        namespace: dict[str, object] = {}
+        exec(compile(source, f"<jit {fn.name or 'anonymous'}>", "exec"), namespace)
+        make = namespace["make"]
+        raw = make(self.globals, self.call, Deopt)  # type: ignore[operator]
+        return NativeFunction(fn, source, raw)
+
+    def dump(self) -> str:
+        return "\n".join(native.source for native in self.natives.values())
+
+
+@dataclass
+class FunctionTranslator:
+    """
+    Python source of one function. Each basic block of the bytecode becomes a
+    branch of a dispatch loop, the value at stack depth d is the variable s{d}
+    and local i is l{i}. Within a block, stack values are kept as expressions.
+    """
+
+    function: CompliedFunction
+    constants: List[MObject]
+    lines: List[str] = field(default_factory=list)
+    stack: List[tuple[str, str]] = field(default_factory=list)
+    local_types: dict[int, str] = field(default_factory=dict)
+    entry_types: dict[int, List[str]] = field(default_factory=dict)
+    indent: int = 0
+
+    def translate(self) -> str:
+        fn = self.function
+        instructions = fn.instructions
+        if fn.num_locals < fn.num_parameters:
+            raise NotJittable("function without locals")
+
+        for i in range(fn.num_parameters):
+            self.local_types[i] = "int"
+        self.entry_types[0] = []
+
+        starts = self.block_starts(instructions)
+        parameters = ", ".join(f"l{i}" for i in range(fn.num_parameters))
+        self.lines = [
+            "def make(globals_, call, Deopt):",
+            f"    def {self.python_name()}({parameters}):",
+        ]
+        for i in range(fn.num_parameters, fn.num_locals):
+            self.lines.append(f"        l{i} = None")
+        self.lines += ["        b = 0", "        while True:"]
+
+        for i, start in enumerate(starts):
+            end = starts[i + 1] if i + 1 < len(starts) else len(instructions)
+            if start not in self.entry_types:
+                # only reachable by code after a jump or return
+                continue
+            self.translate_block(instructions, start, end)
+
+        self.lines += ["            return None", f"    return {self.python_name()}"]
+        return "\n".join(self.lines) + "\n"
+
+    def python_name(self) -> str:
+        name = "".join(c if c.isalnum() else "_" for c in self.function.name)
+        return f"jit_{name or 'anonymous'}"
+
+    @classmethod
+    def block_starts(cls, instructions: Instructions) -> List[int]:
+        starts = {0}
+        for ip in range(len(instructions)):
+            op = instructions.get_opcode(ip)
+            if op in (MOpcode.OpJump, MOpcode.OpJumpNotTruthy):
+                starts.add(instructions.get_opargs(ip))
+            if op in (
+                MOpcode.OpJump,
+                MOpcode.OpJumpNotTruthy,
+                MOpcode.OpReturnValue,
+                MOpcode.OpReturn,
+            ):
+                starts.add(ip + 1)
+        return sorted(s for s in starts if s < len(instructions))
+
+    def emit(self, line: str) -> None:
+        self.lines.append(" " * (16 + 4 * self.indent) + line)
+
+    def push(self, expression: str, value_type: str) -> None:
+        self.stack.append((expression, value_type))
+
+    def pop(self, *allowed: str) -> str:
+        expression, value_type = self.stack.pop()
+        if allowed and value_type not in allowed:
+            raise NotJittable(f"{value_type} value not supported here")
+        return expression
+
+    def materialize(self) -> None:
+        """
+        Assign the pending expressions to their stack variables, from the
+        bottom up so that no variable is overwritten before it is read
+        """
+        for depth, (expression, value_type) in enumerate(self.stack):
+            if expression != f"s{depth}":
+                self.emit(f"s{depth} = {expression}")
+                self.stack[depth] = (f"s{depth}", value_type)
+
+    def jump(self, ip: int, target: int) -> None:
+        types = [t for _, t in self.stack]
+        if self.entry_types.setdefault(target, types) != types:
+            raise NotJittable("stack types differ at a join")
+        self.emit(f"b = {target}")
+        if target <= ip:
+            self.emit("continue")
+
+    def translate_block(self, instructions: Instructions, start: int, end: int) -> None:
+        self.lines.append(f"            if b == {start}:")
+        self.stack = [(f"s{d}", t) for d, t in enumerate(self.entry_types[start])]
+
+        for ip in range(start, end):
+            op = instructions.get_opcode(ip)
+            operand = instructions.get_opargs(ip)
+
+            if op == MOpcode.OpJump:
+                self.materialize()
+                self.jump(ip, operand)
+                return
+
+            if op == MOpcode.OpJumpNotTruthy:
+                condition_type = self.stack[-1][1]
+                condition = self.pop()
+                self.materialize()
+                if condition_type == "null":
+                    self.jump(ip, operand)
+                    return
+                if condition_type == "bool":
+                    self.emit(f"if not {condition}:")
+                    self.indent += 1
+                    self.jump(ip, operand)
+                    self.indent -= 1
+                    self.emit("else:")
+                    self.indent += 1
+                    self.jump(ip, ip + 1)
+                    self.indent -= 1
+                    return
+                # any other value is truthy
+                continue
+
+            if op == MOpcode.OpReturnValue:
+                self.emit(f"return {self.pop()}")
+                return
+
+            if op == MOpcode.OpReturn:
+                self.emit("return None")
+                return
+
+            self.translate_instruction(op, operand)
+
+        # fall through into the next block
+        self.materialize()
+        self.jump(end - 1, end)
+
+    def translate_instruction(self, op: MOpcode, operand: int) -> None:
+        if op == MOpcode.OpConstant:
+            constant = self.constants[operand]
+            if type(constant) is MIntegerObject:
+                self.push(str(constant.value), "int")
+            elif type(constant) is MBooleanObject:
+                self.push(str(constant.value), "bool")
+            else:
+                raise NotJittable(f"constant {constant}")
+
+        elif op in (MOpcode.OpTrue, MOpcode.OpFalse):
+            self.push(str(op == MOpcode.OpTrue), "bool")
+
+        elif op == MOpcode.OpNull:
+            self.push("None", "null")
+
+        elif op == MOpcode.OpGetLocal:
+            if operand not in self.local_types:
+                raise NotJittable(f"local {operand} read before it is set")
+            self.push(f"l{operand}", self.local_types[operand])
+
+        elif op == MOpcode.OpSetLocal:
+            value_type = self.stack[-1][1]
+            if self.local_types.setdefault(operand, value_type) != value_type:
+                raise NotJittable(f"local {operand} changes its type")
+            value = self.pop("int", "bool", "null")
+            self.materialize()
+            self.emit(f"l{operand} = {value}")
+
+        elif op == MOpcode.OpGetGlobal:
+            self.push(f"globals_[{operand}]", "fn")
+
+        elif op in ARITHMETIC:
+            right = self.pop("int")
+            left = self.pop("int")
+            self.push(f"({left} {ARITHMETIC[op]} {right})", "int")
+
+        elif op in COMPARISONS:
+            right = self.pop("int", "bool")
+            left = self.pop("int", "bool")
+            self.push(f"({left} {COMPARISONS[op]} {right})", "bool")
+
+        elif op == MOpcode.OpMinus:
+            self.push(f"(-{self.pop('int')})", "int")
+
+        elif op == MOpcode.OpPop:
+            expression = self.pop()
+            # a discarded division still raises on zero, after what is below it
+            if "//" in expression:
+                self.materialize()
+                self.emit(expression)
+
+        elif op == MOpcode.OpCall:
+            args = [self.pop("int", "bool", "null") for _ in range(operand)][::-1]
+            callee = self.pop("fn")
+            self.materialize()
+            result = f"s{len(self.stack)}"
+            self.emit(f"{result} = call({callee}, ({''.join(a + ', ' for a in args)}))")
+            # speculate that calls return integers
+            self.emit(f"if type({result}) is not int:")
+            self.emit(f"    raise Deopt({id(self.function)})")
+            self.push(result, "int")
+
+        else:
+            raise NotJittable(f"{op.name} not supported")
@@ -0,0 +1,84 @@
+import signal
+from collections import Counter
+from dataclasses import dataclass, field
+from types import FrameType
+from typing import Any, Protocol, Self
+
+from pymonkey.vm.frame import Frame
+
+PROFILE_INTERVAL = 0.001
+PROFILE_TOP = 20
+
+
+class ProfiledVM(Protocol):
+    frames: list
+
+
+@dataclass
+class SamplingProfiler:
+    """
+    Samples the frame stack of a VM from a SIGPROF timer, the VM itself runs
+    uninstrumented. Counts of identical stacks are kept, which is what the
+    collapsed stack format of flamegraph tools needs
+    """
+
+    vm: ProfiledVM
+    interval: float = PROFILE_INTERVAL
+    samples: Counter[tuple[str, ...]] = field(default_factory=Counter)
+    # labels by function and instruction, so a sample rarely decodes lines
+    labels: dict[tuple[int, int], str] = field(default_factory=dict)
+
+    def __enter__(self) -> Self:
+        signal.signal(signal.SIGPROF, self.sample)
+        signal.setitimer(signal.ITIMER_PROF, self.interval, self.interval)
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        signal.setitimer(signal.ITIMER_PROF, 0)
+        signal.signal(signal.SIGPROF, signal.SIG_DFL)
+
+    def frame_label(self, frame: Any) -> str:
+        """
+        Function name and source line of a frame, register VM frames have no
+        line table
+        """
+        key = (id(frame.function), getattr(frame, "ip", -1))
+        label = self.labels.get(key)
+        if label is None:
+            label = frame.function.name or "<anonymous>"
+            position = frame.position() if isinstance(frame, Frame) else None
+            if position is not None:
+                label = f"{label}:{position[1]}"
+            self.labels[key] = label
+        return label
+
+    def sample(self, signum: int, frame: None | FrameType) -> None:
+        self.samples[tuple(self.frame_label(f) for f in self.vm.frames)] += 1
+
+    def collapsed(self) -> str:
+        """
+        One line per stack, 'main;f;g 12'
+        """
+        return "".join(
+            f"{';'.join(stack)} {count}\n" for stack, count in self.samples.items()
+        )
+
+    def summary(self, top: int = PROFILE_TOP) -> str:
+        total = sum(self.samples.values())
+        own: Counter[str] = Counter()
+        inclusive: Counter[str] = Counter()
+        for stack, count in self.samples.items():
+            own[stack[-1]] += count
+            for name in set(stack):
+                inclusive[name] += count
+
+        lines = [f"{total} samples"]
+        if total == 0:
+            return lines[0]
+        lines.append("    self      %   total      %  function")
+        for name, count in own.most_common(top):
+            lines.append(
+                f"{count:8d} {100 * count / total:5.1f}% "
+                f"{inclusive[name]:7d} {100 * inclusive[name] / total:5.1f}%  {name}"
+            )
+        return "\n".join(lines)
@@ -0,0 +1,275 @@
+import pickle
+from dataclasses import dataclass
+from typing import List, Self
+
+from pymonkey.code.registers import ROp
+from pymonkey.compiler.compiler import Bytecode
+from pymonkey.evaluator.mbuiltins import Builtins
+from pymonkey.evaluator.mobject import (
+    MArrayObject,
+    MBooleanObject,
+    MBuiltinFunction,
+    MHashMapObject,
+    MIntegerObject,
+    MNullObject,
+    MObject,
+    MStringObject,
+    MValuedObject,
+)
+from pymonkey.memo import MemoCache
+from pymonkey.object.object import CompliedFunction
+from pymonkey.vm.frame import RegisterFrame
+
+# plain ints, comparing them is cheaper than comparing enum members
+MOVE = int(ROp.MOVE)
+ADD = int(ROp.ADD)
+SUB = int(ROp.SUB)
+MUL = int(ROp.MUL)
+DIV = int(ROp.DIV)
+EQ = int(ROp.EQ)
+NE = int(ROp.NE)
+GT = int(ROp.GT)
+NEG = int(ROp.NEG)
+NOT = int(ROp.NOT)
+JMP = int(ROp.JMP)
+JMPF = int(ROp.JMPF)
+GETG = int(ROp.GETG)
+SETG = int(ROp.SETG)
+GETB = int(ROp.GETB)
+ARRAY = int(ROp.ARRAY)
+HASH = int(ROp.HASH)
+INDEX = int(ROp.INDEX)
+CALL = int(ROp.CALL)
+RET = int(ROp.RET)
+POP = int(ROp.POP)
+
+
+@dataclass
+class RegisterVM:
+    """
+    Runs the register code of a Bytecode built with the register backend.
+    Objects, builtins and memoization are the same as in the stack VM.
+    """
+
+    constants: List[MObject]
+    globals: dict[int, MObject]
+    frames: List[RegisterFrame]
+    builtins: List[MBuiltinFunction]
+    memo: None | MemoCache
+    last_pop: MObject
+    executed: int
+
+    def __init__(self, bytecode: Bytecode, memo: None | MemoCache = None) -> None:
+        if bytecode.registers is None:
+            raise ValueError("bytecode was not built for the register VM")
+
+        self.constants = bytecode.constants
+        self.globals = {}
+        self.builtins = list(Builtins().fns.values())
+        self.memo = memo
+        self.last_pop = MNullObject()
+        self.executed = 0
+        main_fn = CompliedFunction(
+            bytecode.instructions, 0, 0, "main", registers=bytecode.registers
+        )
+        registers: List[MObject] = [MNullObject()] * bytecode.registers.num_registers
+        self.frames = [RegisterFrame(main_fn, registers, 0, 0)]
+
+    @classmethod
+    def from_bytecode_pickle(
+        cls, file_name: str, memo: None | MemoCache = None
+    ) -> Self:
+        with open(file_name, "br") as file:
+            bytecode = pickle.load(file)
+
+        return cls(bytecode, memo)
+
+    def run(self) -> None:
+        constants = self.constants
+        globals_ = self.globals
+        frames = self.frames
+        frame = frames[-1]
+        code = frame.function.registers.code  # type: ignore[union-attr]
+        regs = frame.registers
+        pc = frame.pc
+        last = self.last_pop
+        executed = 0
+
+        while pc < len(code):
+            op, a, b, c = code[pc]
+            pc += 1
+            executed += 1
+
+            if op == MOVE:
+                regs[a] = regs[b] if b >= 0 else constants[~b]
+
+            elif op <= DIV:
+                left = regs[b] if b >= 0 else constants[~b]
+                right = regs[c] if c >= 0 else constants[~c]
+                if type(left) is MIntegerObject and type(right) is MIntegerObject:
+                    if op == ADD:
+                        regs[a] = MIntegerObject(left.value + right.value)
+                    elif op == SUB:
+                        regs[a] = MIntegerObject(left.value - right.value)
+                    elif op == MUL:
+                        regs[a] = MIntegerObject(left.value * right.value)
+                    else:
+                        regs[a] = MIntegerObject(left.value // right.value)
+                else:
+                    regs[a] = self.binary_operation(op, left, right)
+
+            elif op <= GT:
+                left = regs[b] if b >= 0 else constants[~b]
+                right = regs[c] if c >= 0 else constants[~c]
+                regs[a] = self.comparison(op, left, right)
+
+            elif op == JMPF:
+                condition = regs[a] if a >= 0 else constants[~a]
+                if condition.__class__ is MBooleanObject:
+                    if not condition.value:  # type: ignore[attr-defined]
+                        pc = b
+                elif condition.__class__ is MNullObject:
+                    pc = b
+
+            elif op == JMP:
+                pc = a
+
+            elif op == GETG:
+                regs[a] = globals_[b]
+
+            elif op == SETG:
+                last = regs[b] if b >= 0 else constants[~b]
+                globals_[a] = last
+
+            elif op == CALL:
+                fn = regs[b]
+                args = regs[b + 1 : b + 1 + c]
+                if isinstance(fn, MBuiltinFunction):
+                    result = fn.fn(args)
+                    regs[a] = result if result is not None else MNullObject()
+                    continue
+
+                if not isinstance(fn, CompliedFunction) or fn.registers is None:
+                    raise ValueError("not a function")
+                if c != fn.num_parameters:
+                    raise ValueError("wrong number of arguments")
+
+                memo_key = None
+                if self.memo is not None and fn.pure:
+                    memo_key = MemoCache.make_key(id(fn), args)
+                    if memo_key is not None:
+                        cached = self.memo.get(memo_key)
+                        if cached is not None:
+                            regs[a] = cached
+                            continue
+
+                frame.pc = pc
+                regs = args + [MNullObject()] * (fn.registers.num_registers - c)
+                frame = RegisterFrame(fn, regs, 0, a, memo_key)
+                frames.append(frame)
+                code = fn.registers.code
+                pc = 0
+
+            elif op == RET:
+                value = regs[a] if a >= 0 else constants[~a]
+                if len(frames) == 1:
+                    # return at the top level ends the program
+                    last = value
+                    break
+
+                finished = frames.pop()
+                if finished.memo_key is not None and self.memo is not None:
+                    self.memo.put(finished.memo_key, value)
+                frame = frames[-1]
+                code = frame.function.registers.code  # type: ignore[union-attr]
+                regs = frame.registers
+                pc = frame.pc
+                regs[finished.destination] = value
+
+            elif op == POP:
+                last = regs[a] if a >= 0 else constants[~a]
+
+            elif op == GETB:
+                regs[a] = self.builtins[b]
+
+            elif op == NEG:
+                operand = regs[b] if b >= 0 else constants[~b]
+                if not isinstance(operand, MIntegerObject):
+                    raise TypeError("unsupported operand for -")
+                regs[a] = MIntegerObject(-operand.value)
+
+            elif op == NOT:
+                operand = regs[b] if b >= 0 else constants[~b]
+                if isinstance(operand, MBooleanObject):
+                    regs[a] = MBooleanObject(not operand.value)
+                else:
+                    regs[a] = MBooleanObject(isinstance(operand, MNullObject))
+
+            elif op == ARRAY:
+                regs[a] = MArrayObject(regs[b : b + c])
+
+            elif op == HASH:
+                regs[a] = self.build_hashmap(regs[b : b + c])
+
+            elif op == INDEX:
+                left = regs[b] if b >= 0 else constants[~b]
+                index = regs[c] if c >= 0 else constants[~c]
+                regs[a] = self.index(left, index)
+
+            else:
+                raise TypeError("unknown op code")
+
+        self.last_pop = last
+        self.executed += executed
+
+    @classmethod
+    def binary_operation(cls, op: int, left: MObject, right: MObject) -> MObject:
+        if isinstance(left, MIntegerObject) and isinstance(right, MIntegerObject):
+            if op == ADD:
+                return MIntegerObject(left.value + right.value)
+            if op == SUB:
+                return MIntegerObject(left.value - right.value)
+            if op == MUL:
+                return MIntegerObject(left.value * right.value)
+            return MIntegerObject(left.value // right.value)
+
+        if isinstance(left, MStringObject) and isinstance(right, MStringObject):
+            if op == ADD:
+                return MStringObject(left.value + right.value)
+            raise TypeError("unsupported operation for types")
+
+        raise TypeError("OpAdd operands not Integers")
+
+    @classmethod
+    def comparison(cls, op: int, left: MObject, right: MObject) -> MObject:
+        if not (
+            isinstance(right, MValuedObject)
+            and isinstance(left, MValuedObject)
+            and hasattr(right.value, "__lt__")
+        ):
+            raise ValueError
+
+        if op == EQ:
+            return MBooleanObject(left.value == right.value)
+        if op == NE:
+            return MBooleanObject(left.value != right.value)
+        # right.value is known to have __lt__
+        return MBooleanObject(right.value < left.value)
+
+    @classmethod
+    def index(cls, left: MObject, index: MObject) -> MObject:
+        if isinstance(left, MArrayObject) and isinstance(index, MIntegerObject):
+            return left.value[index.value]
+        if isinstance(left, MHashMapObject) and isinstance(index, MValuedObject):
+            return left.value[index]
+        raise TypeError("cant apply index")
+
+    @classmethod
+    def build_hashmap(cls, elements: List[MObject]) -> MObject:
+        hashmap: dict[MValuedObject, MObject] = {}
+        for i in range(0, len(elements), 2):
+            key = elements[i]
+            if not isinstance(key, MValuedObject):
+                raise TypeError("hashmap key not hashable")
+            hashmap[key] = elements[i + 1]
+        return MHashMapObject(hashmap)
@@ -0,0 +1,101 @@
+import json
+from collections import Counter
+from dataclasses import dataclass, field
+
+from pymonkey.code.code import MOpcode
+from pymonkey.compiler.compiler import Bytecode
+from pymonkey.memo import MemoCache
+from pymonkey.vm.vm import VM, BudgetExceededException
+
+
+@dataclass
+class VMStats:
+    instructions: int = 0
+    calls: int = 0
+    max_stack_depth: int = 0
+    max_frame_depth: int = 0
+    opcodes: Counter[str] = field(default_factory=Counter)
+    # consecutive instructions of a frame, candidates for superinstructions
+    pairs: Counter[tuple[str, str]] = field(default_factory=Counter)
+    functions: Counter[str] = field(default_factory=Counter)
+
+    def to_json(self) -> str:
+        return json.dumps(
+            {
+                "instructions": self.instructions,
+                "calls": self.calls,
+                "max_stack_depth": self.max_stack_depth,
+                "max_frame_depth": self.max_frame_depth,
+                "opcodes": dict(self.opcodes.most_common()),
+                "pairs": {
+                    f"{first} {second}": count
+                    for (first, second), count in self.pairs.most_common()
+                },
+                "functions": dict(self.functions.most_common()),
+            },
+            indent=2,
+        )
+
+
+@dataclass
+class StatsVM(VM):
+    """
+    VM whose run loop counts what it executes, the plain VM does not pay for
+    any of it
+    """
+
+    stats: VMStats
+
+    def __init__(
+        self,
+        bytecode: Bytecode,
+        memo: None | MemoCache = None,
+        jit_threshold: None | int = None,
+    ) -> None:
+        super().__init__(bytecode, memo, jit_threshold)
+        self.stats = VMStats()
+
+    def run(self, instruction_budget: None | int = None, return_depth: int = 0) -> None:
+        stats = self.stats
+        # the opcode executed before, per frame, so a call or return does not
+        # pair instructions of different functions
+        previous: list[None | str] = [None] * self.frames_index
+
+        try:
+            while self.current_frame().ip < len(self.current_frame().instructions) - 1:
+                self.current_frame().ip += 1
+
+                self.executed += 1
+                if (
+                    instruction_budget is not None
+                    and self.executed > instruction_budget
+                ):
+                    raise BudgetExceededException(
+                        f"more than {instruction_budget} instructions executed"
+                    )
+
+                frame = self.current_frame()
+                op = frame.instructions.get_opcode(frame.ip)
+                opargs = frame.instructions.get_opargs(frame.ip)
+
+                name = op.name
+                stats.instructions += 1
+                stats.opcodes[name] += 1
+                stats.functions[frame.function.name or "<anonymous>"] += 1
+                del previous[self.frames_index :]
+                previous.extend([None] * (self.frames_index - len(previous)))
+                if previous[-1] is not None:
+                    stats.pairs[(previous[-1], name)] += 1
+                previous[-1] = name
+                if op == MOpcode.OpCall:
+                    stats.calls += 1
+
+                done = self.execute(op, opargs, return_depth)
+
+                stats.max_stack_depth = max(stats.max_stack_depth, self.stack_pointer)
+                stats.max_frame_depth = max(stats.max_frame_depth, self.frames_index)
+                if done:
+                    return
+        except Exception as err:
+            self.annotate_error(err)
+            raise
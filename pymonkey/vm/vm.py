@@ -4,9 +4,11 @@ from typing import List, Self
 
 from pymonkey.code.code import MOpcode
 from pymonkey.compiler.compiler import Bytecode
+from pymonkey.evaluator.mbuiltins import Builtins
 from pymonkey.evaluator.mobject import (
     MArrayObject,
     MBooleanObject,
+    MBuiltinFunction,
     MHashMapObject,
     MIntegerObject,
     MNullObject,
@@ -14,9 +16,15 @@ from pymonkey.evaluator.mobject import (
     MStringObject,
     MValuedObject,
 )
+from pymonkey.memo import MemoCache
 from pymonkey.object.object import CompliedFunction
-from pymonkey.util import flog
 from pymonkey.vm.frame import Frame
+from pymonkey.vm.instrument import FunctionProfile
+from pymonkey.vm.jit import JIT
+
+
+class BudgetExceededException(Exception):
+    pass
 
 
 @dataclass
@@ -28,24 +36,48 @@ class VM:
     globals: dict[int, MObject]
     frames: list[Frame]
     frames_index: int
-
-    def __init__(self, bytecode: Bytecode) -> None:
+    builtins: list[MBuiltinFunction]
+    memo: None | MemoCache
+    executed: int
+    jit: None | JIT
+    profile: None | dict[str, FunctionProfile]
+
+    def __init__(
+        self,
+        bytecode: Bytecode,
+        memo: None | MemoCache = None,
+        jit_threshold: None | int = None,
+        globals_: None | dict[int, MObject] = None,
+        profile: bool = False,
+    ) -> None:
         self.constants = bytecode.constants
         self.stack = []
         self.stack_pointer = 0
         self.last_pop = MNullObject()
-        self.globals = {}
-        main_fn = CompliedFunction(bytecode.instructions, -1, 0)
+        # a shared globals store lets a session run one input after another
+        self.globals = globals_ if globals_ is not None else {}
+        self.builtins = list(Builtins().fns.values())
+        self.memo = memo
+        self.executed = 0
+        self.profile = {} if profile else None
+        self.jit = None
+        if jit_threshold is not None:
+            self.jit = JIT(
+                self.globals, self.constants, self.call_function, jit_threshold
+            )
+        main_fn = CompliedFunction(bytecode.instructions, -1, 0, "main")
         main_frame = Frame(main_fn, -1, 0)
         self.frames = [main_frame]
         self.frames_index = 1
 
     @classmethod
-    def from_bytecode_pickle(cls, file_name: str) -> Self:
+    def from_bytecode_pickle(
+        cls, file_name: str, memo: None | MemoCache = None
+    ) -> Self:
         with open(file_name, "br") as file:
             bytecode = pickle.load(file)
 
-        return VM(bytecode)
+        return VM(bytecode, memo)
 
     def __str__(self) -> str:
         return f"VM(sp={self.stack_pointer}, stack={self.stack})"
@@ -55,163 +87,386 @@ class VM:
             return None
         return self.stack[self.stack_pointer - 1]
 
-    @flog
     def stack_push(self, obj: MObject) -> None:
         self.stack.append(obj)
         self.stack_pointer += 1
 
-    @flog
     def stack_pop(self) -> MObject:
         self.stack_pointer -= 1
         self.last_pop = self.stack.pop()
         return self.last_pop
 
+    def stack_shrink(self, stack_pointer: int) -> None:
+        del self.stack[stack_pointer:]
+        self.stack_pointer = stack_pointer
+
     def current_frame(self) -> Frame:
         return self.frames[self.frames_index - 1]
 
-    @flog
     def push_frame(self, frame: Frame) -> None:
         self.frames.append(frame)
         self.frames_index += 1
 
-    @flog
     def pop_frame(self) -> Frame:
         self.frames_index -= 1
         return self.frames.pop(self.frames_index)
 
-    @flog
-    def run(self) -> None:
-        ip = 0
-        opargs = 0
-        op = MOpcode.OpUndefined
+    def run(self, instruction_budget: None | int = None, return_depth: int = 0) -> None:
+        """
+        Execute until the program ends, or until a return leaves return_depth
+        frames. The dispatch is inlined, instrumented subclasses like StatsVM
+        run loops of their own around execute, so this one pays for no call
+        or bookkeeping per instruction
+        """
+        try:
+            while self.current_frame().ip < len(self.current_frame().instructions) - 1:
+                self.current_frame().ip += 1
+
+                self.executed += 1
+                if (
+                    instruction_budget is not None
+                    and self.executed > instruction_budget
+                ):
+                    raise BudgetExceededException(
+                        f"more than {instruction_budget} instructions executed"
+                    )
+
+                ip = self.current_frame().ip
+                op = self.current_frame().instructions.get_opcode(ip)
+                opargs = self.current_frame().instructions.get_opargs(ip)
+
+                if op == MOpcode.OpConstant:
+                    self.stack_push(self.constants[opargs])
+
+                elif (
+                    op == MOpcode.OpAdd
+                    or op == MOpcode.OpSub
+                    or op == MOpcode.OpMul
+                    or op == MOpcode.OpDiv
+                ):
+                    self.execute_binary_operation(op)
 
-        while self.current_frame().ip < len(self.current_frame().instructions) - 1:
-            self.current_frame().ip += 1
+                elif op == MOpcode.OpPop:
+                    self.stack_pop()
 
-            ip = self.current_frame().ip
-            op = self.current_frame().instructions.get_opcode(ip)
-            opargs = self.current_frame().instructions.get_opargs(ip)
+                elif op == MOpcode.OpTrue:
+                    self.stack_push(MBooleanObject(True))
 
-            if op == MOpcode.OpConstant:
-                self.stack_push(self.constants[opargs])
+                elif op == MOpcode.OpFalse:
+                    self.stack_push(MBooleanObject(False))
 
-            elif (
-                op == MOpcode.OpAdd
-                or op == MOpcode.OpSub
-                or op == MOpcode.OpMul
-                or op == MOpcode.OpDiv
-            ):
-                self.execute_binary_operation(op)
+                elif (
+                    op == MOpcode.OpGreater
+                    or op == MOpcode.OpEqual
+                    or op == MOpcode.OpNotEqual
+                ):
+                    self.execute_comparison(op)
+
+                elif op == MOpcode.OpBang:
+                    operand = self.stack_pop()
+                    if isinstance(operand, MBooleanObject):
+                        self.stack_push(MBooleanObject(not operand.value))
+                    elif isinstance(operand, MNullObject):
+                        self.stack_push(MBooleanObject(True))
+                    else:
+                        self.stack_push(MBooleanObject(False))
+
+                elif op == MOpcode.OpMinus:
+                    operand = self.stack_pop()
+                    if isinstance(operand, MIntegerObject):
+                        self.stack_push(MIntegerObject(-operand.value))
+
+                elif op == MOpcode.OpJump:
+                    self.current_frame().ip = opargs - 1
 
-            elif op == MOpcode.OpPop:
-                self.stack_pop()
+                elif op == MOpcode.OpJumpNotTruthy:
+                    condition = self.stack_pop()
+                    if not self.is_truthy(condition):
+                        self.current_frame().ip = opargs - 1
 
-            elif op == MOpcode.OpTrue:
-                self.stack_push(MBooleanObject(True))
+                elif op == MOpcode.OpNull:
+                    self.stack_push(MNullObject())
 
-            elif op == MOpcode.OpFalse:
-                self.stack_push(MBooleanObject(False))
+                elif op == MOpcode.OpSetGlobal:
+                    self.globals[opargs] = self.stack_pop()
+
+                elif op == MOpcode.OpGetGlobal:
+                    self.stack_push(self.globals[opargs])
+
+                elif op == MOpcode.OpArray:
+                    arr = self.build_array(
+                        self.stack_pointer - opargs, self.stack_pointer
+                    )
+                    self.stack_shrink(self.stack_pointer - opargs)
+                    self.stack_push(arr)
+
+                elif op == MOpcode.OpHash:
+                    hashmap = self.build_hashmap(
+                        self.stack_pointer - opargs, self.stack_pointer
+                    )
+                    self.stack_shrink(self.stack_pointer - opargs)
+                    self.stack_push(hashmap)
+
+                elif op == MOpcode.OpIndex:
+                    index = self.stack_pop()
+                    left = self.stack_pop()
+                    self.execute_index_expression(left, index)
+
+                elif op == MOpcode.OpCall:
+                    self.execute_call(opargs)
+
+                elif op == MOpcode.OpReturnValue:
+                    return_value = self.stack_pop()
+                    if self.frames_index == 1:
+                        # return at the top level ends the program
+                        return
+                    self.execute_return(return_value)
+                    if self.frames_index == return_depth:
+                        return
+
+                elif op == MOpcode.OpReturn:
+                    self.execute_return(MNullObject())
+                    if self.frames_index == return_depth:
+                        return
+
+                elif op == MOpcode.OpGetBuiltin:
+                    self.stack_push(self.builtins[opargs])
+
+                elif op == MOpcode.OpSetLocal:
+                    obj = self.stack_pop()
+                    self.stack[self.current_frame().base_pointer + opargs] = obj
+
+                elif op == MOpcode.OpGetLocal:
+                    self.stack_push(
+                        self.stack[self.current_frame().base_pointer + opargs]
+                    )
 
-            elif (
-                op == MOpcode.OpGreater
-                or op == MOpcode.OpEqual
-                or op == MOpcode.OpNotEqual
-            ):
-                self.execute_comparison(op)
-
-            elif op == MOpcode.OpBang:
-                operand = self.stack_pop()
-                if isinstance(operand, MBooleanObject):
-                    self.stack_push(MBooleanObject(not operand.value))
-                if isinstance(operand, MNullObject):
-                    self.stack_push(MBooleanObject(True))
                 else:
-                    self.stack_push(MBooleanObject(False))
+                    raise TypeError("unknown op code")
+        except Exception as err:
+            self.annotate_error(err)
+            raise
+
+    def annotate_error(self, err: Exception) -> None:
+        """
+        Attach the running frames to err as monkey_trace, a list of function
+        names and positions, outermost first. Nested runs share the frames, so
+        the first one to see err attaches them. Code of an inlined function
+        shows as a frame of its own, without the position of the call
+        """
+        if isinstance(err, BudgetExceededException) or hasattr(err, "monkey_trace"):
+            return
+        trace: List[tuple[str, None | tuple[str, int, int]]] = []
+        for frame in self.frames[: self.frames_index]:
+            name = frame.function.name or "<anonymous>"
+            inlined = frame.inlined()
+            if inlined is None:
+                trace.append((name, frame.position()))
+            else:
+                trace.append((name, None))
+                *outer, innermost = inlined.split(">")
+                trace += [(f"{fn} (inlined)", None) for fn in outer]
+                trace.append((f"{innermost} (inlined)", frame.position()))
+        setattr(err, "monkey_trace", trace)
+
+    def execute(self, op: MOpcode, opargs: int, return_depth: int = 0) -> bool:
+        """
+        Execute one instruction, True if the run it is part of has ended. The
+        same dispatch as run, for the loops of instrumented subclasses, so a
+        change to one must be made to the other
+        """
+        if op == MOpcode.OpConstant:
+            self.stack_push(self.constants[opargs])
+
+        elif (
+            op == MOpcode.OpAdd
+            or op == MOpcode.OpSub
+            or op == MOpcode.OpMul
+            or op == MOpcode.OpDiv
+        ):
+            self.execute_binary_operation(op)
+
+        elif op == MOpcode.OpPop:
+            self.stack_pop()
+
+        elif op == MOpcode.OpTrue:
+            self.stack_push(MBooleanObject(True))
 
-            elif op == MOpcode.OpMinus:
-                operand = self.stack_pop()
-                if isinstance(operand, MIntegerObject):
-                    self.stack_push(MIntegerObject(-operand.value))
+        elif op == MOpcode.OpFalse:
+            self.stack_push(MBooleanObject(False))
+
+        elif (
+            op == MOpcode.OpGreater or op == MOpcode.OpEqual or op == MOpcode.OpNotEqual
+        ):
+            self.execute_comparison(op)
 
-            elif op == MOpcode.OpJump:
+        elif op == MOpcode.OpBang:
+            operand = self.stack_pop()
+            if isinstance(operand, MBooleanObject):
+                self.stack_push(MBooleanObject(not operand.value))
+            elif isinstance(operand, MNullObject):
+                self.stack_push(MBooleanObject(True))
+            else:
+                self.stack_push(MBooleanObject(False))
+
+        elif op == MOpcode.OpMinus:
+            operand = self.stack_pop()
+            if isinstance(operand, MIntegerObject):
+                self.stack_push(MIntegerObject(-operand.value))
+
+        elif op == MOpcode.OpJump:
+            self.current_frame().ip = opargs - 1
+
+        elif op == MOpcode.OpJumpNotTruthy:
+            condition = self.stack_pop()
+            if not self.is_truthy(condition):
                 self.current_frame().ip = opargs - 1
 
-            elif op == MOpcode.OpJumpNotTruthy:
-                condition = self.stack_pop()
-                if isinstance(condition, MBooleanObject) and not condition.value:
-                    self.current_frame().ip = opargs - 1
+        elif op == MOpcode.OpNull:
+            self.stack_push(MNullObject())
 
-            elif op == MOpcode.OpNull:
-                self.stack_push(MNullObject())
-
-            elif op == MOpcode.OpSetGlobal:
-                self.globals[opargs] = self.stack_pop()
-
-            elif op == MOpcode.OpGetGlobal:
-                self.stack_push(self.globals[opargs])
-
-            elif op == MOpcode.OpArray:
-                arr = self.build_array(self.stack_pointer - opargs, self.stack_pointer)
-                self.stack_pointer -= opargs
-                self.stack_push(arr)
-
-            elif op == MOpcode.OpHash:
-                hashmap = self.build_hashmap(
-                    self.stack_pointer - opargs, self.stack_pointer
-                )
-                self.stack_pointer -= opargs
-                self.stack_push(hashmap)
-
-            elif op == MOpcode.OpIndex:
-                index = self.stack_pop()
-                left = self.stack_pop()
-                self.execute_index_expression(left, index)
-
-            elif op == MOpcode.OpCall:
-                fn = self.stack[self.stack_pointer - 1 - opargs]
-                if not isinstance(fn, CompliedFunction):
-                    raise ValueError("not a function")
-                if opargs != fn.num_parameters:
-                    raise ValueError("wrong number of arguments")
-                frame = Frame(fn, -1, self.stack_pointer - opargs)
-                self.push_frame(frame)
-                self.stack_pointer += fn.num_locals
-
-            elif op == MOpcode.OpReturnValue:
-                return_value = self.stack_pop()
-                self.pop_frame()
-                self.stack_pop()
-                self.stack_push(return_value)
-
-            elif op == MOpcode.OpReturn:
-                self.pop_frame()
-                self.stack_pop()
-                self.stack_push(MNullObject())
-
-            elif op == MOpcode.OpSetLocal:
-                poped_obj = self.stack_pop()
-                for _ in range(
-                    self.current_frame().base_pointer + opargs - len(self.stack) + 1
-                ):
-                    self.stack_push(MNullObject())
-                self.stack[self.current_frame().base_pointer + opargs] = poped_obj
+        elif op == MOpcode.OpSetGlobal:
+            self.globals[opargs] = self.stack_pop()
 
-            elif op == MOpcode.OpGetLocal:
-                self.stack_push(self.stack[self.current_frame().base_pointer + opargs])
+        elif op == MOpcode.OpGetGlobal:
+            self.stack_push(self.globals[opargs])
 
-            elif op == MOpcode.OpReturnValue:
-                return_value = self.stack_pop()
-                frame = self.pop_frame()
-                self.stack_pointer = frame.base_pointer - 1
-                self.stack_push(return_value)
+        elif op == MOpcode.OpArray:
+            arr = self.build_array(self.stack_pointer - opargs, self.stack_pointer)
+            self.stack_shrink(self.stack_pointer - opargs)
+            self.stack_push(arr)
 
-            elif op == MOpcode.OpReturn:
-                frame = self.pop_frame()
-                self.stack_pointer = frame.base_pointer - 1
-                self.stack_push(MNullObject())
+        elif op == MOpcode.OpHash:
+            hashmap = self.build_hashmap(
+                self.stack_pointer - opargs, self.stack_pointer
+            )
+            self.stack_shrink(self.stack_pointer - opargs)
+            self.stack_push(hashmap)
 
-            else:
-                raise TypeError("unknown op code")
+        elif op == MOpcode.OpIndex:
+            index = self.stack_pop()
+            left = self.stack_pop()
+            self.execute_index_expression(left, index)
+
+        elif op == MOpcode.OpCall:
+            self.execute_call(opargs)
+
+        elif op == MOpcode.OpReturnValue:
+            return_value = self.stack_pop()
+            if self.frames_index == 1:
+                # return at the top level ends the program
+                return True
+            self.execute_return(return_value)
+            if self.frames_index == return_depth:
+                return True
+
+        elif op == MOpcode.OpReturn:
+            self.execute_return(MNullObject())
+            if self.frames_index == return_depth:
+                return True
+
+        elif op == MOpcode.OpGetBuiltin:
+            self.stack_push(self.builtins[opargs])
+
+        elif op == MOpcode.OpSetLocal:
+            obj = self.stack_pop()
+            self.stack[self.current_frame().base_pointer + opargs] = obj
+
+        elif op == MOpcode.OpGetLocal:
+            self.stack_push(self.stack[self.current_frame().base_pointer + opargs])
+
+        else:
+            raise TypeError("unknown op code")
+        return False
+
+    @classmethod
+    def is_truthy(cls, obj: MObject) -> bool:
+        if isinstance(obj, MNullObject):
+            return False
+
+        if isinstance(obj, MBooleanObject):
+            return obj.value
+
+        return True
+
+    def execute_call(self, num_args: int) -> None:
+        fn = self.stack[self.stack_pointer - 1 - num_args]
+
+        if isinstance(fn, MBuiltinFunction):
+            args = self.stack[self.stack_pointer - num_args : self.stack_pointer]
+            result = fn.fn(args)
+            self.stack_shrink(self.stack_pointer - 1 - num_args)
+            self.stack_push(result if result is not None else MNullObject())
+            return
+
+        if not isinstance(fn, CompliedFunction):
+            raise ValueError("not a function")
+        if num_args != fn.num_parameters:
+            raise ValueError("wrong number of arguments")
+
+        memo_key = None
+        if self.memo is not None and fn.pure:
+            args = self.stack[self.stack_pointer - num_args : self.stack_pointer]
+            memo_key = MemoCache.make_key(id(fn), args)
+            if memo_key is not None:
+                cached = self.memo.get(memo_key)
+                if cached is not None:
+                    self.stack_shrink(self.stack_pointer - 1 - num_args)
+                    self.stack_push(cached)
+                    return
+
+        native = self.jit.lookup(fn) if self.jit is not None else None
+        if native is not None and self.jit is not None:
+            args = self.stack[self.stack_pointer - num_args : self.stack_pointer]
+            result = self.jit.enter(native, args)
+            if result is not None:
+                if memo_key is not None and self.memo is not None:
+                    self.memo.put(memo_key, result)
+                self.stack_shrink(self.stack_pointer - 1 - num_args)
+                self.stack_push(result)
+                return
+
+        frame = Frame(fn, -1, self.stack_pointer - num_args, memo_key, self.executed)
+        self.push_frame(frame)
+        # reserve the slots of the locals after the arguments
+        for _ in range(fn.num_locals - fn.num_parameters):
+            self.stack_push(MNullObject())
+
+    def call_function(self, fn: CompliedFunction, args: List[MObject]) -> MObject:
+        """
+        Run a call of fn in the interpreter and return its result
+        """
+        depth = self.frames_index
+        self.stack_push(fn)
+        for arg in args:
+            self.stack_push(arg)
+        self.execute_call(len(args))
+        if self.frames_index > depth:
+            self.run(return_depth=depth)
+        return self.stack_pop()
+
+    def execute_return(self, return_value: MObject) -> None:
+        frame = self.pop_frame()
+        if frame.memo_key is not None and self.memo is not None:
+            self.memo.put(frame.memo_key, return_value)
+        if self.profile is not None:
+            self.record_call(self.profile, frame)
+        self.stack_shrink(frame.base_pointer - 1)
+        self.stack_push(return_value)
+
+    def record_call(self, profile: dict[str, FunctionProfile], frame: Frame) -> None:
+        total = self.executed - frame.entered
+        name = frame.function.name or "<anonymous>"
+        stats = profile.setdefault(name, FunctionProfile())
+        stats.calls += 1
+        stats.instructions += total - frame.children
+        self.current_frame().children += total
+
+    def main_profile(self) -> FunctionProfile:
+        """
+        Profile of the main function, whose frame is never returned from
+        """
+        return FunctionProfile(1, self.executed - self.frames[0].children)
 
     def execute_binary_operation(self, op: MOpcode) -> None:
         right = self.stack_pop()
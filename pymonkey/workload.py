@@ -0,0 +1,209 @@
+import random
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import List
+
+from pymonkey.evaluator.mevaluator import MEvaluator
+from pymonkey.parser.mparser import parse_source
+
+CALL_GRAPHS = ("none", "chain", "tree", "random")
+
+
+def identifier(prefix: str, index: int) -> str:
+    """
+    Identifiers can not contain digits, so index is written in letters
+    """
+    letters = ""
+    while True:
+        index, digit = divmod(index, 26)
+        letters = chr(ord("a") + digit) + letters
+        if index == 0:
+            return prefix + letters
+
+
+@dataclass
+class WorkloadConfig:
+    seed: int = 0
+    # top level statements
+    statements: int = 50
+    functions: int = 10
+    # nesting of expressions and conditionals
+    depth: int = 3
+    # elements of array and hash literals, characters of strings
+    literal_size: int = 5
+    # which functions call which, see CALL_GRAPHS
+    call_graph: str = "random"
+    # max nested monkey calls, the evaluators recurse in python
+    call_depth: int = 6
+
+
+@dataclass
+class Workload:
+    config: WorkloadConfig
+    source: str
+    # result of the tree walking evaluator
+    expected: str
+
+    def write(self, path: Path) -> None:
+        """
+        Write the source to path and the expected result next to it
+        """
+        path.write_text(self.source)
+        path.with_suffix(".expected").write_text(self.expected + "\n")
+
+
+@dataclass
+class WorkloadGenerator:
+    """
+    Random but valid monkey programs: every index is in range, every divisor
+    is a positive literal and the call graph has no cycles, so a program ends
+    with the same result for the same config
+    """
+
+    config: WorkloadConfig = field(default_factory=WorkloadConfig)
+
+    def __post_init__(self) -> None:
+        if self.config.call_graph not in CALL_GRAPHS:
+            raise ValueError(f"unknown call graph {self.config.call_graph}")
+        self.rng = random.Random(self.config.seed)
+        self.loops = 0
+
+    def callees(self, index: int) -> List[int]:
+        """
+        Functions called by function index, always later ones
+        """
+        n = self.config.functions
+        match self.config.call_graph:
+            case "chain":
+                candidates = [index + 1]
+            case "tree":
+                candidates = [2 * index + 1, 2 * index + 2]
+            case "random":
+                later = range(index + 1, n)
+                candidates = self.rng.sample(later, min(len(later), 2))
+            case _:
+                candidates = []
+        return [c for c in candidates if c < n]
+
+    def string(self) -> str:
+        size = self.rng.randint(0, self.config.literal_size)
+        return '"' + "".join(self.rng.choices("abcdefghij ", k=size)) + '"'
+
+    def expression(self, depth: int, names: List[str]) -> str:
+        """
+        An integer expression over names
+        """
+        rng = self.rng
+        if depth <= 0:
+            if names and rng.random() < 0.7:
+                return rng.choice(names)
+            return str(rng.randint(0, 20))
+
+        inner = depth - 1
+        size = max(self.config.literal_size, 1)
+        match rng.randrange(8):
+            case 0:
+                left = self.expression(inner, names)
+                return f"({left} + {self.expression(inner, names)})"
+            case 1:
+                left = self.expression(inner, names)
+                return f"({left} - {self.expression(inner, names)})"
+            case 2:
+                return f"({self.expression(inner, names)} * {rng.randint(0, 3)})"
+            case 3:
+                return f"({self.expression(inner, names)} / {rng.randint(1, 5)})"
+            case 4:
+                return f"len({self.string()})"
+            case 5:
+                # only the element read is nested, literals grow linearly
+                index = rng.randrange(size)
+                elements = [
+                    self.expression(inner if i == index else 0, names)
+                    for i in range(size)
+                ]
+                return f"[{', '.join(elements)}][{index}]"
+            case 6:
+                index = rng.randrange(size)
+                pairs = [
+                    f'"k{identifier("", i)}":'
+                    f" {self.expression(inner if i == index else 0, names)}"
+                    for i in range(size)
+                ]
+                return f'{{{", ".join(pairs)}}}["k{identifier("", index)}"]'
+            case _:
+                condition = self.condition(inner, names)
+                then = self.expression(inner, names)
+                other = self.expression(inner, names)
+                return f"(if ({condition}) {{ {then} }} else {{ {other} }})"
+
+    def condition(self, depth: int, names: List[str]) -> str:
+        left = self.expression(depth, names)
+        right = self.expression(depth, names)
+        match self.rng.randrange(4):
+            case 0:
+                return f"{left} < {right}"
+            case 1:
+                return f"{left} == {right}"
+            case 2:
+                return f"!({left} > {right})"
+            case _:
+                return self.rng.choice(["true", "false"])
+
+    def function(self, index: int) -> str:
+        depth = self.config.depth
+        lines = [
+            f"let {identifier('fun', index)} = fn(x, n) {{",
+            f"  let a = {self.expression(depth, ['x', 'n'])};",
+        ]
+        for callee in self.callees(index):
+            argument = self.expression(depth - 1, ["a", "x"])
+            lines.append(
+                f"  if (n > 0) {{ a = a + {identifier('fun', callee)}({argument}, n - 1); }};"
+            )
+        lines += [f"  a + {self.expression(depth, ['a', 'x'])}", "};"]
+        return "\n".join(lines)
+
+    def statement(self, names: List[str]) -> str:
+        rng = self.rng
+        depth = self.config.depth
+        kind = rng.randrange(4)
+        if not names or kind == 0:
+            name = identifier("glob", len(names))
+            names.append(name)
+            return f"let {name} = {self.expression(depth, names[:-1])};"
+
+        target = rng.choice(names)
+        if kind == 1 and self.config.functions:
+            fn = identifier("fun", rng.randrange(self.config.functions))
+            argument = self.expression(depth - 1, names)
+            return f"{target} = {target} + {fn}({argument}, {self.config.call_depth});"
+        if kind == 2:
+            condition = self.condition(depth - 1, names)
+            value = self.expression(depth, names)
+            return f"if ({condition}) {{ {target} = {value}; }};"
+        # loop counters are globals of their own
+        counter = identifier("loop", self.loops)
+        self.loops += 1
+        value = self.expression(depth - 1, [*names, counter])
+        return (
+            f"let {counter} = 0;\n"
+            f"while ({counter} < {rng.randint(1, 4)}) {{ {target} = {target} / 2 + {value};"
+            f" {counter} = {counter} + 1; }};"
+        )
+
+    def source(self) -> str:
+        # a function is defined before the ones calling it
+        lines = [self.function(i) for i in reversed(range(self.config.functions))]
+        names: List[str] = []
+        lines += [self.statement(names) for _ in range(self.config.statements)]
+        lines.append(f"[{', '.join(names)}];")
+        return "\n".join(lines)
+
+    def generate(self) -> Workload:
+        source = self.source()
+        expected = str(MEvaluator(parse_source(source)).evaluate())
+        return Workload(self.config, source, expected)
+
+
+def generate(config: WorkloadConfig) -> Workload:
+    return WorkloadGenerator(config).generate()
@@ -0,0 +1,42 @@
+from pymonkey.allocations import AllocationCounter
+from pymonkey.compiler.compiler import Compiler
+from pymonkey.evaluator.mevaluator import MEvaluator
+from pymonkey.evaluator.mobject import MArrayObject, MIntegerObject
+from pymonkey.lexer.mlexer import MLexer
+from pymonkey.parser.mparser import MParser
+from pymonkey.vm.vm import VM
+
+SOURCE = """let pairs = fn(n) {
+  if (n == 0) { 0 } else { [n, pairs(n - 1)] }
+};
+pairs(3);
+"""
+
+
+def test_evaluator_sites() -> None:
+    program = MParser(MLexer(SOURCE, "pairs.monkey")).parse_program()
+    with AllocationCounter(sites=True) as allocations:
+        MEvaluator(program).evaluate()
+
+    assert allocations.counts["MArrayObject"] == 3
+    assert allocations.site_counts["pairs.monkey:2:28 MArrayObject"] == 3
+    assert allocations.sizes["MArrayObject"] > 0
+    assert allocations.peak > 0
+    assert "pairs.monkey:2:28 MArrayObject" in allocations.report()
+
+    # the constructors are restored
+    with AllocationCounter() as allocations:
+        MIntegerObject(1)
+    MArrayObject([])
+    assert allocations.counts == {"MIntegerObject": 1}
+
+
+def test_vm_sites() -> None:
+    compiler = Compiler()
+    compiler.compile(MParser(MLexer(SOURCE, "pairs.monkey")).parse_program())
+    vm = VM(compiler.bytecode())
+    with AllocationCounter(sites=True) as allocations:
+        vm.run()
+
+    site = "pairs.monkey:2:28 in pairs MArrayObject"
+    assert allocations.site_counts[site] == 3
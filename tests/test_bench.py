@@ -0,0 +1,58 @@
+import json
+from pathlib import Path
+
+from pymonkey.bench import ENGINES, BenchReport, BenchResult, bench, bench_corpus
+
+
+def test_bench_engines(tmp_path: Path) -> None:
+    (tmp_path / "sum.monkey").write_text(
+        "let f = fn(n) { if (n == 0) { 0 } else { n + f(n - 1) } }; f(20);"
+    )
+    report = bench_corpus([tmp_path / "sum.monkey"], list(ENGINES), 0, 3)
+    assert [r.engine for r in report.results] == list(ENGINES)
+    for result in report.results:
+        assert result.result == "210"
+        assert result.error is None
+        assert len(result.times) == 3
+        assert result.median is not None and result.p95 is not None
+        assert result.p95 >= result.median
+        assert result.peak_memory is not None and result.peak_memory > 0
+        if result.engine.startswith("vm") or result.engine == "register":
+            assert result.instructions is not None and result.instructions > 0
+            rate = result.instructions_per_second
+            assert rate is not None and rate > 0
+        else:
+            assert result.instructions is None
+
+    data = json.loads(report.to_json())
+    assert data["repeat"] == 3
+    assert BenchReport.from_json(report.to_json()) == report
+
+
+def test_bench_error() -> None:
+    result = bench('1 + "a"', "bad", "vm-O1", 0, 1)
+    assert result.error is not None
+    assert result.times == [] and result.median is None
+
+
+def test_bench_compare() -> None:
+    baseline = BenchReport(
+        results=[
+            BenchResult("fib", "vm-O1", "1", times=[1.0]),
+            BenchResult("fib", "closure", "1", times=[1.0]),
+            BenchResult("loop", "vm-O1", "1", times=[1.0]),
+        ]
+    )
+    report = BenchReport(
+        results=[
+            BenchResult("fib", "vm-O1", "1", times=[1.05]),
+            BenchResult("fib", "closure", "1", times=[1.5]),
+            BenchResult("loop", "vm-O1", error="RecursionError: too deep"),
+            BenchResult("new", "vm-O1", "1", times=[9.0]),
+        ]
+    )
+    assert report.compare(baseline, 0.1) == [
+        "fib closure: 1000.00ms -> 1500.00ms (+50%)",
+        "loop vm-O1: fails with RecursionError: too deep",
+    ]
+    assert report.compare(baseline, 0.01)[0].startswith("fib vm-O1")
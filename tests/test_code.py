@@ -1,4 +1,4 @@
-from pymonkey.code.code import Encoder, Instructions, MOpcode
+from pymonkey.code.code import Encoder, Instructions, LineTable, MOpcode
 
 
 def run_test(test_input: dict) -> None:
@@ -43,3 +43,21 @@ def test_instructions_string() -> None:
     }
 
     assert_instructions_string(test_input)
+
+
+def test_line_table() -> None:
+    positions = [(1, 1), (1, 1), (1, 1), (2, 5), (0, 0), (300, 200), (300, 200)]
+    table = LineTable.encode("a.monkey", positions)
+
+    # one run of three varints per position change, lines above 127 take two bytes
+    assert len(table.runs) == 4 * 3 + 2
+    assert [table.lookup(i) for i in range(len(positions))] == [
+        (1, 1),
+        (1, 1),
+        (1, 1),
+        (2, 5),
+        None,
+        (300, 200),
+        (300, 200),
+    ]
+    assert table.lookup(len(positions)) is None
@@ -1,8 +1,18 @@
+import pickle
+from pathlib import Path
+
 from pymonkey.code.code import Instructions, MOpcode
 from pymonkey.compiler.compiler import Compiler
-from pymonkey.evaluator.mobject import MIntegerObject
+from pymonkey.evaluator.mobject import (
+    MArrayObject,
+    MBooleanObject,
+    MHashMapObject,
+    MIntegerObject,
+    MStringObject,
+)
 from pymonkey.lexer.mlexer import MLexer
 from pymonkey.parser.mparser import MParser
+from pymonkey.vm.vm import VM
 
 
 def assert_instructions(i: int, compiled: Instructions, expected: list) -> None:
@@ -47,3 +57,193 @@ def test_integer() -> None:
     }
 
     run_test(test_input)
+
+
+def test_constant_aggregate() -> None:
+    test_input = {
+        "[1, 2, 3];": [
+            [
+                [0, MOpcode.OpConstant, 0x00, 0x00],
+                [3, MOpcode.OpPop],
+            ],
+            [MArrayObject([MIntegerObject(1), MIntegerObject(2), MIntegerObject(3)])],
+        ],
+        '{"one": [1], "two": true};': [
+            [
+                [0, MOpcode.OpConstant, 0x00, 0x00],
+                [3, MOpcode.OpPop],
+            ],
+            [
+                MHashMapObject(
+                    {
+                        MStringObject("one"): MArrayObject([MIntegerObject(1)]),
+                        MStringObject("two"): MBooleanObject(True),
+                    }
+                )
+            ],
+        ],
+        "[1, 2 + 3];": [
+            [
+                [0, MOpcode.OpConstant, 0x00, 0x00],
+                [3, MOpcode.OpConstant, 0x00, 0x01],
+                [6, MOpcode.OpConstant, 0x00, 0x02],
+                [9, MOpcode.OpAdd],
+                [10, MOpcode.OpArray, 0x00, 0x02],
+                [13, MOpcode.OpPop],
+            ],
+            [MIntegerObject(1), MIntegerObject(2), MIntegerObject(3)],
+        ],
+    }
+
+    run_test(test_input)
+
+
+def test_constant_aggregate_pickle(tmp_path: Path) -> None:
+    code = "[" + ", ".join(str(i) for i in range(100000)) + '];{1: "a", true: "b"};'
+    compiler = Compiler()
+    compiler.compile(MParser(MLexer(code)).parse_program())
+    bytecode = compiler.bytecode()
+
+    file_path = tmp_path / "a.mb"
+    bytecode.to_pickle(file_path)
+    with open(file_path, "rb") as file:
+        loaded = pickle.load(file)
+
+    assert len(compiler.constants) == 2
+    assert loaded.constants[0] == bytecode.constants[0]
+    assert list(loaded.constants[1].value.keys()) == [
+        MIntegerObject(1),
+        MBooleanObject(True),
+    ]
+    assert file_path.stat().st_size < 600000
+
+
+def test_fold_call() -> None:
+    test_input = {
+        "let fib = fn(x) { if (x < 2) { x } else { fib(x - 1) + fib(x - 2) } };"
+        "fib(30);": MIntegerObject(832040),
+        'let twice = fn(s) { s + s }; twice(twice("ab"));': MStringObject("abababab"),
+        "let pair = fn(a, b) { [a, b] }; pair(1, true);": MArrayObject(
+            [MIntegerObject(1), MBooleanObject(True)]
+        ),
+    }
+
+    for i, (key, value) in enumerate(test_input.items()):
+        compiler = Compiler(fold_budget=10000)
+        compiler.compile(MParser(MLexer(key)).parse_program())
+
+        instructions = compiler.bytecode().instructions
+        assert instructions.get_opcode(len(instructions) - 2) == MOpcode.OpConstant
+        result = compiler.constants[instructions.get_opargs(len(instructions) - 2)]
+        assert result == value, f"Test {i} failed: {result}"
+        assert str(compiler.folded_calls[-1]).endswith(str(value))
+
+
+def test_fold_call_skipped() -> None:
+    test_input = [
+        "let loop = fn(x) { while (true) { x = x + 1; } }; loop(1);",
+        "let log = fn(x) { puts(x); x }; log(1);",
+        "let n = 2; let f = fn(x) { x * n }; f(1);",
+        "let f = fn(x) { x * 2 }; let g = fn(f) { f(2) }; g(3);",
+        "let f = fn(x) { x * 2 }; let y = 3; f(y);",
+        "let f = fn(x) { x[5] }; f([1]);",
+    ]
+
+    for i, code in enumerate(test_input):
+        compiler = Compiler(fold_budget=10000)
+        compiler.compile(MParser(MLexer(code)).parse_program())
+
+        instructions = compiler.bytecode().instructions
+        assert instructions.get_opcode(len(instructions) - 2) == MOpcode.OpCall
+        assert compiler.folded_calls == [], f"Test {i} failed"
+
+
+def test_fold_call_shadowed() -> None:
+    # sq(3) inside g calls the parameter, not the folded global
+    code = (
+        "let sq = fn(x) { x * x }; sq(3);"
+        "let g = fn(sq) { sq(3) }; g(fn(x) { x + 1 });"
+    )
+    compiler = Compiler(fold_budget=10000)
+    compiler.compile(MParser(MLexer(code)).parse_program())
+    vm = VM(compiler.bytecode())
+    vm.run()
+    assert vm.last_pop == MIntegerObject(4)
+    assert [str(call) for call in compiler.folded_calls] == ["folded sq(3) -> 9"]
+
+
+def test_inline() -> None:
+    test_input = {
+        "let inc = fn(x) { x + 1 }; inc(2);": [
+            MOpcode.OpConstant,
+            MOpcode.OpSetGlobal,
+            MOpcode.OpConstant,
+            MOpcode.OpSetGlobal,
+            MOpcode.OpGetGlobal,
+            MOpcode.OpConstant,
+            MOpcode.OpAdd,
+            MOpcode.OpPop,
+        ],
+        "let inc = fn(x) { x + 1 }; let f = fn(y) { inc(y) }; f(1);": [
+            MOpcode.OpConstant,
+            MOpcode.OpSetGlobal,
+            MOpcode.OpConstant,
+            MOpcode.OpSetGlobal,
+            MOpcode.OpConstant,
+            MOpcode.OpSetGlobal,
+            MOpcode.OpGetGlobal,
+            MOpcode.OpSetGlobal,
+            MOpcode.OpGetGlobal,
+            MOpcode.OpConstant,
+            MOpcode.OpAdd,
+            MOpcode.OpPop,
+        ],
+        # recursive, escaping and shadowed functions are called as usual
+        "let f = fn(x) { f(x) }; f(1);": [
+            MOpcode.OpConstant,
+            MOpcode.OpSetGlobal,
+            MOpcode.OpGetGlobal,
+            MOpcode.OpConstant,
+            MOpcode.OpCall,
+            MOpcode.OpPop,
+        ],
+        "let f = fn(x) { x }; [f]; f(1);": [
+            MOpcode.OpConstant,
+            MOpcode.OpSetGlobal,
+            MOpcode.OpGetGlobal,
+            MOpcode.OpArray,
+            MOpcode.OpPop,
+            MOpcode.OpGetGlobal,
+            MOpcode.OpConstant,
+            MOpcode.OpCall,
+            MOpcode.OpPop,
+        ],
+    }
+
+    for i, (key, value) in enumerate(test_input.items()):
+        compiler = Compiler(optimize=1)
+        compiler.compile(MParser(MLexer(key)).parse_program())
+
+        instructions = compiler.bytecode().instructions
+        opcodes = [instructions.get_opcode(j) for j in range(len(instructions))]
+        assert opcodes == value, f"Test {i} failed: {opcodes}"
+
+    compiler = Compiler(optimize=0)
+    compiler.compile(MParser(MLexer("let f = fn(x) { x }; f(1);")).parse_program())
+    instructions = compiler.bytecode().instructions
+    assert instructions.get_opcode(len(instructions) - 2) == MOpcode.OpCall
+
+
+def test_inline_slots() -> None:
+    code = (
+        "let add = fn(a, b) { a + b }; let sq = fn(x) { x * x };"
+        "add(1, sq(2)) + add(sq(3), add(4, 5)) + sq(add(6, 0));"
+    )
+    compiler = Compiler(optimize=1)
+    compiler.compile(MParser(MLexer(code)).parse_program())
+    vm = VM(compiler.bytecode())
+    vm.run()
+
+    assert vm.last_pop == MIntegerObject(59)
+    # the call sites share one global per parameter position
+    assert compiler.symbol_table.names == ["add", "sq", "arg#0.0", "arg#0.1"]
@@ -0,0 +1,50 @@
+import json
+from pathlib import Path
+
+from pymonkey.conformance import Fuzzer, check, check_all
+
+ENGINES = ["tree-walk", "vm-O1"]
+
+
+def test_match() -> None:
+    result = check("sum", "let f = fn(x) { x * 2 }; f(3) + 1;", ENGINES)
+    assert result.status == "match"
+    assert {o.value for o in result.outcomes.values()} == {"7"}
+    assert all(o.seconds > 0 for o in result.outcomes.values())
+
+
+def test_both_fail() -> None:
+    result = check("len", "len(1);", ENGINES)
+    assert result.status == "match"
+    assert result.outcomes["tree-walk"].error == "len unknown expression"
+
+
+def test_error_in_one_engine() -> None:
+    # the evaluator returns null for an index out of range, the VM raises
+    result = check("index", "[1, 2][5];", ENGINES)
+    assert result.status == "error"
+    assert result.outcomes["tree-walk"].value == "None"
+    assert result.outcomes["vm-O1"].error is not None
+
+
+def test_syntax_error() -> None:
+    result = check("bad", "let = ;", ENGINES)
+    assert result.status == "match"
+    assert all(o.error for o in result.outcomes.values())
+
+
+def test_fuzzer_seeded() -> None:
+    assert Fuzzer(3).program() == Fuzzer(3).program()
+    assert Fuzzer(3).program() != Fuzzer(4).program()
+
+
+def test_report(tmp_path: Path) -> None:
+    (tmp_path / "index.monkey").write_text("[1, 2][5];")
+    report = check_all([tmp_path / "index.monkey"], ENGINES, fuzz=5, workloads=1)
+    assert len(report.results) == 7
+    assert report.results[0] in report.differences()
+    assert set(report.seconds()) == set(ENGINES)
+
+    data = json.loads(report.to_json())
+    assert data["programs"] == 7
+    assert data["results"][0]["status"] == "error"
@@ -0,0 +1,69 @@
+from pymonkey.compiler.compiler import Compiler
+from pymonkey.lexer.mlexer import MLexer
+from pymonkey.parser.mparser import MParser
+from pymonkey.vm.coverage import CoverageVM
+from pymonkey.vm.vm import VM
+
+SOURCE = """let f = fn(x) {
+  if (x > 1) {
+    x * 2
+  } else {
+    0
+  }
+};
+let unused = fn() {
+  1
+};
+f(5);
+"""
+
+
+def test_coverage() -> None:
+    compiler = Compiler()
+    compiler.compile(MParser(MLexer(SOURCE, "cov.monkey")).parse_program())
+    bytecode = compiler.bytecode()
+    plain = VM(bytecode)
+    plain.run()
+    vm = CoverageVM(bytecode)
+    vm.run()
+
+    assert vm.last_pop == plain.last_pop
+    report = vm.coverage.lcov().splitlines()
+    assert report[:2] == ["TN:", "SF:cov.monkey"]
+    assert "FNDA:0,unused" in report and "FNDA:1,f" in report
+    assert [line for line in report if line.startswith("DA:")] == [
+        "DA:1,1",
+        "DA:2,1",
+        "DA:3,1",
+        "DA:5,0",
+        "DA:8,1",
+        "DA:9,0",
+        "DA:11,1",
+    ]
+    assert report[-3:] == ["LF:7", "LH:5", "end_of_record"]
+
+
+def test_coverage_loop() -> None:
+    source = """let i = 0;
+while (i < 3) {
+  i = i + 1;
+};
+if (i > 5) {
+  0
+};
+i;
+"""
+    compiler = Compiler()
+    compiler.compile(MParser(MLexer(source, "loop.monkey")).parse_program())
+    vm = CoverageVM(compiler.bytecode())
+    vm.run()
+
+    report = vm.coverage.lcov().splitlines()
+    assert [line for line in report if line.startswith("DA:")] == [
+        "DA:1,1",
+        "DA:2,1",
+        "DA:3,1",
+        "DA:5,1",
+        "DA:6,0",
+        "DA:8,1",
+    ]
@@ -0,0 +1,54 @@
+import json
+import pickle
+
+from pymonkey.compiler.compiler import Bytecode, Compiler
+from pymonkey.compiler.disassembler import Disassembler
+from pymonkey.lexer.mlexer import MLexer
+from pymonkey.parser.mparser import MParser
+
+
+def compile_source(source: str) -> Bytecode:
+    compiler = Compiler()
+    compiler.compile(MParser(MLexer(source)).parse_program())
+    # names survive a bytecode file
+    return pickle.loads(pickle.dumps(compiler.bytecode()))
+
+
+def test_disassemble() -> None:
+    bytecode = compile_source(
+        'let f = fn(x) { let y = len("ab"); if (x) { y } else { 0 } }; f(true);'
+    )
+    assert Disassembler(bytecode).disassemble() == (
+        "== main: 0 parameters, 0 locals, 6 instructions, 14 bytes ==\n"
+        "    1       0000  OpConstant       2  ; fn f\n"
+        "            0003  OpSetGlobal      0  ; f\n"
+        "            0006  OpGetGlobal      0  ; f\n"
+        "            0009  OpTrue\n"
+        "            0010  OpCall           1  ; 1 arguments\n"
+        "            0013  OpPop\n"
+        "\n"
+        "== f: 1 parameters, 2 locals, 10 instructions, 28 bytes ==\n"
+        "    1       0000  OpGetBuiltin     0  ; len\n"
+        "            0003  OpConstant       0  ; 'ab'\n"
+        "            0006  OpCall           1  ; 1 arguments\n"
+        "            0009  OpSetLocal       1  ; y\n"
+        "            0012  OpGetLocal       0  ; x\n"
+        "            0015  OpJumpNotTruthy  L0\n"
+        "            0018  OpGetLocal       1  ; y\n"
+        "            0021  OpJump           L1\n"
+        "      L0:   0024  OpConstant       1  ; 0\n"
+        "      L1:   0027  OpReturnValue"
+    )
+
+
+def test_size_report() -> None:
+    bytecode = compile_source("let f = fn(x) { x * 2 }; let g = fn() { [1, 2] }; 3;")
+    report = json.loads(Disassembler(bytecode).size_report().to_json())
+
+    assert [fn["name"] for fn in report["functions"]] == ["main", "f", "g"]
+    assert report["instructions"] == sum(
+        fn["instructions"] for fn in report["functions"]
+    )
+    assert report["constants"]["CompliedFunction"]["count"] == 2
+    assert report["constants"]["MIntegerObject"]["count"] == 2
+    assert report["constants"]["MArrayObject"]["count"] == 1
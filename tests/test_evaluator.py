@@ -1,25 +1,35 @@
+from pymonkey.evaluator.closure_evaluator import ClosureEvaluator
 from pymonkey.evaluator.mevaluator import MEvaluator
 from pymonkey.evaluator.mobject import (
     MArrayObject,
     MBooleanObject,
+    MErrorObject,
     MIntegerObject,
     MNullObject,
     MObject,
     MStringObject,
 )
+from pymonkey.evaluator.resolver import Resolver
+from pymonkey.evaluator.trampoline_evaluator import TrampolineEvaluator
+from pymonkey.memo import MemoCache
 from pymonkey.parser.mparser import MLexer, MParser
 
+EVALUATORS = (MEvaluator, ClosureEvaluator, TrampolineEvaluator)
+
 
 def evaluate_test(test_dict: dict[str, MObject]) -> None:
     for i, (in_test, out_test) in enumerate(test_dict.items()):
-        try:
-            lexer = MLexer(in_test)
-            program = MParser(lexer).parse_program()
-            evaluation = MEvaluator(program).evaluate()
-        except Exception as err:
-            assert False, f"Test {i} failed: Error: {err}"
-        else:
-            assert evaluation == out_test, f"Test {i} failed: {in_test} != {out_test}"
+        for evaluator in EVALUATORS:
+            try:
+                lexer = MLexer(in_test)
+                program = MParser(lexer).parse_program()
+                evaluation = evaluator(program).evaluate()
+            except Exception as err:
+                assert False, f"Test {i} failed in {evaluator.__name__}: Error: {err}"
+            else:
+                assert (
+                    evaluation == out_test
+                ), f"Test {i} failed in {evaluator.__name__}: {in_test} != {out_test}"
 
 
 def test_int() -> None:
@@ -162,6 +172,39 @@ def test_env() -> None:
     evaluate_test(tests)
 
 
+def test_scope() -> None:
+    tests: dict[str, MObject] = {
+        "let a = 1; let f = fn() { fn() { fn() { a = a + 1; a } } }; f()()();": (
+            MIntegerObject(2)
+        ),
+        "let f = fn() { let y = x; let x = 2; y + x }; let x = 1; f();": (
+            MIntegerObject(3)
+        ),
+        "let g = fn() { z }; let z = 3; g();": MIntegerObject(3),
+        "let f = fn(x, y) { let x = x * 10; x + y }; f(1, 2);": MIntegerObject(12),
+        "let len = fn(x) { 0 }; len([1]);": MIntegerObject(0),
+    }
+
+    evaluate_test(tests)
+
+
+def test_resolve() -> None:
+    program = MParser(
+        MLexer("let a = 1; let f = fn(x) { let y = x; fn() { a + y } };")
+    ).parse_program()
+    assert Resolver.resolve(program) == ("a", "f")
+
+    f = program.statements[1].value  # type: ignore[attr-defined]
+    assert f.slot_names == ("x", "y")
+    inner = f.body.statements[1].expression
+    a, y = (
+        inner.body.statements[0].expression.left,
+        inner.body.statements[0].expression.right,
+    )
+    assert (a.value, a.depth, a.slot) == ("a", 2, 0)
+    assert (y.value, y.depth, y.slot) == ("y", 1, 1)
+
+
 def test_array() -> None:
     tests: dict[str, MObject] = {
         "[1, 2 * 2, 3 + 3];": MArrayObject(
@@ -183,6 +226,75 @@ def test_hashmap() -> None:
         '{"one": 1}["one"]': MIntegerObject(1),
         'let hm = {"one": 1}; hm["one"];': MIntegerObject(1),
         'let hm = {}; hm["one"];': MNullObject(),
+        # a repeated key keeps the last value
+        'let hm = {"a": 1, "a": 2, "b": 3}; hm["a"] + hm["b"];': MIntegerObject(5),
+    }
+
+    evaluate_test(tests)
+
+
+def test_while() -> None:
+    tests: dict[str, MObject] = {
+        "let i = 0; while (i < 10) { i = i + 1; }; i;": MIntegerObject(10),
+        "let i = 0; while (i < 10) { i = i + 1; };": MNullObject(),
+        "let i = 0; while (true) { if (i == 5) { break; } i = i + 1; }; i;": (
+            MIntegerObject(5)
+        ),
+        "let i = 0; let s = 0;"
+        "while (i < 5) { i = i + 1; if (i == 3) { continue; } s = s + i; }; s;": (
+            MIntegerObject(12)
+        ),
+        "let f = fn(n) { let s = 0; while (n > 0) { s = s + n; n = n - 1; } s };"
+        "f(20000);": MIntegerObject(200010000),
+        "let f = fn() { while (true) { return 3; } }; f();": MIntegerObject(3),
+        "let c = 0; let inc = fn() { c = c + 1; }; inc(); inc(); c;": MIntegerObject(2),
     }
 
     evaluate_test(tests)
+
+
+def test_while_error() -> None:
+    tests = [
+        "x = 1;",
+        "break;",
+        "let f = fn() { continue; }; f();",
+    ]
+
+    for i, in_test in enumerate(tests):
+        for evaluator in EVALUATORS:
+            evaluation = evaluator(MParser(MLexer(in_test)).parse_program()).evaluate()
+            assert isinstance(evaluation, MErrorObject), f"Test {i} failed: {in_test}"
+
+
+def test_memoize() -> None:
+    code = (
+        "let f = fn(x) { if (x < 2) { x } else { f(x - 1) + f(x - 2) } };"
+        "let g = fn(x) { puts(x); x };"
+        "f(60) + g(1)"
+    )
+    for evaluator in EVALUATORS:
+        memo: MemoCache[MObject] = MemoCache(max_size=16)
+        evaluation = evaluator(MParser(MLexer(code)).parse_program(), memo).evaluate()
+
+        assert evaluation == MIntegerObject(1548008755920 + 1)
+        assert memo.misses == 61
+        assert memo.hits == 58
+        assert len(memo.entries) == 16
+
+
+def test_deep_recursion() -> None:
+    tests: dict[str, MObject] = {
+        "let count = fn(n) { if (n == 0) { 0 } else { 1 + count(n - 1) } };"
+        "count(20000);": MIntegerObject(20000),
+        "let sum = fn(n, acc) { if (n == 0) { return acc; } sum(n - 1, acc + n) };"
+        "sum(20000, 0);": MIntegerObject(200010000),
+        "let f = fn(n) { f(n + 1) }; f(0);": MErrorObject("stack overflow"),
+        "let f = fn(n) { if (n == 0) { 0 } else { 1 + f(n - 1) } }; f(5) + f(30000);": (
+            MErrorObject("stack overflow")
+        ),
+    }
+
+    for i, (in_test, out_test) in enumerate(tests.items()):
+        program = MParser(MLexer(in_test)).parse_program()
+        evaluation = TrampolineEvaluator(program, stack_limit=100_000).evaluate()
+        assert evaluation == out_test, f"Test {i} failed: {in_test}"
@@ -0,0 +1,123 @@
+from pymonkey.code.code import MOpcode
+from pymonkey.compiler.compiler import Compiler
+from pymonkey.compiler.ir import BytecodeEmitter, IRFunction, IRInstruction
+from pymonkey.compiler.passes import (
+    PassManager,
+    fold_constant_branches,
+    remove_unreachable_blocks,
+    thread_jumps,
+)
+from pymonkey.evaluator.mobject import MIntegerObject
+from pymonkey.lexer.mlexer import MLexer
+from pymonkey.parser.mparser import MParser
+from pymonkey.vm.vm import VM
+
+
+def compile_program(source: str, optimize: int) -> Compiler:
+    compiler = Compiler(optimize=optimize)
+    compiler.compile(MParser(MLexer(source)).parse_program())
+    return compiler
+
+
+def opcodes(fn: IRFunction) -> list[MOpcode]:
+    instructions = BytecodeEmitter.emit(fn)
+    return [instructions.get_opcode(i) for i in range(len(instructions))]
+
+
+def test_emit() -> None:
+    fn = IRFunction("test")
+    after = fn.new_block()
+    fn.append(IRInstruction(MOpcode.OpTrue))
+    fn.append(IRInstruction(MOpcode.OpJumpNotTruthy, target=after.label))
+    fn.start_block(fn.new_block())
+    fn.append(IRInstruction(MOpcode.OpNull))
+    fn.append(IRInstruction(MOpcode.OpPop))
+    fn.start_block(after)
+
+    assert [b.successors for b in fn.blocks] == [[after.label, 2], [after.label], []]
+    assert fn.predecessors()[after.label] == [0, 2]
+
+    instructions = BytecodeEmitter.emit(fn)
+    assert instructions.get_opcode(1) == MOpcode.OpJumpNotTruthy
+    assert instructions.get_opargs(1) == 4
+    assert len(instructions) == 4
+
+
+def test_emit_fallthrough_jump() -> None:
+    fn = IRFunction("test")
+    first = fn.new_block()
+    second = fn.new_block()
+    fn.start_block(first)
+    fn.append(IRInstruction(MOpcode.OpJump, target=second.label))
+    fn.start_block(second)
+    fn.append(IRInstruction(MOpcode.OpNull))
+
+    # the fallthrough of the entry block is no longer next in the layout
+    fn.blocks.remove(first)
+    fn.blocks[0].fallthrough = first.label
+    fn.blocks.append(first)
+
+    assert opcodes(fn) == [MOpcode.OpJump, MOpcode.OpNull, MOpcode.OpJump]
+    assert BytecodeEmitter.emit(fn).get_opargs(0) == 2
+
+
+def test_passes() -> None:
+    compiler = compile_program("while (true) { 1; }; 2;", optimize=0)
+    fn = compiler.scopes[0].function
+    assert fold_constant_branches(fn)
+    assert MOpcode.OpJumpNotTruthy not in opcodes(fn)
+    # without a break the code after the loop is never reached
+    assert remove_unreachable_blocks(fn)
+    assert opcodes(fn) == [MOpcode.OpConstant, MOpcode.OpPop, MOpcode.OpJump]
+
+    compiler = compile_program("let f = fn() { return 1; 2; }; f();", optimize=0)
+    fn = compiler.ir_functions[0]
+    assert remove_unreachable_blocks(fn)
+    assert opcodes(fn) == [MOpcode.OpConstant, MOpcode.OpReturnValue]
+
+    # the jump out of the inner if goes straight past the outer one
+    source = "if (1 > 0) { if (2 > 1) { 3 } else { 4 } } else { 5 };"
+    compiler = compile_program(source, optimize=0)
+    fn = compiler.scopes[0].function
+    assert thread_jumps(fn)
+    manager = PassManager.for_level(1)
+    manager.run(fn)
+    assert manager.changes["merge_blocks"] >= 1
+    assert not thread_jumps(fn)
+    vm = VM(compiler.bytecode())
+    vm.run()
+    assert vm.last_pop == MIntegerObject(3)
+
+
+def test_optimize() -> None:
+    test_input = {
+        "while (true) { break; }; 1;": 1,
+        "let i = 0; while (i < 10) { i = i + 1; if (i == 5) { break; } }; i;": 5,
+        "let f = fn(x) { if (x > 1) { return x; } return 0; }; f(3) + f(1);": 3,
+        "if (false) { 1 } else { 2 };": 2,
+        "let i = 0; while (false) { i = 1; }; i;": 0,
+    }
+
+    for i, (key, value) in enumerate(test_input.items()):
+        unoptimized = compile_program(key, optimize=0).bytecode()
+        optimized = compile_program(key, optimize=1).bytecode()
+        assert len(optimized.instructions) <= len(unoptimized.instructions)
+
+        vm = VM(optimized)
+        vm.run()
+        assert vm.last_pop == MIntegerObject(value), f"Test {i} failed"
+
+
+def test_dump() -> None:
+    compiler = compile_program("let f = fn(x) { if (x) { 1 } else { 2 } };", 1)
+    compiler.bytecode()
+
+    dump = compiler.dump_ir()
+    assert "fn f:" in dump
+    assert "fn main:" in dump
+    assert "OpGetLocal x (local 0)" in dump
+    assert "OpConstant 0 (1)" in dump
+
+    dot = compiler.dump_cfg()
+    assert dot.startswith("digraph cfg {")
+    assert '"f.B0" -> "f.B1";' in dot
@@ -0,0 +1,76 @@
+import pytest
+from pymonkey.compiler.compiler import Compiler
+from pymonkey.evaluator.mobject import MIntegerObject, MObject
+from pymonkey.lexer.mlexer import MLexer
+from pymonkey.parser.mparser import MParser
+from pymonkey.vm.jit import MAX_DEOPTS
+from pymonkey.vm.vm import VM
+
+
+def run_jit(source: str, threshold: int = 2) -> VM:
+    compiler = Compiler(optimize=1)
+    compiler.compile(MParser(MLexer(source)).parse_program())
+    vm = VM(compiler.bytecode(), jit_threshold=threshold)
+    vm.run()
+    return vm
+
+
+def test_jit() -> None:
+    test_input: dict[str, MObject] = {
+        "let fib = fn(n) { if (n < 2) { n } else { fib(n - 1) + fib(n - 2) } }; "
+        "fib(15);": MIntegerObject(610),
+        "let sum = fn(n) { let i = 0; let s = 0; "
+        "while (i < n) { i = i + 1; if (i == 3) { continue; } s = s + i; } s }; "
+        "sum(5) + sum(10) + sum(20);": MIntegerObject(12 + 52 + 207),
+        "let sign = fn(x) { if (x > 0) { 1 } else { if (x == 0) { 0 } else { -1 } } }; "
+        "let f = fn(x) { sign(x) * 10 + sign(-x) }; f(3) + f(0) + f(-2);": (
+            MIntegerObject(9 - 9)
+        ),
+    }
+
+    for i, (key, value) in enumerate(test_input.items()):
+        vm = run_jit(key)
+        assert vm.last_pop == value, f"Test {i} failed"
+        assert vm.jit is not None and vm.jit.natives, f"Test {i} not compiled"
+        assert "def jit_" in vm.jit.dump()
+
+
+def test_jit_fallback() -> None:
+    # even is not compiled, since its branches leave a boolean or an integer,
+    # and its boolean result fails the integer guard in f
+    source = """
+        let even = fn(n) { if (n < 2) { n == 0 } else { even(n - 2) } };
+        let f = fn(n) { if (even(n) == true) { 1 } else { 0 } };
+        f(1) + f(2) + f(3) + f(4) + f(5) + f(6);
+    """
+    vm = run_jit(source)
+    assert vm.last_pop == MIntegerObject(3)
+    assert vm.jit is not None
+    assert list(vm.jit.deopts.values()) == [MAX_DEOPTS]
+    assert not vm.jit.natives
+
+    # strings are not compiled, impure functions are never tried
+    source = """
+        let greet = fn(n) { let s = "hi"; s };
+        let count = 0;
+        let impure = fn(n) { let c = count; c };
+        greet(1); greet(2); greet(3); impure(1); impure(2); impure(3);
+    """
+    vm = run_jit(source)
+    assert vm.jit is not None
+    assert len(vm.jit.failed) == 1 and not vm.jit.natives
+
+    # recursion deeper than python allows continues in the interpreter
+    source = "let count = fn(n) { if (n == 0) { 0 } else { 1 + count(n - 1) } };"
+    vm = run_jit(source + "count(3000);")
+    assert vm.last_pop == MIntegerObject(3000)
+
+
+def test_jit_discarded_error() -> None:
+    # f is compiled after two calls, the division by zero only happens at f(5)
+    source = """
+        let f = fn(x) { 10 / (x - 5); x };
+        f(1) + f(2) + f(3) + f(4) + f(5) + f(6);
+    """
+    with pytest.raises(ZeroDivisionError):
+        run_jit(source)
@@ -87,3 +87,25 @@ def test_hashmap() -> None:
     ]
 
     run_lexer(test_input, tokens)
+
+
+def test_while() -> None:
+    test_input = "while (x) { x = false; break; continue; }"
+    tokens = [
+        MToken(MTokenType.Keyword, "while"),
+        MToken(MTokenType.LParen, "("),
+        MToken(MTokenType.Identifier, "x"),
+        MToken(MTokenType.RParen, ")"),
+        MToken(MTokenType.LBrace, "{"),
+        MToken(MTokenType.Identifier, "x"),
+        MToken(MTokenType.Assign, "="),
+        MToken(MTokenType.Keyword, "false"),
+        MToken(MTokenType.Semicolon, ";"),
+        MToken(MTokenType.Keyword, "break"),
+        MToken(MTokenType.Semicolon, ";"),
+        MToken(MTokenType.Keyword, "continue"),
+        MToken(MTokenType.Semicolon, ";"),
+        MToken(MTokenType.RBrace, "}"),
+    ]
+
+    run_lexer(test_input, tokens)
@@ -136,3 +136,13 @@ def test_hashmap() -> None:
     ]
 
     run_parser(test_input)
+
+
+def test_while() -> None:
+    test_input = [
+        "while (x < 10) { x = x + 1; }",
+        "while (true) { break; }",
+        "while (true) { continue; }",
+    ]
+
+    run_parser(test_input)
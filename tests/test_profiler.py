@@ -0,0 +1,39 @@
+from pymonkey.code.code import Instructions
+from pymonkey.compiler.compiler import Bytecode, Compiler
+from pymonkey.lexer.mlexer import MLexer
+from pymonkey.parser.mparser import MParser
+from pymonkey.vm.profiler import SamplingProfiler
+from pymonkey.vm.vm import VM
+
+
+def test_report() -> None:
+    profiler = SamplingProfiler(VM(Bytecode(Instructions([]), [])))
+    profiler.samples.update(
+        {("main", "f", "f"): 6, ("main", "f", "g"): 3, ("main",): 1}
+    )
+
+    assert profiler.collapsed() == "main;f;f 6\nmain;f;g 3\nmain 1\n"
+    assert profiler.summary(2).splitlines() == [
+        "10 samples",
+        "    self      %   total      %  function",
+        "       6  60.0%       9  90.0%  f",
+        "       3  30.0%       3  30.0%  g",
+    ]
+
+
+def test_sampling() -> None:
+    source = (
+        "let fib = fn(n) { if (n < 2) { n } else { fib(n - 1) + fib(n - 2) } };"
+        " fib(16);"
+    )
+    compiler = Compiler()
+    compiler.compile(MParser(MLexer(source)).parse_program())
+    vm = VM(compiler.bytecode())
+
+    with SamplingProfiler(vm, 0.0001) as profiler:
+        vm.run()
+
+    assert sum(profiler.samples.values()) > 0
+    assert all(stack[0] == "main:1" for stack in profiler.samples)
+    # frames are labelled with the line they are at
+    assert any("fib:1" in stack for stack in profiler.samples)
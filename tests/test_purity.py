@@ -0,0 +1,36 @@
+from pymonkey.compiler.purity import PurityAnalysis
+from pymonkey.lexer.mlexer import MLexer
+from pymonkey.parser.mparser import MParser
+
+
+def run_test(test_input: dict[str, set[str]]) -> None:
+    for i, (key, value) in enumerate(test_input.items()):
+        program = MParser(MLexer(key)).parse_program()
+        analysis = PurityAnalysis.analyze(program)
+
+        assert analysis.pure == value, f"Test {i} failed: {analysis.pure}"
+        for name, fn in analysis.functions.items():
+            assert fn.pure == (name in value), f"Test {i} failed: {name}"
+
+
+def test_purity() -> None:
+    test_input = {
+        "let add = fn(x, y) { x + y };": {"add"},
+        "let f = fn(x) { let y = x * 2; y = y + 1; len([y]) };": {"f"},
+        "let fib = fn(x) { if (x < 2) { x } else { fib(x - 1) + fib(x - 2) } };": {
+            "fib"
+        },
+        "let even = fn(x) { if (x == 0) { true } else { odd(x - 1) } };"
+        "let odd = fn(x) { if (x == 0) { false } else { even(x - 1) } };": {
+            "even",
+            "odd",
+        },
+        "let log = fn(x) { puts(x); x };": set(),
+        "let a = fn(x) { log(x) }; let log = fn(x) { puts(x) };": set(),
+        "let n = 1; let f = fn(x) { x + n };": set(),
+        "let c = 0; let f = fn(x) { c = x; };": set(),
+        "let f = fn(x) { x }; f = fn(x) { puts(x) };": set(),
+        "let f = fn(x) { fn(y) { x + y } };": set(),
+    }
+
+    run_test(test_input)
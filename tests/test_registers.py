@@ -0,0 +1,78 @@
+from pathlib import Path
+
+from pymonkey.compiler.compiler import Bytecode, Compiler
+from pymonkey.evaluator.mobject import MIntegerObject
+from pymonkey.lexer.mlexer import MLexer
+from pymonkey.memo import MemoCache
+from pymonkey.object.object import CompliedFunction
+from pymonkey.parser.mparser import MParser
+from pymonkey.vm.register_vm import RegisterVM
+from pymonkey.vm.vm import VM
+
+
+def compile_registers(source: str) -> Bytecode:
+    compiler = Compiler(optimize=1, backend="register")
+    compiler.compile(MParser(MLexer(source)).parse_program())
+    return compiler.bytecode()
+
+
+def function_code(bytecode: Bytecode) -> str:
+    functions = [c for c in bytecode.constants if isinstance(c, CompliedFunction)]
+    return str(functions[0].registers)
+
+
+def test_translate() -> None:
+    test_input = {
+        "let f = fn(x) { x + 1 };": "0000 ADD r1, r0, k0\n0001 RET r1",
+        "let f = fn(x) { let y = x * 2; y - x };": (
+            "0000 MUL r1, r0, k0\n0001 SUB r2, r1, r0\n0002 RET r2"
+        ),
+        # the sum is written straight into the local
+        "let f = fn(x) { let i = 0; i = i + x; i };": (
+            "0000 MOVE r1, k0\n0001 ADD r1, r1, r0\n0002 RET r1"
+        ),
+        "let f = fn(g, x) { g(x, 1) };": (
+            "0000 MOVE r2, r0\n0001 MOVE r3, r1\n0002 MOVE r4, k0\n"
+            "0003 CALL r2, r2, 2\n0004 RET r2"
+        ),
+        "let f = fn(x) { if (x) { 1 } else { 2 } };": (
+            "0000 JMPF r0, 3\n0001 MOVE r1, k0\n0002 JMP 4\n"
+            "0003 MOVE r1, k1\n0004 RET r1"
+        ),
+    }
+
+    for i, (key, value) in enumerate(test_input.items()):
+        assert function_code(compile_registers(key)) == value, f"Test {i} failed"
+
+
+def test_fewer_instructions() -> None:
+    source = """
+        let sum = fn(n) {
+            let i = 0;
+            let total = 0;
+            while (i < n) { total = total + i; i = i + 1; }
+            total
+        };
+        sum(100);
+    """
+    program = MParser(MLexer(source)).parse_program()
+    compiler = Compiler(optimize=1)
+    compiler.compile(program)
+    vm = VM(compiler.bytecode())
+    vm.run()
+
+    register_vm = RegisterVM(compile_registers(source))
+    register_vm.run()
+
+    assert register_vm.last_pop == vm.last_pop == MIntegerObject(4950)
+    assert register_vm.executed < vm.executed / 2
+
+
+def test_pickle(tmp_path: Path) -> None:
+    source = "let fib = fn(n) { if (n < 2) { n } else { fib(n - 1) + fib(n - 2) } };"
+    compile_registers(source + "fib(15);").to_pickle(tmp_path / "fib.mb")
+
+    vm = RegisterVM.from_bytecode_pickle(str(tmp_path / "fib.mb"), MemoCache())
+    vm.run()
+    assert vm.last_pop == MIntegerObject(610)
+    assert vm.memo is not None and vm.memo.hits == 13
@@ -0,0 +1,109 @@
+import pytest
+from pymonkey.evaluator.mobject import (
+    MArrayObject,
+    MIntegerObject,
+    MObject,
+    MStringObject,
+)
+from pymonkey.mrepl import ReplSession
+
+
+def test_session() -> None:
+    test_input: list[tuple[str, None | MObject]] = [
+        ("let x = 2;", None),
+        ("let f = fn(n) { n * x };", None),
+        ("f(3);", MIntegerObject(6)),
+        ("x = 5; f(3);", MIntegerObject(15)),
+        ("let x = 1; x + f(1);", MIntegerObject(6)),
+        (
+            "let fib = fn(n) { if (n < 2) { n } else { fib(n - 1) + fib(n - 2) } };",
+            None,
+        ),
+        ("fib(15);", MIntegerObject(610)),
+        ('let s = "ab"; len(s);', MIntegerObject(2)),
+    ]
+
+    session = ReplSession()
+    for i, (line, value) in enumerate(test_input):
+        result = session.execute(line)
+        if value is not None:
+            assert result == value, f"Test {i} failed"
+
+
+def test_errors() -> None:
+    session = ReplSession()
+    session.execute("let x = 1;")
+
+    with pytest.raises(SyntaxError):
+        session.execute("let = 2;")
+    with pytest.raises(ValueError):
+        session.execute("let y = 3; let z = fn() { q };")
+    with pytest.raises(TypeError):
+        session.execute("let w = 1 + true;")
+    with pytest.raises(ZeroDivisionError):
+        session.execute("let v = 1 / 0;")
+
+    # a failed compile or run defines nothing
+    assert session.execute("x;") == MIntegerObject(1)
+    for name in ["y", "w", "v"]:
+        with pytest.raises(ValueError):
+            session.execute(f"{name};")
+    assert session.execute("let y = x + 1; y;") == MIntegerObject(2)
+    assert session.execute("let v = 3; v;") == MIntegerObject(3)
+
+
+def test_commands() -> None:
+    session = ReplSession()
+    session.execute(
+        "let fib = fn(n) { if (n < 2) { n } else { fib(n - 1) + fib(n - 2) } };"
+    )
+
+    report = session.command(":time fib(10);")
+    assert report.startswith("-> 55\n") and "instructions" in report
+
+    report = session.command(":profile fib(10);")
+    hottest, main = [row.split() for row in report.splitlines()[2:]]
+    assert hottest[2:] == ["177", "fib"] and main[2:] == ["1", "<main>"]
+    assert int(hottest[0]) > int(main[0])
+
+    report = session.command(":dis let g = fn(x) { x + 1 };")
+    assert "CompliedFunction(g)" in report and "OpGetLocal" in report
+    with pytest.raises(ValueError):
+        session.execute("g;")
+
+    report = session.command(':mem let a = [fib(2), "x" + "y"]; 1;')
+    assert report.splitlines()[1:] == [
+        "           3  MBooleanObject",
+        "           3  MIntegerObject",
+        "           1  MStringObject",
+        "           1  MArrayObject",
+    ]
+    assert session.execute("a;") == MArrayObject(
+        [MIntegerObject(1), MStringObject("xy")]
+    )
+
+    with pytest.raises(ValueError):
+        session.command(":nope 1;")
+
+
+def test_rebound_function() -> None:
+    session = ReplSession()
+    session.execute("let inc = fn(x) { x + 1 };")
+    assert session.execute("inc(1);") == MIntegerObject(2)
+
+    # calls inlined in earlier inputs must not keep the old body
+    session.execute("inc = fn(x) { x + 100 };")
+    assert session.execute("inc(1);") == MIntegerObject(101)
+    with pytest.raises(ZeroDivisionError):
+        session.execute("inc = fn(x) { x + 10 }; 1 / 0;")
+    assert session.execute("inc(1);") == MIntegerObject(11)
+    session.execute("let inc = fn(x) { x * 2 };")
+    assert session.execute("inc(4);") == MIntegerObject(8)
+
+
+def test_echo() -> None:
+    session = ReplSession()
+    assert session.execute("let f = fn(x) { x };") is None
+    assert session.execute("let x = 1; x;") == MIntegerObject(1)
+    assert session.execute("x = 2;") is None
+    assert session.command(":time let y = 1;").startswith("wall ")
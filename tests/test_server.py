@@ -0,0 +1,53 @@
+import multiprocessing
+import os
+import pickle
+import stat
+import time
+from pathlib import Path
+
+from pymonkey.compiler.compiler import Compiler
+from pymonkey.lexer.mlexer import MLexer
+from pymonkey.parser.mparser import MParser
+from pymonkey.server import Server, request
+
+
+def test_server(tmp_path: Path) -> None:
+    socket_path = str(tmp_path / "monkey.sock")
+    server = Server(socket_path, workers=1, instruction_limit=100_000, time_limit=5)
+    process = multiprocessing.get_context("fork").Process(target=server.serve_forever)
+    process.start()
+    try:
+        for _ in range(100):
+            if Path(socket_path).exists():
+                break
+            time.sleep(0.05)
+        assert stat.S_IMODE(os.stat(socket_path).st_mode) & 0o077 == 0
+
+        source = 'let s = input(); puts(len(s)); s + "!";'
+        response = request(socket_path, source=source, input="abc")
+        assert response["result"] == "abc!" and response["output"] == "3\n"
+        assert not response["cached"]
+        response = request(socket_path, source=source, input="de")
+        assert response["result"] == "de!" and response["cached"]
+
+        compiler = Compiler()
+        compiler.compile(MParser(MLexer("let x = 6; x * 7;")).parse_program())
+        bytecode = pickle.dumps(compiler.bytecode())
+        assert request(socket_path, bytecode=bytecode)["result"] == "42"
+
+        loop = "let i = 0; while (true) { i = i + 1; }"
+        response = request(socket_path, source=loop)
+        assert response["error"].startswith("BudgetExceededException")
+        assert response["instructions"] == 100_001
+        response = request(socket_path, source=loop, instruction_limit=10)
+        assert response["instructions"] == 11
+        response = request(socket_path, source=loop + " ", time_limit=0.01)
+        assert response["error"].startswith("TimeLimitExceededException")
+
+        assert request(socket_path, source="let = 1;")["error"].startswith(
+            "SyntaxError"
+        )
+    finally:
+        process.terminate()
+        process.join()
+    assert not Path(socket_path).exists()
@@ -0,0 +1,35 @@
+import json
+
+from pymonkey.compiler.compiler import Compiler
+from pymonkey.lexer.mlexer import MLexer
+from pymonkey.parser.mparser import MParser
+from pymonkey.vm.stats import StatsVM
+from pymonkey.vm.vm import VM
+
+
+def test_stats() -> None:
+    source = "let f = fn(x) { x * 2 }; f(1) + f(2);"
+    compiler = Compiler()
+    compiler.compile(MParser(MLexer(source)).parse_program())
+    bytecode = compiler.bytecode()
+
+    vm = VM(bytecode)
+    vm.run()
+    stats_vm = StatsVM(bytecode)
+    stats_vm.run()
+    stats = stats_vm.stats
+
+    assert stats_vm.last_pop == vm.last_pop
+    assert stats.instructions == stats_vm.executed == vm.executed
+    assert stats.calls == 2
+    assert stats.max_frame_depth == 2
+    assert stats.functions == {"main": 10, "f": 8}
+    assert stats.opcodes["OpMul"] == 2 and stats.opcodes["OpReturnValue"] == 2
+    # pairs do not cross into a called function
+    assert stats.pairs[("OpGetLocal", "OpConstant")] == 2
+    assert stats.pairs[("OpCall", "OpGetGlobal")] == 1
+    assert ("OpCall", "OpGetLocal") not in stats.pairs
+
+    dump = json.loads(stats.to_json())
+    assert dump["instructions"] == stats.instructions
+    assert dump["pairs"]["OpGetLocal OpConstant"] == 2
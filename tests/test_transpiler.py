@@ -0,0 +1,100 @@
+from pathlib import Path
+
+import pytest
+from pymonkey.compiler.compiler import Compiler
+from pymonkey.evaluator.mobject import (
+    MArrayObject,
+    MBooleanObject,
+    MIntegerObject,
+    MNullObject,
+    MObject,
+    MStringObject,
+)
+from pymonkey.lexer.mlexer import MLexer
+from pymonkey.parser.mparser import MParser
+from pymonkey.transpiler.cache import cache_path, load_module, write_module
+from pymonkey.transpiler.runtime import to_object
+from pymonkey.transpiler.transpiler import Transpiler
+from pymonkey.vm.vm import VM
+
+
+def run_transpiled(source: str) -> MObject:
+    namespace: dict = {}
+    exec(Transpiler.transpile(MParser(MLexer(source)).parse_program()), namespace)
+    return to_object(namespace["main"]())
+
+
+def run_vm(source: str) -> MObject:
+    compiler = Compiler(optimize=1)
+    compiler.compile(MParser(MLexer(source)).parse_program())
+    vm = VM(compiler.bytecode())
+    vm.run()
+    return vm.last_pop
+
+
+def test_transpile() -> None:
+    test_input: dict[str, MObject] = {
+        "let x = 2; let y = x * if (x > 1) { let z = 3; z + 1 } else { 0 }; y;": (
+            MIntegerObject(8)
+        ),
+        "let f = fn(x) { if (x) { 1 } }; [f(0), f(false), f(true)];": MArrayObject(
+            [MIntegerObject(1), MNullObject(), MIntegerObject(1)]
+        ),
+        '{true: "bool", 1: "int"}[1];': MStringObject("int"),
+        "!false;": MBooleanObject(True),
+        "let i = 0; while (if (i < 3) { let j = i; j < 3 } else { false }) {"
+        " i = i + 1; }; i;": MIntegerObject(3),
+        "let s = 0; let f = fn() { let i = 0; while (i < 4) { i = i + 1;"
+        " if (i == 2) { continue; } s = s + i; } }; f(); s;": MIntegerObject(8),
+        "let x = 1; let x = x + 1; x;": MIntegerObject(2),
+    }
+
+    for i, (key, value) in enumerate(test_input.items()):
+        assert run_transpiled(key) == value, f"Test {i} failed"
+        assert run_vm(key) == value, f"Test {i} failed in the VM"
+
+
+def test_closure() -> None:
+    # the compiler has no closures, the transpiled module uses python ones
+    test_input: dict[str, MObject] = {
+        "let adder = fn(a) { fn(b) { a + b } }; adder(1)(2);": MIntegerObject(3),
+        "let f = fn(n) { let g = fn() { n * 2 }; g() + 1 }; f(4);": MIntegerObject(9),
+    }
+
+    for i, (key, value) in enumerate(test_input.items()):
+        assert run_transpiled(key) == value, f"Test {i} failed"
+
+
+def test_errors() -> None:
+    test_input = [
+        "1 + true;",
+        '"a" - "b";',
+        "[1][2];",
+        '{"a": 1}["b"];',
+        'let k = [1]; {"a": 1}[k];',
+        "let f = fn(x) { x }; f(1, 2);",
+    ]
+
+    for source in test_input:
+        with pytest.raises((TypeError, ValueError, IndexError, KeyError)):
+            run_transpiled(source)
+
+    with pytest.raises(ValueError):
+        run_transpiled("y;")
+    with pytest.raises(ValueError):
+        run_transpiled("let f = fn(x) { let g = fn() { x = 1; }; g() };")
+
+
+def test_cache(tmp_path: Path) -> None:
+    source = "let fib = fn(n) { if (n < 2) { n } else { fib(n - 1) + fib(n - 2) } }; fib(20);"
+    path = cache_path(tmp_path / "fib.monkey", source)
+    assert path.parent.name == "__monkeycache__"
+    assert cache_path(tmp_path / "fib.monkey", source + " ") != path
+
+    write_module(path, Transpiler.transpile(MParser(MLexer(source)).parse_program()))
+    assert to_object(load_module(path).main()) == MIntegerObject(6765)
+
+    # a new version of the file replaces the old module
+    changed = cache_path(tmp_path / "fib.monkey", source + " ")
+    write_module(changed, path.read_text())
+    assert not path.exists() and changed.exists()
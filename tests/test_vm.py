@@ -1,3 +1,4 @@
+import pytest
 from pymonkey.compiler.compiler import Compiler
 from pymonkey.evaluator.mobject import (
     MArrayObject,
@@ -10,7 +11,11 @@ from pymonkey.evaluator.mobject import (
     MValuedObject,
 )
 from pymonkey.lexer.mlexer import MLexer
+from pymonkey.memo import MemoCache
 from pymonkey.parser.mparser import MParser
+from pymonkey.transpiler.runtime import to_object
+from pymonkey.transpiler.transpiler import Transpiler
+from pymonkey.vm.register_vm import RegisterVM
 from pymonkey.vm.vm import VM
 
 
@@ -19,19 +24,34 @@ def run_test(test_input: dict[str, MObject]) -> None:
         lexer = MLexer(key)
         program = MParser(lexer).parse_program()
 
-        compiler = Compiler()
-        compiler.compile(program)
+        for optimize in (0, 2):
+            compiler = Compiler(optimize=optimize)
+            compiler.compile(program)
 
-        print()
-        print(compiler.bytecode().instructions)
-        print()
+            print()
+            print(compiler.bytecode().instructions)
+            print()
 
-        vm = VM(compiler.bytecode())
-        vm.run()
+            vm = VM(compiler.bytecode())
+            vm.run()
+
+            print(vm.last_pop)
+            print(value)
+            assert vm.last_pop == value, f"Test {i} failed at -O{optimize}"
+
+        compiler = Compiler(optimize=1, backend="register")
+        compiler.compile(program)
+        bytecode = compiler.bytecode()
+        print(bytecode.registers)
 
-        print(vm.last_pop)
-        print(value)
-        assert vm.last_pop == value, f"Test {i} failed"
+        register_vm = RegisterVM(bytecode)
+        register_vm.run()
+        assert register_vm.last_pop == value, f"Test {i} failed in the register VM"
+
+        namespace: dict = {}
+        exec(Transpiler.transpile(program), namespace)
+        result = to_object(namespace["main"]())
+        assert result == value, f"Test {i} failed in the transpiled module"
 
 
 def test_integer() -> None:
@@ -102,6 +122,7 @@ def test_array() -> None:
         "[1, 2]": MArrayObject([MIntegerObject(1), MIntegerObject(2)]),
         "[true, false]": MArrayObject([MBooleanObject(True), MBooleanObject(False)]),
         "[true, false][1]": MBooleanObject(False),
+        "[[1], [2, 3]][1]": MArrayObject([MIntegerObject(2), MIntegerObject(3)]),
     }
 
     run_test(test_input)
@@ -139,3 +160,121 @@ def test_function() -> None:
     }
 
     run_test(test_input)
+
+
+def test_while() -> None:
+    test_input: dict[str, MObject] = {
+        "let i = 0; while (i < 10) { i = i + 1; }; i;": MIntegerObject(10),
+        "let i = 0; while (i < 10) { i = i + 1; };": MNullObject(),
+        "let i = 0; while (true) { if (i == 5) { break; } i = i + 1; }; i;": (
+            MIntegerObject(5)
+        ),
+        "let i = 0; let s = 0;"
+        "while (i < 5) { i = i + 1; if (i == 3) { continue; } s = s + i; }; s;": (
+            MIntegerObject(12)
+        ),
+        "let f = fn(n) { let s = 0; while (n > 0) { s = s + n; n = n - 1; } s };"
+        "f(100);": MIntegerObject(5050),
+        "let f = fn() { while (true) { return 3; } }; f();": MIntegerObject(3),
+        "let c = 0; let inc = fn() { c = c + 1; }; inc(); inc(); c;": MIntegerObject(2),
+        "let f = fn(a, b) { let c = a + b; c * 2 }; f(1, 2) + f(3, 4);": (
+            MIntegerObject(20)
+        ),
+    }
+
+    run_test(test_input)
+
+
+def test_builtin() -> None:
+    test_input: dict[str, MObject] = {
+        'len("four")': MIntegerObject(4),
+        "len([1, 2, 3])": MIntegerObject(3),
+        "puts(1)": MNullObject(),
+        "let f = fn(x) { if (x < 2) { x } else { f(x - 1) + f(x - 2) } }; f(10)": (
+            MIntegerObject(55)
+        ),
+        "let x = 1; return x + 1; 5;": MIntegerObject(2),
+    }
+
+    run_test(test_input)
+
+
+def test_memoize() -> None:
+    code = (
+        "let f = fn(x) { if (x < 2) { x } else { f(x - 1) + f(x - 2) } };"
+        "let g = fn(x) { puts(x); x };"
+        "f(60) + g(1)"
+    )
+    compiler = Compiler()
+    compiler.compile(MParser(MLexer(code)).parse_program())
+
+    memo: MemoCache[MObject] = MemoCache(max_size=16)
+    vm = VM(compiler.bytecode(), memo)
+    vm.run()
+
+    assert vm.last_pop == MIntegerObject(1548008755920 + 1)
+    assert memo.misses == 61
+    assert memo.hits == 58
+    assert len(memo.entries) == 16
+    assert memo.evictions == 61 - 16
+
+
+def test_inline() -> None:
+    test_input: dict[str, MObject] = {
+        "let inc = fn(x) { x + 1 }; inc(inc(1));": MIntegerObject(3),
+        "let n = 1; let add = fn(x) { x + n }; let n = 5; add(1);": MIntegerObject(2),
+        "let sub = fn(a, b) { a - b }; let f = fn(a, b) { sub(b, a) }; f(1, 3);": (
+            MIntegerObject(2)
+        ),
+        "let inc = fn(x) { x + 1 }; let f = fn(inc) { inc }; f(5);": MIntegerObject(5),
+        "let abs = fn(x) { if (x < 0) { -x } else { x } }; abs(-3) + abs(4);": (
+            MIntegerObject(7)
+        ),
+        "let inc = fn(x) { x + 1 }; let i = 0; while (i < 5) { i = inc(i); }; i;": (
+            MIntegerObject(5)
+        ),
+    }
+
+    run_test(test_input)
+
+
+def test_stack_trace() -> None:
+    source = """let apply = fn(f, x) {
+  f(x)
+};
+let g = fn(y) {
+  let z = y + 1;
+  z(2)
+};
+apply(g, 1);
+"""
+    compiler = Compiler()
+    compiler.compile(MParser(MLexer(source, "trace.monkey")).parse_program())
+    vm = VM(compiler.bytecode())
+
+    with pytest.raises(ValueError) as err:
+        vm.run()
+    assert err.value.args == ("not a function",)
+    assert getattr(err.value, "monkey_trace") == [
+        ("main", ("trace.monkey", 8, 6)),
+        ("apply", ("trace.monkey", 2, 4)),
+        ("g", ("trace.monkey", 6, 4)),
+    ]
+
+
+def test_stack_trace_inlined() -> None:
+    source = """let f = fn(x) { 10 / x };
+let g = fn(y) { f(y) + 1 };
+g(0);
+"""
+    compiler = Compiler(optimize=1)
+    compiler.compile(MParser(MLexer(source, "trace.monkey")).parse_program())
+    vm = VM(compiler.bytecode())
+
+    with pytest.raises(ZeroDivisionError) as err:
+        vm.run()
+    assert getattr(err.value, "monkey_trace") == [
+        ("main", None),
+        ("g (inlined)", None),
+        ("f (inlined)", ("trace.monkey", 1, 20)),
+    ]
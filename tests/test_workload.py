@@ -0,0 +1,60 @@
+from pathlib import Path
+
+import pytest
+from pymonkey.compiler.compiler import Compiler
+from pymonkey.lexer.mlexer import MLexer
+from pymonkey.parser.mparser import MParser
+from pymonkey.vm.vm import VM
+from pymonkey.workload import (
+    CALL_GRAPHS,
+    WorkloadConfig,
+    WorkloadGenerator,
+    generate,
+    identifier,
+)
+
+
+def test_identifier() -> None:
+    assert identifier("v", 0) == "va"
+    assert identifier("v", 25) == "vz"
+    assert identifier("v", 26) == "vba"
+
+
+def test_seeded() -> None:
+    config = WorkloadConfig(seed=7, statements=20, functions=5)
+    assert generate(config) == generate(config)
+    assert generate(config).source != generate(WorkloadConfig(seed=8)).source
+
+
+@pytest.mark.parametrize("call_graph", CALL_GRAPHS)
+def test_expected_in_vm(call_graph: str) -> None:
+    workload = generate(WorkloadConfig(seed=1, statements=20, call_graph=call_graph))
+    compiler = Compiler()
+    compiler.compile(MParser(MLexer(workload.source)).parse_program())
+    vm = VM(compiler.bytecode())
+    vm.run()
+    assert str(vm.last_pop) == workload.expected
+
+
+def test_call_graphs() -> None:
+    def callees(call_graph: str) -> list[list[int]]:
+        generator = WorkloadGenerator(
+            WorkloadConfig(functions=6, call_graph=call_graph)
+        )
+        return [generator.callees(i) for i in range(6)]
+
+    assert callees("none") == [[]] * 6
+    assert callees("chain") == [[1], [2], [3], [4], [5], []]
+    assert callees("tree") == [[1, 2], [3, 4], [5], [], [], []]
+    for i, called in enumerate(callees("random")):
+        assert all(i < c < 6 for c in called)
+
+    with pytest.raises(ValueError):
+        WorkloadGenerator(WorkloadConfig(call_graph="ring"))
+
+
+def test_write(tmp_path: Path) -> None:
+    workload = generate(WorkloadConfig(statements=5, functions=2))
+    workload.write(tmp_path / "w.monkey")
+    assert (tmp_path / "w.monkey").read_text() == workload.source
+    assert (tmp_path / "w.expected").read_text() == workload.expected + "\n"